@@ -3,9 +3,9 @@ import base64
 import json
 from flask import Flask, request, jsonify, render_template, send_from_directory
 
-# Document parsing
-import fitz  # PyMuPDF for PDF
-from docx import Document
+# Document parsing (PyMuPDF, pdfplumber, PyPDF2, python-docx behind one registry)
+from tools.extraction_cache import cached_extract, file_digest
+from tools.extraction_engines import extract_document, engine_chain_key, EXTRACTOR_VERSION
 
 # Import your agent chat function
 from chat2 import chat 
@@ -19,36 +19,26 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 # ---------------------------
 # Utility functions
 # ---------------------------
+
 def extract_text_from_file(file_path: str) -> str:
-    """Extract text from PDF, DOCX, or TXT file"""
-    text = ""
+    """Extract text from PDF, DOCX, or TXT file, reusing cached results by content hash"""
+    extractor = engine_chain_key(os.path.splitext(file_path)[1])
+    if not extractor or not os.path.exists(file_path):
+        return _extract_text_from_file(file_path)[0]
+    return cached_extract(
+        file_digest(file_path), extractor, EXTRACTOR_VERSION,
+        lambda: _extract_text_from_file(file_path)
+    )
 
-    try:
-        # PDF
-        if file_path.lower().endswith(".pdf"):
-            with fitz.open(file_path) as doc:
-                for page in doc:
-                    text += page.get_text("text") + "\n"
-
-        # DOCX
-        elif file_path.lower().endswith(".docx"):
-            doc = Document(file_path)
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    text += para.text + "\n"
-
-        # TXT
-        elif file_path.lower().endswith(".txt"):
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                text = f.read()
-
-        else:
-            text = "[Unsupported file type uploaded]"
 
+def _extract_text_from_file(file_path: str):
+    """Extract text from PDF, DOCX, or TXT file with the shared engine registry"""
+    try:
+        text, pages = extract_document(file_path)
     except Exception as e:
-        text = f"[Error extracting text: {str(e)}]"
+        text, pages = f"[Error extracting text: {str(e)}]", None
 
-    return text.strip()
+    return text.strip(), pages
 
 
 def file_to_base64(file_path: str) -> str:
@@ -0,0 +1,113 @@
+"""Compare embedding backends: load time, RSS, queries/sec and recall@k.
+
+    python -m benchmarks.bench_embedding_backends [--backends sentence-transformers,onnx-int8,static]
+                                                  [--k 5] [--repeat 3] [--fixture]
+
+Each backend is loaded in its own fresh process, so load time and RSS
+include importing its libraries. queries/sec encodes the labelled company
+questions one at a time (as search_company_info does); chunks/sec encodes
+the company corpus in one batch (as update_company_vectors does).
+
+recall@k is the overlap of each backend's top-k chunks with the top-k of
+the sentence-transformers reference model; hit@k is the share of questions
+whose answering chunk is in the top-k. The corpus is the saved company
+description, or the fixture profile with --fixture (or when none is saved).
+"""
+import argparse
+import multiprocessing
+import resource
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from benchmarks.company_corpus import company_chunks, load_queries, relevant_rows
+from tools.embedding_backends import BACKENDS
+
+REFERENCE = "sentence-transformers"
+
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(backend, chunks, questions, repeat):
+    baseline = _rss_mb()
+    started = time.perf_counter()
+    try:
+        from tools.embedding_backends import load_embedder
+        embedder = load_embedder(backend)
+        embedder.encode("warm up")
+    except Exception as e:
+        return {"backend": backend, "error": f"{type(e).__name__}: {e}"}
+    load_s = time.perf_counter() - started
+
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        query_vectors = np.stack([np.asarray(embedder.encode(q), dtype=np.float32) for q in questions])
+        runs.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    chunk_vectors = np.asarray(embedder.encode(chunks), dtype=np.float32)
+    chunk_s = time.perf_counter() - started
+
+    return {
+        "backend": backend,
+        "load_s": load_s,
+        "rss_mb": _rss_mb() - baseline,
+        "queries_per_sec": len(questions) / statistics.median(runs),
+        "chunks_per_sec": len(chunks) / chunk_s if chunk_s else 0.0,
+        "query_vectors": query_vectors,
+        "chunk_vectors": chunk_vectors,
+    }
+
+
+def top_k(query_vectors, chunk_vectors, k):
+    scores = query_vectors @ chunk_vectors.T
+    return [set(np.argsort(-row)[:k]) for row in scores]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fixture", action="store_true", help="use the fixture profile even if one is saved")
+    args = parser.parse_args()
+
+    chunks, source = company_chunks(use_db=not args.fixture)
+    queries = load_queries()
+    questions = [q["query"] for q in queries]
+    relevant = [relevant_rows(chunks, q) for q in queries]
+    print(f"corpus: {source}, {len(chunks)} chunks, {len(questions)} questions, k={args.k}")
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    if REFERENCE not in backends:
+        backends.insert(0, REFERENCE)
+    spawn = multiprocessing.get_context("spawn")
+    results = {}
+    for backend in backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+            results[backend] = pool.submit(_measure, backend, chunks, questions, args.repeat).result()
+
+    reference = results[REFERENCE]
+    reference_top = None if "error" in reference else top_k(
+        reference["query_vectors"], reference["chunk_vectors"], args.k)
+
+    print(f"{'backend':<24}{'load s':>8}{'RSS MB':>9}{'q/sec':>9}{'chunks/s':>10}"
+          f"{f'recall@{args.k}':>11}{f'hit@{args.k}':>8}")
+    for backend in backends:
+        row = results[backend]
+        if "error" in row:
+            print(f"{backend:<24}unavailable ({row['error']})")
+            continue
+        found = top_k(row["query_vectors"], row["chunk_vectors"], args.k)
+        recall = "-" if reference_top is None else f"{statistics.mean(len(a & b) / args.k for a, b in zip(found, reference_top)):.3f}"
+        hit = statistics.mean(1.0 if rows & rel else 0.0 for rows, rel in zip(found, relevant))
+        print(f"{backend:<24}{row['load_s']:>8.2f}{row['rss_mb']:>9.0f}{row['queries_per_sec']:>9.0f}"
+              f"{row['chunks_per_sec']:>10.0f}{recall:>11}{hit:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Compare PDF extraction engines: pages/sec, peak memory and text fidelity.
+
+    python -m benchmarks.bench_extraction_engines [--repeat 3] [--max-pages 50] [--corpus DIR]
+
+Each engine runs in its own fresh process so its peak RSS is not mixed up
+with the other engines. Fidelity is the word-level similarity between the
+extracted text and the text written into the synthetic corpus (1.0 means
+every word came back in order). With --corpus only speed and memory are
+reported, since the expected text is unknown.
+"""
+import argparse
+import difflib
+import glob
+import multiprocessing
+import os
+import resource
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.pdf_corpus import build_corpus
+from tools.extraction_engines import DEFAULT_ENGINE_ORDER, engine_available
+
+
+def _pages_pymupdf(path, max_pages):
+    from tools.pdf_extraction import iter_pymupdf_pages
+    return [text for _, text in list(iter_pymupdf_pages(path, max_pages))[1:]]
+
+
+def _pages_pdfplumber(path, max_pages):
+    from tools.pdf_extraction import iter_page_range
+    return [text for _, text in iter_page_range(path, 0, max_pages)]
+
+
+def _pages_pypdf2(path, max_pages):
+    from tools.pdf_extraction import iter_pypdf2_pages
+    return [text for _, text in list(iter_pypdf2_pages(path, max_pages))[1:]]
+
+
+# The worker-side page iterators, run in-process: this measures the parser,
+# not the sandbox round trips, which are the same for every engine.
+PAGE_FUNCS = {
+    "pymupdf": _pages_pymupdf,
+    "pdfplumber": _pages_pdfplumber,
+    "pypdf2": _pages_pypdf2,
+}
+
+
+def fidelity(extracted, expected):
+    return difflib.SequenceMatcher(None, extracted.split(), expected.split(), autojunk=False).ratio()
+
+
+def _max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(engine, corpus, max_pages, repeat):
+    pages_fn = PAGE_FUNCS[engine]
+    pages_fn(corpus[0][0], 1)  # import the library before taking the baseline
+    baseline = _max_rss_mb()
+
+    pages_total, seconds_total, scores = 0, 0.0, []
+    for path, _, expected in corpus:
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            page_texts = pages_fn(path, max_pages)
+            runs.append(time.perf_counter() - started)
+        pages_total += len(page_texts)
+        seconds_total += statistics.median(runs)
+        if expected is not None:
+            scores.append(fidelity("\n".join(page_texts), expected))
+
+    return {
+        "engine": engine,
+        "pages_per_sec": pages_total / seconds_total if seconds_total else 0.0,
+        "peak_mb": _max_rss_mb() - baseline,
+        "fidelity": statistics.mean(scores) if scores else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-pages", type=int, default=50)
+    parser.add_argument("--corpus", help="directory of PDFs to use instead of the synthetic corpus")
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = [(path, None, None) for path in sorted(glob.glob(os.path.join(args.corpus, "*.pdf")))]
+    else:
+        tmp = tempfile.mkdtemp(prefix="pdf_corpus_")
+        # Only documents that fit in max_pages, so fidelity compares like with like
+        corpus = [c for c in build_corpus(tmp) if c[1] <= args.max_pages]
+
+    engines = [name for name in PAGE_FUNCS if engine_available(name)]
+    print(f"default order: {DEFAULT_ENGINE_ORDER['.pdf']}  files={len(corpus)} repeat={args.repeat}")
+    print(f"{'engine':<12}{'pages/sec':>11}{'peak MB':>10}{'fidelity':>10}")
+    spawn = multiprocessing.get_context("spawn")
+    for engine in engines:
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+            row = pool.submit(_measure, engine, corpus, args.max_pages, args.repeat).result()
+        score = f"{row['fidelity']:.3f}" if row["fidelity"] is not None else "-"
+        print(f"{engine:<12}{row['pages_per_sec']:>11.1f}{row['peak_mb']:>10.1f}{score:>10}")
+
+
+if __name__ == "__main__":
+    main()
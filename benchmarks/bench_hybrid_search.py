@@ -0,0 +1,98 @@
+"""Latency and recall of vector, BM25 and hybrid company search on the labelled questions.
+
+    python -m benchmarks.bench_hybrid_search [--k 5] [--repeat 3] [--fixture]
+
+Indexes the company corpus (see benchmarks/company_corpus.py) with
+update_company_vectors into a temporary local vector store, then runs every
+labelled question through search_company_info in each mode with the result
+and embedding caches disabled, so every query pays its real cost:
+
+    vector         embedding + vector search only
+    lexical        BM25 only
+    hybrid-rrf     both retrievers fused with RRF, never short-circuited
+    hybrid         the production path: RRF, but confident BM25 hits skip the embedding
+
+hit@k is the share of questions whose answering chunk is among the top k,
+MRR the mean reciprocal rank of the first answering chunk, shortcut the
+share of questions answered from BM25 alone.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+# Must be set before the tools modules read their configuration
+os.environ["LOCAL_VECTOR_DIR"] = tempfile.mkdtemp(prefix="hybrid_bench_")
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ["COMPANY_RESULT_CACHE_SIZE"] = "0"
+os.environ["COMPANY_EMBED_CACHE_SIZE"] = "0"
+
+from benchmarks.company_corpus import load_company_text, load_queries  # noqa: E402
+from tools import about_syscraft, lexical_index  # noqa: E402
+
+MODES = ("vector", "lexical", "hybrid-rrf", "hybrid")
+
+
+def _percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))]
+
+
+def run_mode(mode, queries, k, repeat):
+    about_syscraft.COMPANY_SEARCH_MODE = "hybrid" if mode.startswith("hybrid") else mode
+    shortcut_terms = lexical_index.LEXICAL_SHORTCUT_MAX_TERMS
+    if mode == "hybrid-rrf":
+        lexical_index.LEXICAL_SHORTCUT_MAX_TERMS = 0
+    try:
+        latencies, hits, reciprocal_ranks, shortcuts = [], [], [], 0
+        for query in queries:
+            runs = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = about_syscraft.search_company_info(query["query"], top_k=k)
+                runs.append((time.perf_counter() - started) * 1000)
+            if "error" in result:
+                return {"error": result["error"]}
+            latencies.append(statistics.median(runs))
+            shortcuts += result.get("retrieval") == "lexical" and mode == "hybrid"
+            phrase = query["relevant"].lower()
+            ranks = [i for i, m in enumerate(result["matches"], start=1) if phrase in m["metadata"]["text"].lower()]
+            hits.append(1.0 if ranks else 0.0)
+            reciprocal_ranks.append(1.0 / ranks[0] if ranks else 0.0)
+    finally:
+        lexical_index.LEXICAL_SHORTCUT_MAX_TERMS = shortcut_terms
+    return {
+        "hit": statistics.mean(hits),
+        "mrr": statistics.mean(reciprocal_ranks),
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": _percentile(latencies, 95),
+        "shortcut": shortcuts / len(queries),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fixture", action="store_true", help="use the fixture profile even if one is saved")
+    args = parser.parse_args()
+
+    text, source = load_company_text(use_db=not args.fixture)
+    queries = load_queries()
+    summary = about_syscraft.update_company_vectors(text)
+    about_syscraft.search_company_info("warm up")  # load the model outside the timings
+    print(f"corpus: {source}, {summary['added']} chunks, {len(queries)} questions, k={args.k}")
+
+    print(f"{'mode':<12}{f'hit@{args.k}':>8}{'MRR':>7}{'p50 ms':>9}{'p95 ms':>9}{'shortcut':>10}")
+    for mode in MODES:
+        row = run_mode(mode, queries, args.k, args.repeat)
+        if "error" in row:
+            print(f"{mode:<12}unavailable ({row['error']})")
+            continue
+        print(f"{mode:<12}{row['hit']:>8.3f}{row['mrr']:>7.3f}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+              f"{row['shortcut']:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Serial vs page-parallel pdfplumber extraction over 1-50 page PDFs.
+
+    python -m benchmarks.bench_pdf_extraction [--workers 4] [--repeat 3] [--corpus DIR]
+
+Without --corpus a synthetic corpus is generated in a temp directory.
+"""
+import argparse
+import glob
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.pdf_corpus import build_corpus
+from tools import pdf_extraction
+from tools.extraction_sandbox import configure_supervisor, get_supervisor
+from tools.pdf_extraction import extract_pdf_text_serial, extract_pdf_text_parallel, pdf_page_count
+
+
+def _time(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=pdf_extraction.PDF_WORKERS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-pages", type=int, default=50)
+    parser.add_argument("--corpus", help="directory of PDFs to use instead of the synthetic corpus")
+    args = parser.parse_args()
+
+    if args.corpus:
+        paths = sorted(glob.glob(os.path.join(args.corpus, "*.pdf")))
+    else:
+        tmp = tempfile.mkdtemp(prefix="pdf_corpus_")
+        paths = [path for path, _, _ in build_corpus(tmp)]
+
+    configure_supervisor(workers=args.workers)
+    # Warm the pool so process start-up is not charged to the first document
+    extract_pdf_text_parallel(paths[0], max_pages=1, workers=args.workers)
+
+    print(f"workers={args.workers} repeat={args.repeat} max_pages={args.max_pages}")
+    print(f"{'file':<24}{'pages':>6}{'serial ms':>12}{'parallel ms':>13}{'speedup':>9}")
+    for path in paths:
+        pages = pdf_page_count(path)
+        serial = _time(lambda: extract_pdf_text_serial(path, args.max_pages), args.repeat)
+        parallel = _time(lambda: extract_pdf_text_parallel(path, args.max_pages, args.workers), args.repeat)
+        same = extract_pdf_text_serial(path, args.max_pages)[0] == extract_pdf_text_parallel(path, args.max_pages, args.workers)[0]
+        print(f"{os.path.basename(path):<24}{pages:>6}{serial * 1000:>12.1f}{parallel * 1000:>13.1f}"
+              f"{serial / parallel:>8.2f}x{'' if same else '  OUTPUT DIFFERS'}")
+
+    get_supervisor().shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""How often pre-retrieval triggers, and whether its passages answer the question.
+
+    python -m benchmarks.bench_pre_retrieval [--fixture]
+
+Indexes the company corpus (see benchmarks/company_corpus.py) into a
+temporary local vector store, then feeds chat2's pre-retrieval stage the
+labelled company questions and a set of HR / small-talk messages that
+should not trigger it:
+
+    triggered      share of messages that started a company search
+    answered       share of triggered company questions whose injected
+                   passages contain the answering phrase (these can be
+                   answered in one model call)
+    context tok    size of the injected block (date + passages)
+    p50 ms         time the turn waits for the search after preparing the request
+
+The live single-pass rate is at /admin/api/pre_retrieval_stats.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+# Must be set before the tools modules read their configuration
+os.environ["LOCAL_VECTOR_DIR"] = tempfile.mkdtemp(prefix="pre_retrieval_bench_")
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ["COMPANY_RESULT_CACHE_SIZE"] = "0"
+
+from benchmarks.company_corpus import load_company_text, load_queries  # noqa: E402
+from tools import about_syscraft  # noqa: E402
+from tools.pre_retrieval import looks_company_related, start_pre_retrieval, turn_context  # noqa: E402
+from tools.tool_compaction import count_tokens  # noqa: E402
+
+OTHER_MESSAGES = [
+    "hi",
+    "Hello!",
+    "Hi, how are you?",
+    "How are you doing today?",
+    "Good morning",
+    "Can you help me?",
+    "Can you tell me a joke?",
+    "What do you think about the weather?",
+    "Can you explain what recursion is?",
+    "Who won the cricket match yesterday?",
+    "Thanks, that's all for now!",
+    "What job openings do you have?",
+    "Which roles match my resume?",
+    "I want to apply for the Full Stack Developer position",
+    "Here is my resume, please analyze it",
+    "My name is Priya and my email is priya@example.com",
+    "Can I apply for the internship as a fresher?",
+    "What skills do I need for the DevOps role?",
+    "Please save my application",
+]
+
+
+def run(messages):
+    triggered, waits, contexts = [], [], []
+    for message in messages:
+        future = start_pre_retrieval(message)
+        started = time.perf_counter()
+        context, found = turn_context(future)
+        waits.append((time.perf_counter() - started) * 1000)
+        triggered.append(future is not None)
+        contexts.append((context, found))
+    return triggered, waits, contexts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixture", action="store_true", help="use the fixture profile even if one is saved")
+    args = parser.parse_args()
+
+    text, source = load_company_text(use_db=not args.fixture)
+    summary = about_syscraft.update_company_vectors(text)
+    about_syscraft.search_company_info("warm up")  # load the model outside the timings
+    queries = load_queries()
+    print(f"corpus: {source}, {summary['added']} chunks, {len(queries)} company questions, "
+          f"{len(OTHER_MESSAGES)} other messages")
+
+    triggered, waits, contexts = run([q["query"] for q in queries])
+    answered = [found and q["relevant"].lower() in context.lower()
+                for q, (context, found), hit in zip(queries, contexts, triggered) if hit]
+    context_tokens = [count_tokens(context) for context, found in contexts if found]
+    other_triggered = sum(looks_company_related(m) for m in OTHER_MESSAGES)
+
+    print(f"{'messages':<18}{'triggered':>10}{'answered':>10}{'context tok':>13}{'p50 ms':>9}")
+    print(f"{'company':<18}{statistics.mean(triggered):>10.0%}"
+          f"{(statistics.mean(answered) if answered else 0.0):>10.0%}"
+          f"{(statistics.median(context_tokens) if context_tokens else 0):>13.0f}{statistics.median(waits):>9.2f}")
+    print(f"{'other':<18}{other_triggered / len(OTHER_MESSAGES):>10.0%}{'-':>10}{'-':>13}{'-':>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Prompt size of raw vs condensed resumes on the fixture resumes.
+
+    python -m benchmarks.bench_resume_condenser [--fixtures DIR] [--show]
+
+Tokens are counted with tiktoken (cl100k_base) when it is installed,
+otherwise estimated as characters / 4.
+"""
+import argparse
+import glob
+import os
+import time
+
+from tools.resume_condenser import condense_resume, format_profile
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "resumes")
+
+
+def _token_counter():
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return (lambda text: len(encoding.encode(text))), "tiktoken cl100k_base"
+    except ImportError:
+        return (lambda text: max(1, len(text) // 4)), "chars/4 estimate"
+
+
+def raw_block(filename, text):
+    """The [USER_RESUME] block chat2.chat built before condensing."""
+    return f"\n\n[USER_RESUME]\nFilename: {filename}\nExtracted Text:\n{text}\n[/USER_RESUME]"
+
+
+def condensed_block(filename, text):
+    return f"\n\n[USER_RESUME]\nFilename: {filename}\n{format_profile(condense_resume(text))}\n[/USER_RESUME]"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--show", action="store_true", help="print each condensed profile")
+    args = parser.parse_args()
+
+    count, counter_name = _token_counter()
+    print(f"token counter: {counter_name}")
+    print(f"{'fixture':<28}{'raw tok':>9}{'condensed':>11}{'ratio':>8}{'ms':>7}")
+    raw_total = condensed_total = 0
+    for path in sorted(glob.glob(os.path.join(args.fixtures, "*.txt"))):
+        name = os.path.basename(path)
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        started = time.perf_counter()
+        condensed = condensed_block(name, text)
+        elapsed = (time.perf_counter() - started) * 1000
+        raw_tokens, condensed_tokens = count(raw_block(name, text)), count(condensed)
+        raw_total += raw_tokens
+        condensed_total += condensed_tokens
+        print(f"{name:<28}{raw_tokens:>9}{condensed_tokens:>11}{raw_tokens / condensed_tokens:>7.1f}x{elapsed:>7.1f}")
+        if args.show:
+            print(condensed)
+    if condensed_total:
+        print(f"{'total':<28}{raw_total:>9}{condensed_total:>11}{raw_total / condensed_total:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
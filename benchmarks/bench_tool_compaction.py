@@ -0,0 +1,142 @@
+"""Prompt tokens of raw vs compacted tool outputs, per tool and per conversation turn.
+
+    python -m benchmarks.bench_tool_compaction [--fixture] [--show]
+
+Tool outputs are built the way the chat tools build them: get_company_info
+runs each labelled company question through BM25 over the company chunks
+(the shape search_company_info returns), get_job_openings returns the
+active jobs from the database, and analyze_resume_for_roles ranks them for
+each fixture resume (skipped when the embedding model cannot load). Raw
+size is the ToolMessage content ToolNode would store (the JSON of the
+return value); compact size is what chat2 stores instead.
+
+The session table replays a conversation that calls each tool once and
+then keeps chatting: every model call re-sends all earlier tool messages,
+so the savings compound with each turn. Once a turn is answered its tool
+messages are replaced by one-line digests, which keeps the state flat. Tokens are counted with tiktoken
+(cl100k_base) when it is installed, otherwise estimated as characters / 4.
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import statistics
+import tempfile
+
+# rank_jobs_for_resume caches job embeddings in the HR database: run against
+# a copy so the benchmark never writes to the real one. Must be set before
+# the tools modules read their configuration.
+_HR_DB = os.getenv("HR_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                              "tools", "hr_applications.db"))
+os.environ["HR_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="tool_compaction_bench_"), "hr_applications.db")
+if os.path.exists(_HR_DB):
+    shutil.copyfile(_HR_DB, os.environ["HR_DB_PATH"])
+
+from benchmarks.company_corpus import company_chunks, load_queries  # noqa: E402
+from tools import tool_compaction  # noqa: E402
+from tools.hr_jobs import get_active_job_openings  # noqa: E402
+from tools.lexical_index import BM25Index  # noqa: E402
+
+RESUMES = os.path.join(os.path.dirname(__file__), "fixtures", "resumes")
+SESSION = ["get_company_info", "get_job_openings", "analyze_resume_for_roles", "get_company_info", None, None]
+
+
+def company_outputs(use_db, k=5):
+    chunks, source = company_chunks(use_db)
+    records = [{"id": f"chunk_{i}", "metadata": {"text": chunk}} for i, chunk in enumerate(chunks)]
+    index = BM25Index(records)
+    outputs = []
+    for query in load_queries():
+        matches = [{**records[row], "score": round(score, 4)} for row, score in index.search(query["query"], k)]
+        outputs.append({"matches": matches, "retrieval": "lexical"})
+    return outputs, source
+
+
+def resume_outputs(jobs):
+    try:
+        from tools.job_matching import rank_jobs_for_resume
+        outputs = []
+        for path in sorted(glob.glob(os.path.join(RESUMES, "*.txt"))):
+            with open(path, encoding="utf-8") as f:
+                ranking = rank_jobs_for_resume(f.read(), top_k=5)
+            outputs.append({
+                "success": True,
+                "total_jobs": ranking["total_jobs"],
+                "matching_roles": ranking["matches"],
+                "analysis_summary": f"Ranked {ranking['total_jobs']} open positions against the resume",
+            })
+        return outputs
+    except Exception as e:
+        print(f"analyze_resume_for_roles: unavailable ({type(e).__name__}: {e})")
+        return []
+
+
+def measure(name, outputs, show):
+    """[(raw tokens, compact tokens, digest tokens)] for each output of one tool."""
+    sizes = []
+    for output in outputs:
+        content = json.dumps(output, ensure_ascii=False)
+        compact, info = tool_compaction.compact_tool_output(name, content, "bench")
+        compact_tokens = info["compact_tokens"] if info else tool_compaction.count_tokens(compact)
+        digest = info["digest"] if info else tool_compaction.digest_tool_output(name, content, "bench")
+        sizes.append((tool_compaction.count_tokens(content), compact_tokens, tool_compaction.count_tokens(digest)))
+        if show:
+            print(f"--- {name}\n{compact}")
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixture", action="store_true", help="use the fixture profile even if one is saved")
+    parser.add_argument("--show", action="store_true", help="print every compacted output")
+    args = parser.parse_args()
+
+    # Keep the benchmark from storing its payloads as a chat session
+    tool_compaction.remember_tool_output = lambda content, session_id: "bench"
+
+    company, source = company_outputs(use_db=not args.fixture)
+    jobs = get_active_job_openings()
+    outputs = {
+        "get_company_info": company,
+        "get_job_openings": [jobs],
+        "analyze_resume_for_roles": resume_outputs(jobs),
+    }
+    print(f"corpus: {source}, {len(jobs)} active jobs, token counter: {tool_compaction.TOKEN_COUNTER}")
+
+    print(f"{'tool':<28}{'calls':>6}{'budget':>8}{'raw tok':>9}{'compact':>9}{'ratio':>8}{'digest':>8}")
+    typical = {}
+    for name, tool_outputs in outputs.items():
+        sizes = measure(name, tool_outputs, args.show)
+        if not sizes:
+            continue
+        raw, compact, digest = (statistics.mean(column) for column in zip(*sizes))
+        typical[name] = (raw, compact, digest)
+        print(f"{name:<28}{len(sizes):>6}{tool_compaction.tool_budget(name):>8}{raw:>9.0f}{compact:>9.0f}"
+              f"{raw / compact:>7.1f}x{digest:>8.0f}")
+
+    # Tool-output tokens in the prompts of each turn: kept raw, compacted,
+    # and compacted then digested once answered; "state" is what the
+    # conversation state (and so each checkpoint) carries after the turn
+    print(f"\n{'turn':<6}{'tool':<28}{'model calls':>12}{'raw':>8}{'compact':>9}{'digested':>10}{'state':>7}")
+    history = [0, 0, 0]
+    totals = [0, 0, 0]
+    for turn, name in enumerate(SESSION, start=1):
+        if name not in typical and name is not None:
+            continue
+        # The first model call sees the history; after a tool call the second also sees the new result
+        calls = [[h] for h in history]
+        if name:
+            raw, compact, digest = typical[name]
+            for column, size in zip(calls, (raw, compact, compact)):
+                column.append(column[0] + size)
+            history = [history[0] + raw, history[1] + compact, history[2] + digest]
+        prompts = [sum(column) for column in calls]
+        totals = [t + p for t, p in zip(totals, prompts)]
+        print(f"{turn:<6}{name or '-':<28}{len(calls[0]):>12}{prompts[0]:>8.0f}{prompts[1]:>9.0f}{prompts[2]:>10.0f}"
+              f"{history[2]:>7.0f}")
+    print(f"{'total':<46}{totals[0]:>8.0f}{totals[1]:>9.0f}{totals[2]:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Query latency of the company vector store backends.
+
+    python -m benchmarks.bench_vector_store [--vectors 500] [--queries 200] [--pinecone]
+
+Loads the same synthetic vectors (random unit vectors spread over a few
+company ids) into each backend and times filtered top-5 queries the way
+search_company_info issues them. The local backend runs in a temporary
+directory. --pinecone also benchmarks the Pinecone index named by
+--pinecone-index (PINECONE_API_KEY must be set); the vectors go into a
+throwaway namespace that is deleted afterwards. Recall is the overlap of
+each backend's top-k with the exact top-k.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from tools.vector_store import LocalVectorStore, PineconeVectorStore
+
+DIM = 384
+
+
+def synthetic_vectors(count, companies, seed=7):
+    rng = np.random.default_rng(seed)
+    matrix = rng.standard_normal((count, DIM)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    records = [{
+        "id": f"company_{i % companies}_{i}",
+        "values": matrix[i].tolist(),
+        "metadata": {"company_id": f"company_{i % companies}", "text": f"chunk {i}"},
+    } for i in range(count)]
+    return matrix, records
+
+
+def exact_top_k(matrix, records, query, company_id, k):
+    rows = [i for i, r in enumerate(records) if r["metadata"]["company_id"] == company_id]
+    scores = matrix[rows] @ query
+    return {records[rows[i]]["id"] for i in np.argsort(-scores)[:k]}
+
+
+def _percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))]
+
+
+def run_queries(store, matrix, records, queries, companies, top_k):
+    latencies, recalls = [], []
+    for n, query in enumerate(queries):
+        company_id = f"company_{n % companies}"
+        started = time.perf_counter()
+        result = store.query(vector=query, top_k=top_k, filter={"company_id": company_id}, include_metadata=True)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found = {m["id"] for m in result["matches"]}
+        recalls.append(len(found & exact_top_k(matrix, records, query, company_id, top_k)) / top_k)
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": _percentile(latencies, 95),
+        "mean_ms": statistics.mean(latencies),
+        "recall": statistics.mean(recalls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=500)
+    parser.add_argument("--companies", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--pinecone", action="store_true", help="also benchmark the Pinecone backend")
+    parser.add_argument("--pinecone-index", default="company-descriptions")
+    args = parser.parse_args()
+
+    matrix, records = synthetic_vectors(args.vectors, args.companies)
+    rng = np.random.default_rng(11)
+    queries = rng.standard_normal((args.queries, DIM)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print(f"vectors={args.vectors} companies={args.companies} queries={args.queries} top_k={args.top_k}")
+    print(f"{'backend':<10}{'open ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}{'recall':>8}")
+
+    rows = []
+    directory = tempfile.mkdtemp(prefix="vector_bench_")
+    LocalVectorStore(directory, DIM).upsert(records)
+    started = time.perf_counter()
+    local = LocalVectorStore(directory, DIM)
+    open_ms = (time.perf_counter() - started) * 1000
+    rows.append(("local", open_ms, run_queries(local, matrix, records, queries, args.companies, args.top_k)))
+
+    if args.pinecone:
+        namespace = f"bench-{uuid.uuid4().hex[:8]}"
+        started = time.perf_counter()
+        remote = PineconeVectorStore(args.pinecone_index, DIM, namespace=namespace)
+        open_ms = (time.perf_counter() - started) * 1000
+        try:
+            for start in range(0, len(records), 100):
+                remote.upsert(records[start:start + 100])
+            while remote.namespace_count(namespace) < len(records):
+                time.sleep(1)  # upserts are eventually consistent
+            rows.append(("pinecone", open_ms, run_queries(remote, matrix, records, queries, args.companies, args.top_k)))
+        finally:
+            remote.delete(delete_all=True)
+
+    for backend, open_ms, stats in rows:
+        print(f"{backend:<10}{open_ms:>9.1f}{stats['p50_ms']:>9.3f}{stats['p95_ms']:>9.3f}"
+              f"{stats['mean_ms']:>9.3f}{stats['recall']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""The company knowledge corpus and labelled questions used by the retrieval benchmarks.
+
+The corpus is the company description saved in /admin/company (description
+plus questionnaire answers, combined the way main.py indexes them) when the
+database has one, otherwise fixtures/company/profile.txt. Each question in
+fixtures/company/queries.jsonl names a phrase from the passage that answers
+it; a retrieved chunk is relevant when it contains that phrase.
+"""
+import json
+import os
+import sqlite3
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "company")
+
+
+def load_company_text(use_db=True):
+    """(text, source) of the company corpus."""
+    if use_db:
+        from tools.hr_jobs import DB_PATH
+        try:
+            conn = sqlite3.connect(DB_PATH)
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT description, {', '.join(f'q{i}' for i in range(1, 20))}
+                FROM company_info ORDER BY updated_at DESC LIMIT 1
+            """)
+            row = cursor.fetchone()
+            conn.close()
+        except sqlite3.Error:
+            row = None
+        if row and row[0]:
+            return row[0] + "\n\n" + "\n".join(filter(None, row[1:])), "database"
+    with open(os.path.join(FIXTURES, "profile.txt"), encoding="utf-8") as f:
+        return f.read(), "fixture"
+
+
+def load_queries():
+    with open(os.path.join(FIXTURES, "queries.jsonl"), encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def company_chunks(use_db=True):
+    """(chunks, source), split exactly as update_company_vectors splits them."""
+    from tools.about_syscraft import split_company_text
+    text, source = load_company_text(use_db)
+    return split_company_text(text), source
+
+
+def relevant_rows(chunks, query):
+    """Indexes of the chunks that answer a labelled query."""
+    phrase = query["relevant"].lower()
+    return {i for i, chunk in enumerate(chunks) if phrase in chunk.lower()}
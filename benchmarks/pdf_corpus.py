@@ -0,0 +1,89 @@
+"""Synthetic PDF corpus for the extraction benchmarks.
+
+Writes plain PDFs (Helvetica text plus ruled "table" lines on every page)
+without any third-party dependency, and returns the text that was written
+so extractors can be scored for fidelity.
+"""
+import os
+import random
+
+WORDS = (
+    "project scope timeline budget react node python django flask api cloud aws "
+    "docker kubernetes deployment testing design figma dashboard analytics mobile "
+    "android ios payment gateway authentication reporting module integration "
+    "database postgresql mongodb requirement milestone delivery support maintenance"
+).split()
+
+PAGE_COUNTS = (1, 2, 3, 5, 10, 20, 35, 50)
+LINES_PER_PAGE = 48
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_stream(lines):
+    ops = ["BT", "/F1 10 Tf", "13 TL", "50 790 Td"]
+    for line in lines:
+        ops.append(f"({_escape(line)}) Tj T*")
+    ops.append("ET")
+    # Table rules: pdfplumber has to process these objects on every page
+    ops.append("0.5 w")
+    for row in range(12):
+        y = 150 + row * 50
+        ops.append(f"40 {y} m 560 {y} l S")
+    for col in range(7):
+        x = 40 + col * 86
+        ops.append(f"{x} 150 m {x} 700 l S")
+    return "\n".join(ops).encode("latin-1")
+
+
+def write_text_pdf(path, pages):
+    """Write a PDF with one page per entry of `pages` (a list of text lines)."""
+    objects = []
+    page_ids = []
+    first_page_obj = 4
+    for i in range(len(pages)):
+        page_ids.append(first_page_obj + i * 2)
+
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for pid, lines in zip(page_ids, pages):
+        stream = _page_stream(lines)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {pid + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref_at = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode()
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def build_corpus(directory, page_counts=PAGE_COUNTS, seed=7):
+    """Create one PDF per page count; returns [(path, page_count, expected_text)]."""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    corpus = []
+    for count in page_counts:
+        pages = [
+            [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(LINES_PER_PAGE)]
+            for _ in range(count)
+        ]
+        path = os.path.join(directory, f"brief_{count:02d}p.pdf")
+        write_text_pdf(path, pages)
+        corpus.append((path, count, "\n".join("\n".join(lines) for lines in pages)))
+    return corpus
@@ -19,6 +19,7 @@ from datetime import datetime
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 from langchain_core.messages import SystemMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.checkpoint.memory import MemorySaver
 memory = MemorySaver()
 
@@ -32,8 +33,23 @@ class State(TypedDict):
     # in the annotation defines how this state key should be updated
     # (in this case, it appends messages to the list, rather than overwriting them)
     messages: Annotated[list, add_messages]
+    # Current date and pre-retrieved company passages for this turn only;
+    # replaced on every chat() call, never added to the message history
+    context: str
 
 from tools.hr_jobs import save_job_application, get_active_job_openings
+from tools.job_matching import rank_jobs_for_resume, schedule_application_embedding
+from tools.upload_store import add_upload_ref
+from tools.resume_condenser import condensed_resume_block, get_raw_resume, RESUME_CONDENSE
+from tools.tool_compaction import (
+    compact_tool_output, get_tool_output, record_prompt, prune_answered_tool_messages
+)
+from tools.pre_retrieval import start_pre_retrieval, turn_context, record_turn
+
+
+def session_of(config: RunnableConfig) -> str:
+    """The chat session (checkpointer thread id) a tool or graph node runs for."""
+    return config["configurable"]["thread_id"]
 
 
 import base64
@@ -73,11 +89,16 @@ def save_job_application_tool(
     print("nawab ye Resume:-", resume_content)
 
     try:
-        resume_content = safe_extract_text(resume_content)
+        extracted_text = safe_extract_text(resume_content)
 
         application_id, _ = save_job_application(
-            name, email, phone, position, resume_filename, resume_content, file_path
+            name, email, phone, position, resume_filename, resume_content, file_path,
+            extracted_text=extracted_text
         )
+        # Keeps the uploaded file alive for as long as the application exists
+        add_upload_ref(file_path, "application", application_id)
+        # Ready for the shortlists without embedding it when an admin opens one
+        schedule_application_embedding()
 
         return {
             "status": "success",
@@ -128,73 +149,72 @@ def save_sales_inquiry_tool(name: str, email: str, phone_number: str, subject: s
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+TECH_KEYWORDS = [
+    'python', 'java', 'javascript', 'react', 'node', 'sql', 'mongodb', 
+    'aws', 'docker', 'kubernetes', 'machine learning', 'data science',
+    'frontend', 'backend', 'fullstack', 'devops', 'cloud', 'api',
+    'html', 'css', 'angular', 'vue', 'express', 'django', 'flask',
+    'git', 'agile', 'scrum', 'leadership', 'management'
+]
+
+def matched_keywords(resume_text: str, job_text: str) -> list:
+    """Tech keywords present in both the resume and the job text."""
+    resume_lower = resume_text.lower()
+    job_lower = job_text.lower()
+    return [k for k in TECH_KEYWORDS if k in resume_lower and k in job_lower]
+
 @tool("analyze_resume_for_roles")
-def analyze_resume_for_roles_tool(resume_text: str) -> dict:
+def analyze_resume_for_roles_tool(resume_text: str = "", resume_id: str = "", config: RunnableConfig = None) -> dict:
     """
-    Analyze resume text and match it against available job openings.
+    Rank the available job openings for a resume using semantic similarity.
+    The ranking is already computed - just present the top roles with their
+    match percentage and the matched skills to the user.
     
     Args:
         resume_text: The extracted text from the resume
+        resume_id: The Resume ID of a condensed resume profile (preferred over resume_text)
     
     Returns:
-        dict: Analysis results with role recommendations
+        dict: Ranked roles with match percentages
     """
     try:
-        # Get active job openings
-        jobs = get_active_job_openings()
-        
-        if not jobs:
-            return {
-                "success": False,
-                "error": "No active job openings found"
-            }
-        
-        # Simple keyword matching (you can enhance this with ML/NLP)
-        resume_lower = resume_text.lower()
-        role_matches = []
-        
-        for job in jobs:
-            score = 0
-            matched_skills = []
-            
-            # Extract keywords from job requirements
-            job_text = f"{job.get('title', '')} {job.get('description', '')} {job.get('requirements', '')}".lower()
-            
-            # Common tech keywords for scoring
-            tech_keywords = [
-                'python', 'java', 'javascript', 'react', 'node', 'sql', 'mongodb', 
-                'aws', 'docker', 'kubernetes', 'machine learning', 'data science',
-                'frontend', 'backend', 'fullstack', 'devops', 'cloud', 'api',
-                'html', 'css', 'angular', 'vue', 'express', 'django', 'flask',
-                'git', 'agile', 'scrum', 'leadership', 'management'
-            ]
-            
-            for keyword in tech_keywords:
-                if keyword in resume_lower and keyword in job_text:
-                    score += 1
-                    matched_skills.append(keyword)
-            
-            if score > 0:
-                role_matches.append({
-                    "job": job,
-                    "score": score,
-                    "matched_skills": matched_skills,
-                    "match_percentage": min(100, (score * 10))  # Cap at 100%
-                })
-        
-        # Sort by score
-        role_matches.sort(key=lambda x: x['score'], reverse=True)
-        
+        if resume_id:
+            resume_text = get_raw_resume(resume_id, session_of(config)) or resume_text
+        if not resume_text:
+            return {"success": False, "error": "No resume text found for this resume_id"}
+
+        ranking = rank_jobs_for_resume(resume_text, top_k=5)
+        if not ranking["success"]:
+            return ranking
+
+        jobs_by_id = {job["id"]: job for job in get_active_job_openings()}
+        for match in ranking["matches"]:
+            job = jobs_by_id.get(match["id"], {})
+            match["matched_skills"] = matched_keywords(
+                resume_text, f"{job.get('title', '')} {job.get('description', '')} {job.get('requirements', '')}"
+            )
+
         return {
             "success": True,
-            "total_jobs": len(jobs),
-            "matching_roles": role_matches[:5],  # Top 5 matches
-            "analysis_summary": f"Found {len(role_matches)} matching roles out of {len(jobs)} available positions"
+            "total_jobs": ranking["total_jobs"],
+            "matching_roles": ranking["matches"],
+            "analysis_summary": f"Ranked {ranking['total_jobs']} open positions against the resume"
         }
         
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@tool("get_resume_text")
+def get_resume_text_tool(resume_id: str, config: RunnableConfig) -> str:
+    """
+    Get the full extracted text of an uploaded resume. Only needed when the
+    condensed resume profile does not answer the question.
+
+    Args:
+        resume_id: The Resume ID shown in the condensed resume profile
+    """
+    return get_raw_resume(resume_id, session_of(config)) or "No resume found for this resume_id."
+
 @tool
 def get_date_and_time(query: str) -> str:
     """
@@ -216,6 +236,17 @@ def get_company_info(query: str) -> str:
     results = search_company_info(query)
     return results
 
+@tool("get_tool_output")
+def get_tool_output_tool(ref: str, config: RunnableConfig) -> str:
+    """
+    Get the full output of an earlier tool call whose result was compacted.
+    Only needed when the compacted result does not answer the question.
+
+    Args:
+        ref: The ref shown at the end of the compacted tool result
+    """
+    return get_tool_output(ref, session_of(config)) or "No stored tool output for this ref."
+
 
 # Updated tools list
 tools = [
@@ -224,7 +255,9 @@ tools = [
     get_job_openings_tool, 
     save_sales_inquiry_tool,
     analyze_resume_for_roles_tool,
-    get_company_info
+    get_resume_text_tool,
+    get_company_info,
+    get_tool_output_tool
 ]
 
 # llm = init_chat_model("google_genai:gemini-2.0-flash")
@@ -335,12 +368,14 @@ You are **Syscraft AI**, an advanced recruitment, HR, and business assistant for
 ---
 
 ### 🔧 Available Tools
-- `get_date_and_time` → Current timestamp  
+- `get_date_and_time` → Current timestamp (the current date is already given below; only needed for the exact time)  
 - `get_job_openings` → Fetch job openings  
 - `save_job_application` → Process applications  
 - `save_sales_inquiry` → Capture sales leads  
-- `analyze_resume_for_roles` → Match resumes to roles  
+- `analyze_resume_for_roles` → Ranked role matches for a resume (pass its Resume ID; narrate them, don't re-rank)  
+- `get_resume_text` → Full resume text by Resume ID, only when the condensed profile is not enough  
 - `get_company_info` → Retrieve company details  
+- `get_tool_output` → Full result of a compacted tool call by its ref, only when the compact result is not enough  
 
 ---
 
@@ -385,17 +420,44 @@ Your goal: be **helpful, concise, and user-friendly** so users never feel bored.
 """
 )
 
-def chatbot(state: State):
+def chatbot(state: State, config: RunnableConfig):
     messages = state["messages"]
     
     if not any(isinstance(msg, SystemMessage) for msg in messages):
-        messages = [SYSTEM_PROMPT] + messages
-
-    return {"messages": [llm_with_tools.invoke(messages)]}
+        system_prompt = SYSTEM_PROMPT
+        if state.get("context"):
+            # Gemini takes a single system instruction, so the turn context joins it
+            system_prompt = SystemMessage(content=f"{SYSTEM_PROMPT.content}\n---\n\n{state['context']}")
+        messages = [system_prompt] + messages
+
+    record_prompt(messages)
+    response = llm_with_tools.invoke(messages)
+    if response.tool_calls:
+        return {"messages": [response]}
+
+    # The turn is answered: the tool results it used become digests (same
+    # ids, so add_messages replaces them in place) and stop weighing on
+    # every later prompt and checkpoint
+    answered = prune_answered_tool_messages(state["messages"] + [response], session_of(config))
+    return {"messages": answered + [response]}
+
+tool_node = ToolNode(tools)
+
+def tools_with_compaction(state: State, config: RunnableConfig):
+    """Run the requested tools, then compact their outputs before they enter the state."""
+    result = tool_node.invoke(state, config)
+    for message in result["messages"]:
+        if getattr(message, "status", "success") == "error":
+            continue
+        content, info = compact_tool_output(message.name, message.content, session_of(config))
+        if info:
+            message.content = content
+            message.response_metadata = {**message.response_metadata, "compaction": info}
+    return result
 
 builder = StateGraph(State)
 builder.add_node(chatbot)
-builder.add_node("tools", ToolNode(tools))
+builder.add_node("tools", tools_with_compaction)
 builder.add_edge(START, "chatbot")
 builder.add_conditional_edges("chatbot", tools_condition)
 builder.add_edge("tools", "chatbot")
@@ -485,7 +547,7 @@ def extract_resume_data(resume_data: str) -> tuple:
 
 
 
-def chat(message: str, session: str, resume_data: dict | str = None) -> dict:
+def chat(message: str, session: str, resume_data: dict | str = None, include_raw_resume: bool = False) -> dict:
     """
     Main chat function that processes user messages and resume data.
     
@@ -493,17 +555,29 @@ def chat(message: str, session: str, resume_data: dict | str = None) -> dict:
         message: User's message
         session: Session ID for conversation continuity
         resume_data: Optional resume data (dict with filename, base64_content, extracted_text OR plain string)
+        include_raw_resume: Put the full extracted text in the prompt instead of the condensed profile
     
     Returns:
         Formatted response as JSON string
     """
     try:
         config = {'configurable': {'thread_id': session}}
+
+        # Company search runs while the resume block below is prepared
+        pre_retrieval = start_pre_retrieval(message)
         
         # Process resume data if provided
         enhanced_message = message
         if resume_data:
-            if isinstance(resume_data, dict):
+            if isinstance(resume_data, dict) and RESUME_CONDENSE and not include_raw_resume:
+                # Compact profile; the model can fetch the raw text with get_resume_text
+                enhanced_message += (
+                    f"\n\n[USER_RESUME]\n"
+                    f"Filename: {resume_data.get('filename')}\n"
+                    f"{condensed_resume_block(resume_data.get('extracted_text') or '', session)}\n"
+                    f"[/USER_RESUME]"
+                )
+            elif isinstance(resume_data, dict):
                 # Structured payload with filename and extracted text
                 enhanced_message += (
                     f"\n\n[USER_RESUME]\n"
@@ -515,11 +589,17 @@ def chat(message: str, session: str, resume_data: dict | str = None) -> dict:
                 # Fallback for raw string resume data
                 enhanced_message += f"\n\n[USER_RESUME]\n{resume_data}\n[/USER_RESUME]"
 
+        context, pre_retrieved = turn_context(pre_retrieval)
+
         # Invoke the graph (LangGraph will also handle tool calls if registered)
         state = graph.invoke(
-            {"messages": [{"role": "user", "content": enhanced_message}]}, 
+            {"messages": [{"role": "user", "content": enhanced_message}], "context": context}, 
             config=config
         )
+
+        # Model calls this turn: the assistant messages after the user's message
+        turn_start = max(i for i, msg in enumerate(state["messages"]) if msg.type == "human")
+        record_turn(pre_retrieved, sum(1 for msg in state["messages"][turn_start:] if msg.type == "ai"))
         
         # Extract the last assistant message
         response = state["messages"][-1].content
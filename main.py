@@ -10,7 +10,6 @@ from flask import (
 
 # Document parsing
 # import fitz  # PyMuPDF
-from docx import Document
 
 # Import chat function
 from chat2 import chat
@@ -19,12 +18,22 @@ from functools import wraps
 # Import tools
 from tools.enquiry import get_contacts, get_contact_by_id, delete_contact, update_contact, add_contact
 from tools.hr_jobs import (
-    get_active_job_openings, get_all_applications, get_job_application,
-    add_job_opening, init_hr_db
+    get_active_job_openings, get_job_application,
+    add_job_opening, init_hr_db, get_applications_page, get_recent_applications,
+    count_applications, get_application_filter_options, prune_resume_blobs
+)
+from tools.upload_store import (
+    store_upload, store_upload_bytes, read_small_upload, add_upload_ref, release_upload_refs,
+    collect_upload_garbage, resolve_upload_path, upload_reference
+)
+from tools.job_matching import (
+    rank_jobs_for_resume, schedule_shortlist_refresh, get_job_shortlist
 )
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
 app.secret_key = "syscraft_secret_key_2025"
+# Largest request body Flask accepts (a batch of resumes included); larger uploads get a 413
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_UPLOAD_MB", "200")) * 1024 * 1024
 
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -34,31 +43,45 @@ os.makedirs("admin_templates", exist_ok=True)
 # ---------------------------
 # Utility functions
 # ---------------------------
-import pdfplumber
-from docx import Document
+from tools.extraction_cache import cached_extract, file_digest, bytes_digest, get_cached_extraction
+from tools.extraction_engines import extract_document, engine_chain_key, EXTRACTOR_VERSION
+from tools.batch_ingest import start_ingest_job, get_ingest_job
 
-def extract_text_from_file(file_path: str) -> str:
-    text = ""
+# /upload_document only returns a preview; parsing stops once this much text is read
+UPLOAD_PREVIEW_CHARS = 5000
+
+def _extract_text_from_file(source, max_chars=None, ext=None):
     try:
-        if file_path.lower().endswith(".pdf"):
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-        elif file_path.lower().endswith(".docx"):
-            doc = Document(file_path)
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    text += para.text + "\n"
-        elif file_path.lower().endswith(".txt"):
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                text = f.read()
-        else:
-            text = "[Unsupported file type uploaded]"
+        # First installed engine for the format that returns text (see tools/extraction_engines.py)
+        text, pages = extract_document(source, max_chars=max_chars, ext=ext)
     except Exception as e:
-        text = f"[Error extracting text: {str(e)}]"
-    return text.strip()
+        text, pages = f"[Error extracting text: {str(e)}]", None
+    return text.strip(), pages
+
+def _cached_document_text(digest, ext, source, max_chars):
+    extractor = engine_chain_key(ext, max_chars=max_chars)
+    if max_chars:
+        # A full extraction already on hand covers any budget
+        full = get_cached_extraction(digest, engine_chain_key(ext), EXTRACTOR_VERSION)
+        if full is not None:
+            return full["text"][:max_chars]
+    return cached_extract(
+        digest, extractor, EXTRACTOR_VERSION,
+        lambda: _extract_text_from_file(source, max_chars, ext)
+    )
+
+def extract_text_from_file(file_path: str, max_chars=None) -> str:
+    ext = os.path.splitext(file_path)[1].lower()
+    if not engine_chain_key(ext) or not os.path.exists(file_path):
+        return _extract_text_from_file(file_path, max_chars)[0]
+    return _cached_document_text(file_digest(file_path), ext, file_path, max_chars)
+
+def extract_text_from_bytes(data: bytes, filename: str, max_chars=None) -> str:
+    """Same as extract_text_from_file for an upload held in memory."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if not engine_chain_key(ext):
+        return _extract_text_from_file(data, max_chars, ext)[0]
+    return _cached_document_text(bytes_digest(data), ext, data, max_chars)
 
 
 
@@ -221,28 +244,30 @@ def upload_file():
     if not file.filename.lower().endswith((".pdf", ".docx", ".txt")):
         return jsonify({"status": "error", "error": "Only PDF, DOCX, TXT allowed"}), 400
 
-    # Rename file -> <session_id>_resume.<ext>
-    ext = os.path.splitext(file.filename)[1]   # keep extension (.pdf, .docx, etc.)
-    new_filename = f"{session_id}_resume{ext}"
-    filepath = os.path.join(UPLOAD_FOLDER, new_filename)
+    # Stored once under its SHA-256 digest; the session holds a reference.
+    # Small files are parsed from the in-memory copy instead of being read back.
+    data = read_small_upload(file)
+    stored = store_upload_bytes(data, file.filename) if data is not None else store_upload(file)
+    add_upload_ref(stored["digest"], "session", session_id)
 
-    # Save renamed file
-    file.save(filepath)
-
-    # Extract text + base64
-    text_content = extract_text_from_file(filepath)
+    if data is not None:
+        text_content = extract_text_from_bytes(data, file.filename)
+    else:
+        text_content = extract_text_from_file(os.path.join(UPLOAD_FOLDER, stored["path"]))
 
     resume_payload = {
-        "filename": new_filename,
-        "filepath": f"The file path is: uploads/{new_filename}",
+        "filename": file.filename,
+        "filepath": f"The file path is: {stored['path']}",
         "extracted_text": text_content.strip()
     }
-    save_message(session_id, "user", f"Here is my Document: + {text_content.strip()}")
+    save_message(session_id, "user", f"Here is my Document: {upload_reference(stored)}")
     # Call chat with structured resume data
     ai_reply = chat(
         message="Here is my Document:",
         session=session_id,
-        resume_data=resume_payload
+        resume_data=resume_payload,
+        # raw_resume=1 sends the full text instead of the condensed profile
+        include_raw_resume=request.form.get("raw_resume") == "1"
     )
     file.close()
 
@@ -255,7 +280,8 @@ def upload_file():
 
     return jsonify({
         "status": "success",
-        "filename": new_filename,
+        "filename": file.filename,
+        "file_id": stored["digest"],
         "plain_text": text_content.strip(),
         "analysis": data
     })
@@ -271,17 +297,29 @@ def upload_document():
     if file.filename == "":
         return jsonify({"error": "No file selected"}), 400
 
-    file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(file_path)
+    session_id = request.form.get("session_id")
+
+    data = read_small_upload(file)
+    if data is not None:
+        extracted_text = extract_text_from_bytes(data, file.filename, max_chars=UPLOAD_PREVIEW_CHARS)
+        # Only written to disk when a session keeps a reference to it
+        file_id = store_upload_bytes(data, file.filename)["digest"] if session_id else bytes_digest(data)
+    else:
+        stored = store_upload(file)
+        file_id = stored["digest"]
+        extracted_text = extract_text_from_file(os.path.join(UPLOAD_FOLDER, stored["path"]), max_chars=UPLOAD_PREVIEW_CHARS)
 
-    extracted_text = extract_text_from_file(file_path)
-    os.remove(file_path)
+    if session_id:
+        add_upload_ref(file_id, "session", session_id)
+    # Without a session nothing refers to a streamed upload; collect_upload_garbage
+    # removes it once it is past the grace period
 
     return jsonify({
         "status": "success",
         "message": "Document processed",
         "filename": file.filename,
-        "extracted_text": extracted_text[:5000]
+        "file_id": file_id,
+        "extracted_text": extracted_text
     })
 
 
@@ -390,7 +428,8 @@ import ast  # to safely parse stringified dicts
 def dashboard():
     # Fetch data
     contacts = get_contacts()
-    applications = get_all_applications()
+    total_applications = count_applications()
+    recent_applications = get_recent_applications(5)
     job_openings = get_active_job_openings()
     all_history = fetch_all_history()  # {session_id: [{role, message, time}, ...], ...}
     chat_sessions = fetch_all_sessions()  # list of session_ids
@@ -431,11 +470,11 @@ def dashboard():
 
     stats = {
         "total_contacts": len(contacts),
-        "total_applications": len(applications),
+        "total_applications": total_applications,
         "total_job_openings": len(job_openings),
         "total_chat_sessions": len(chat_sessions),
         "recent_contacts": contacts[-5:] if contacts else [],
-        "recent_applications": applications[:5] if applications else [],
+        "recent_applications": recent_applications,
         "recent_sessions": recent_sessions if recent_sessions else []
     }
 
@@ -541,8 +580,49 @@ def add_contact_route():
 @app.route("/admin/applications")
 @login_required
 def applications_list():
-    applications = get_all_applications()
-    return render_template("admin_applications.html", applications=applications)
+    filters = {
+        "status": request.args.get("status") or None,
+        "position": request.args.get("position") or None,
+        "date_from": request.args.get("date_from") or None,
+        "date_to": request.args.get("date_to") or None,
+    }
+    result = get_applications_page(
+        page=request.args.get("page", 1, type=int),
+        per_page=request.args.get("per_page", 25, type=int),
+        **filters
+    )
+    return render_template(
+        "admin_applications.html",
+        applications=result["applications"],
+        pagination=result,
+        filters=filters,
+        active_filters={k: v for k, v in filters.items() if v},
+        filter_options=get_application_filter_options()
+    )
+
+@app.route("/admin/applications/batch_upload", methods=["POST"])
+@login_required
+def batch_upload_applications():
+    """Start importing many resumes (files or zips); poll batch_upload_status for progress."""
+    # Streamed to disk one by one; the job reads them back as it goes
+    uploads = [store_upload(f) for f in request.files.getlist("resumes") if f and f.filename]
+    if not uploads:
+        return jsonify({"status": "error", "error": "No files uploaded"}), 400
+
+    job_id = start_ingest_job(
+        uploads,
+        position=request.form.get("position") or None,
+        summarize=request.form.get("summarize") == "1"
+    )
+    return jsonify({"status": "accepted", "job_id": job_id}), 202
+
+@app.route("/admin/applications/batch_upload/<job_id>")
+@login_required
+def batch_upload_status(job_id):
+    job = get_ingest_job(job_id, since=request.args.get("since", 0, type=int))
+    if not job:
+        return jsonify({"status": "error", "error": "Unknown batch"}), 404
+    return jsonify(job)
 
 @app.route("/admin/applications/<int:app_id>")
 @login_required
@@ -559,6 +639,9 @@ def delete_application(app_id):
     cursor.execute("DELETE FROM job_applications WHERE id = ?", (app_id,))
     conn.commit()
     conn.close()
+    prune_resume_blobs()
+    release_upload_refs("application", app_id)
+    collect_upload_garbage()
     
     flash("Application deleted successfully!", "success")
     return redirect(url_for("applications_list"))
@@ -594,15 +677,13 @@ from flask import send_file, current_app, flash, redirect, url_for
 @app.route("/admin/applications/<int:app_id>/download_resume")
 @login_required
 def download_resume(app_id):
-    application = get_job_application(app_id)
+    application = get_job_application(app_id, include_resume=False)
 
     if application and application.get('file_path'):
         try:
-            # Build full path (uploads folder + stored filename)
-            uploads_folder = os.path.join(current_app.root_path, "uploads")
-            full_path = os.path.join(uploads_folder, application['file_path'])
+            full_path = resolve_upload_path(application['file_path'])
 
-            if not os.path.exists(full_path):
+            if not full_path:
                 flash("File not found on server!", "error")
                 return redirect(url_for("application_detail", app_id=app_id))
 
@@ -644,7 +725,9 @@ def add_job():
         employment_type = request.form.get("employment_type", "Full-time")
         
         from tools.hr_jobs import add_job_opening
-        add_job_opening(title, department, description, requirements, location, employment_type)
+        job_id = add_job_opening(title, department, description, requirements, location, employment_type)
+        # Embeds the job and scores its applicants in the background
+        schedule_shortlist_refresh(job_id)
         flash("Job opening added successfully!", "success")
         return redirect(url_for("jobs_list"))
     
@@ -672,6 +755,7 @@ def edit_job(job_id):
         """, (title, department, description, requirements, location, employment_type, is_active, job_id))
         conn.commit()
         conn.close()
+        schedule_shortlist_refresh(job_id)
         
         flash("Job opening updated successfully!", "success")
         return redirect(url_for("jobs_list"))
@@ -702,10 +786,56 @@ def delete_job(job_id):
     cursor.execute("DELETE FROM job_openings WHERE id = ?", (job_id,))
     conn.commit()
     conn.close()
+    # Drops the job's vector and shortlist in the background
+    schedule_shortlist_refresh(job_id)
     
     flash("Job opening deleted successfully!", "success")
     return redirect(url_for("jobs_list"))
 
+@app.route("/admin/jobs/<int:job_id>/shortlist")
+@login_required
+def job_shortlist(job_id):
+    conn = sqlite3.connect("tools/hr_applications.db")
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, title, department FROM job_openings WHERE id = ?", (job_id,))
+    job = cursor.fetchone()
+    conn.close()
+
+    if not job:
+        flash("Job not found!", "error")
+        return redirect(url_for("jobs_list"))
+
+    # Stored scores; applications saved since the last run are scored in the
+    # background and show up on the next load
+    shortlist = get_job_shortlist(job_id)
+    schedule_shortlist_refresh(job_id)
+    job_dict = {"id": job[0], "title": job[1], "department": job[2]}
+    return render_template("admin_job_shortlist.html", job=job_dict, shortlist=shortlist)
+
+@app.route("/admin/api/match_resume", methods=["POST"])
+@login_required
+def match_resume_api():
+    """Rank active jobs for a resume text or a stored application."""
+    payload = request.get_json(force=True) or {}
+    resume_text = payload.get("resume_text")
+    try:
+        top_k = int(payload.get("top_k", 5))
+        application_id = int(payload["application_id"]) if payload.get("application_id") else None
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "error": "'top_k' and 'application_id' must be integers"}), 400
+    if top_k < 1:
+        return jsonify({"status": "error", "error": "'top_k' must be at least 1"}), 400
+
+    if not resume_text and application_id:
+        application = get_job_application(application_id)
+        resume_text = application.get("resume_text") if application else None
+
+    if not resume_text:
+        return jsonify({"status": "error", "error": "Provide 'resume_text' or a valid 'application_id'"}), 400
+
+    ranking = rank_jobs_for_resume(resume_text, top_k=top_k)
+    return jsonify({"status": "success" if ranking["success"] else "error", "data": ranking})
+
 # ===== DATABASE MANAGEMENT =====
 @app.route("/admin/database")
 @login_required
@@ -735,6 +865,17 @@ def backup_database():
     
     return redirect(url_for("database_management"))
 
+@app.route("/admin/database/gc_uploads", methods=["POST"])
+@login_required
+def gc_uploads():
+    try:
+        removed = collect_upload_garbage()
+        flash(f"Removed {removed} unreferenced uploaded files.", "success")
+    except Exception as e:
+        flash(f"Upload cleanup failed: {str(e)}", "error")
+
+    return redirect(url_for("database_management"))
+
 @app.route("/admin/database/clear_contacts", methods=["POST"])
 @login_required
 def clear_contacts():
@@ -759,13 +900,41 @@ def clear_applications():
         cursor.execute("DELETE FROM job_applications")
         conn.commit()
         conn.close()
+        prune_resume_blobs()
+        release_upload_refs("application")
+        collect_upload_garbage()
         flash("All job applications cleared successfully!", "success")
     except Exception as e:
         flash(f"Error clearing applications: {str(e)}", "error")
     
     return redirect(url_for("database_management"))
 
-from tools.about_syscraft import update_company_vectors
+from tools.about_syscraft import update_company_vectors, warm_up, readiness
+import multiprocessing
+
+# Load the embedding model and resolve the vector index in the background so
+# the first company question doesn't pay for it. Skipped in child processes
+# started with the spawn method, which re-import this module.
+if os.getenv("COMPANY_KB_WARMUP", "1") != "0" and multiprocessing.parent_process() is None:
+    warm_up(background=True)
+
+@app.route("/admin/api/knowledge_status")
+@login_required
+def knowledge_status():
+    return jsonify(readiness())
+
+from tools.tool_compaction import compaction_stats
+from tools.pre_retrieval import pre_retrieval_stats
+
+@app.route("/admin/api/tool_compaction_stats")
+@login_required
+def tool_compaction_status():
+    return jsonify(compaction_stats())
+
+@app.route("/admin/api/pre_retrieval_stats")
+@login_required
+def pre_retrieval_status():
+    return jsonify(pre_retrieval_stats())
 
 def update_company_vectors_info(description):
  
@@ -17,6 +17,7 @@ from chat2 import chat
 
 # Import tools
 from tools.enquiry import get_contacts, get_contact_by_id, delete_contact, update_contact, add_contact
+from tools.upload_store import resolve_upload_path
 from tools.hr_jobs import (
     get_active_job_openings, get_all_applications, get_job_application,
     add_job_opening, init_hr_db
@@ -275,6 +276,11 @@ def delete_application(app_id):
 @app.route("/admin/applications/<int:app_id>/download_resume")
 def download_resume(app_id):
     application = get_job_application(app_id)
+    # The stored upload when there is one; older chat applications only have the base64 body
+    full_path = resolve_upload_path(application.get('file_path')) if application else None
+    if full_path:
+        from flask import send_file
+        return send_file(full_path, as_attachment=True, download_name=application['resume_filename'])
     if application and application.get('resume_content'):
         try:
             # Decode base64 resume content
@@ -0,0 +1,60 @@
+import hashlib
+import os
+import re
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+# Scratch storage for the whole run. Must be set before the tools modules
+# read their configuration: they create their tables at import.
+SCRATCH = tempfile.mkdtemp(prefix="syscraft_tests_")
+os.environ["HR_DB_PATH"] = os.path.join(SCRATCH, "hr_applications.db")
+os.environ["EXTRACTION_CACHE_DB_PATH"] = os.path.join(SCRATCH, "extraction_cache.db")
+os.environ["LOCAL_VECTOR_DIR"] = os.path.join(SCRATCH, "vector_index")
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ["EXTRACTION_SANDBOX"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeEmbedder:
+    """Bag-of-words hashed into 384 dimensions: deterministic and needs no model."""
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, sentences, batch_size=32, normalize_embeddings=True, **_):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        self.encoded += len(texts)
+        out = np.zeros((len(texts), 384), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                out[row, int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % 384] += 1.0
+            out[row, 0] += 1e-3  # keeps empty texts away from the zero vector
+        out /= np.linalg.norm(out, axis=1, keepdims=True)
+        return out[0] if single else out
+
+
+@pytest.fixture
+def fake_embedder(monkeypatch):
+    from tools import about_syscraft
+
+    embedder = FakeEmbedder()
+    monkeypatch.setattr(about_syscraft, "_embedder", embedder)
+    return embedder
+
+
+@pytest.fixture
+def company_index(tmp_path, monkeypatch, fake_embedder):
+    """A fresh local company index; texts are split on blank lines instead of by LangChain."""
+    from tools import about_syscraft
+    from tools.vector_store import LocalVectorStore
+
+    index = LocalVectorStore(str(tmp_path / "company-descriptions"), about_syscraft.DIM)
+    monkeypatch.setattr(about_syscraft, "_index", index)
+    monkeypatch.setattr(about_syscraft, "split_company_text",
+                        lambda text: [part.strip() for part in text.split("\n\n") if part.strip()])
+    return index
@@ -0,0 +1,53 @@
+from tools import about_syscraft
+from tools.about_syscraft import update_company_vectors
+
+PROFILE = "We build web apps.\n\nOur office is in Indore.\n\nWe hire Python developers."
+
+
+def company_ids(index, company_id="default_company"):
+    return about_syscraft._company_vector_ids(index, company_id)
+
+
+def test_first_save_embeds_every_chunk_in_one_call(company_index, fake_embedder):
+    summary = update_company_vectors(PROFILE)
+
+    assert summary == {"added": 3, "deleted": 0, "unchanged": 0}
+    assert fake_embedder.encoded == 3
+    assert len(company_ids(company_index)) == 3
+
+
+def test_unchanged_profile_embeds_nothing(company_index, fake_embedder):
+    update_company_vectors(PROFILE)
+    fake_embedder.encoded = 0
+
+    assert update_company_vectors(PROFILE) == {"added": 0, "deleted": 0, "unchanged": 3}
+    assert fake_embedder.encoded == 0
+
+
+def test_edit_replaces_only_the_changed_chunk(company_index, fake_embedder):
+    update_company_vectors(PROFILE)
+    before = company_ids(company_index)
+    fake_embedder.encoded = 0
+
+    edited = PROFILE.replace("Indore", "Bhopal")
+    assert update_company_vectors(edited) == {"added": 1, "deleted": 1, "unchanged": 2}
+    assert fake_embedder.encoded == 1
+    after = company_ids(company_index)
+    assert len(after) == 3
+    assert len(before & after) == 2
+
+
+def test_other_companies_are_left_alone(company_index):
+    update_company_vectors(PROFILE, company_id="acme")
+    update_company_vectors("Something else entirely.", company_id="acme_labs")
+
+    assert update_company_vectors("Only one chunk now.", company_id="acme") == {"added": 1, "deleted": 3, "unchanged": 0}
+    assert len(company_ids(company_index, "acme_labs")) == 1
+
+
+def test_cached_results_are_dropped_after_an_update(company_index):
+    update_company_vectors(PROFILE)
+    generation = about_syscraft.index_generation()
+
+    update_company_vectors(PROFILE + "\n\nWe also do data science.")
+    assert about_syscraft.index_generation() != generation
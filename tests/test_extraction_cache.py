@@ -0,0 +1,84 @@
+import pytest
+
+from tools import extraction_cache
+from tools.extraction_cache import bytes_digest, cached_extract, get_cached_extraction
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction_cache, "CACHE_DB_PATH", str(tmp_path / "extraction_cache.db"))
+    extraction_cache.init_extraction_cache()
+    return extraction_cache
+
+
+class Extractor:
+    """Counts calls; returns whatever result it was given."""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.result
+
+
+def test_hit_skips_the_extractor(cache):
+    digest = bytes_digest(b"%PDF resume")
+    extract = Extractor(("Resume text", {"pages": 1}))
+
+    assert cached_extract(digest, "pdfplumber", "1", extract) == "Resume text"
+    assert cached_extract(digest, "pdfplumber", "1", extract) == "Resume text"
+    assert extract.calls == 1
+    assert get_cached_extraction(digest, "pdfplumber", "1")["pages"] == {"pages": 1}
+
+
+@pytest.mark.parametrize("extractor, version", [("pdfplumber", "2"), ("pypdf2", "1")])
+def test_other_extractor_or_version_misses(cache, extractor, version):
+    digest = bytes_digest(b"%PDF resume")
+    cached_extract(digest, "pdfplumber", "1", Extractor("old text"))
+
+    extract = Extractor("new text")
+    assert cached_extract(digest, extractor, version, extract) == "new text"
+    assert extract.calls == 1
+    assert get_cached_extraction(digest, "pdfplumber", "1")["text"] == "old text"
+
+
+@pytest.mark.parametrize("result", [
+    "[Error extracting PDF: broken xref]",
+    "[Unsupported file type: .xyz]",
+    ("Page one only", {"complete": False}),
+    "",
+])
+def test_errors_and_partial_results_are_not_cached(cache, result):
+    digest = bytes_digest(b"bad file")
+    extract = Extractor(result)
+    cached_extract(digest, "pdfplumber", "1", extract)
+    cached_extract(digest, "pdfplumber", "1", extract)
+    assert extract.calls == 2
+    assert get_cached_extraction(digest, "pdfplumber", "1") is None
+
+
+def test_least_recently_used_entries_are_evicted(cache, monkeypatch):
+    monkeypatch.setattr(cache, "MAX_CACHE_BYTES", 250)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(cache.time, "time", lambda: next(clock))
+    digests = [bytes_digest(bytes([n])) for n in range(3)]
+    for digest in digests:
+        cache.put_cached_extraction(digest, "txt", "1", "x" * 100)
+
+    assert get_cached_extraction(digests[0], "txt", "1") is None
+    assert get_cached_extraction(digests[1], "txt", "1") is not None
+    assert get_cached_extraction(digests[2], "txt", "1") is not None
+
+
+def test_blob_paths_are_not_rehashed(tmp_path):
+    digest = bytes_digest(b"stored upload")
+    blob = tmp_path / "blobs" / digest[:2] / f"{digest}.pdf"
+    blob.parent.mkdir(parents=True)
+    blob.write_bytes(b"different bytes")
+
+    loose = tmp_path / "cv.pdf"
+    loose.write_bytes(b"stored upload")
+    assert extraction_cache.file_digest(str(blob)) == digest
+    assert extraction_cache.file_digest(str(loose)) == digest
@@ -0,0 +1,58 @@
+import pytest
+
+from tools import job_matching
+from tools.hr_jobs import add_job_opening, get_active_job_openings
+
+RESUME = """Summary
+Backend developer building Python and Django services.
+
+Skills
+Python, Django, PostgreSQL, REST APIs
+"""
+
+
+@pytest.fixture
+def jobs(fake_embedder):
+    if len(get_active_job_openings()) < 2:
+        add_job_opening("Python Developer", "Engineering", "Build Django services", "Python, Django")
+        add_job_opening("HR Executive", "Human Resources", "Run hiring drives", "Recruiting")
+    return get_active_job_openings()
+
+
+@pytest.mark.parametrize("top_k", [0, -5])
+def test_rank_jobs_returns_at_least_one_match(jobs, top_k):
+    ranking = job_matching.rank_jobs_for_resume(RESUME, top_k=top_k)
+    assert ranking["success"]
+    assert len(ranking["matches"]) == 1
+
+
+def test_rank_jobs_caps_top_k_at_the_number_of_jobs(jobs):
+    ranking = job_matching.rank_jobs_for_resume(RESUME, top_k=1000)
+    assert len(ranking["matches"]) == len(jobs)
+
+
+@pytest.fixture
+def admin_client(jobs):
+    # main imports the chat graph, which needs the LangChain stack
+    pytest.importorskip("langchain")
+    pytest.importorskip("langgraph")
+    import main
+
+    main.app.config["TESTING"] = True
+    client = main.app.test_client()
+    with client.session_transaction() as session:
+        session["admin_logged_in"] = True
+    return client
+
+
+@pytest.mark.parametrize("top_k", [0, -1, "many", None])
+def test_match_resume_rejects_invalid_top_k(admin_client, top_k):
+    response = admin_client.post("/admin/api/match_resume", json={"resume_text": RESUME, "top_k": top_k})
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "error"
+
+
+def test_match_resume_ranks_with_valid_top_k(admin_client):
+    response = admin_client.post("/admin/api/match_resume", json={"resume_text": RESUME, "top_k": 1})
+    assert response.status_code == 200
+    assert len(response.get_json()["data"]["matches"]) == 1
@@ -0,0 +1,82 @@
+import pytest
+
+from tools import knowledge_ingest
+from tools.knowledge_ingest import ingest_knowledge, remove_sources
+
+
+@pytest.fixture
+def knowledge(tmp_path, monkeypatch, company_index):
+    """Pipeline with its own manifest, small groups and a count of index publishes."""
+    monkeypatch.setattr(knowledge_ingest, "DB_PATH", str(tmp_path / "knowledge.db"))
+    monkeypatch.setattr(knowledge_ingest, "KNOWLEDGE_GROUP_SIZE", 2)
+    knowledge_ingest.init_knowledge_manifest()
+
+    publishes = []
+    apply = company_index.apply
+
+    def counting_apply(**kwargs):
+        publishes.append(kwargs)
+        return apply(**kwargs)
+
+    monkeypatch.setattr(company_index, "apply", counting_apply)
+    company_index.publishes = publishes
+    return company_index
+
+
+def doc_ids(index):
+    return set(index.list_ids(prefix="default_company_doc_"))
+
+
+def sources(count=5):
+    return [(f"file:/docs/page{n}.txt", ".txt", f"About SysCraft.\n\nCase study number {n}.".encode())
+            for n in range(count)]
+
+
+def test_rerun_skips_every_unchanged_source(knowledge, fake_embedder):
+    first = ingest_knowledge(sources())
+    assert (first["indexed"], first["unchanged"], first["vectors"]) == (5, 0, 6)
+    assert len(doc_ids(knowledge)) == 6
+    fake_embedder.encoded = 0
+
+    second = ingest_knowledge(sources())
+    assert (second["indexed"], second["unchanged"], second["vectors"]) == (0, 5, 0)
+    assert fake_embedder.encoded == 0
+    assert len(knowledge.publishes) == 1
+
+
+def test_one_publish_per_run_across_groups(knowledge):
+    ingest_knowledge(sources(7))
+    assert len(knowledge.publishes) == 1
+    assert len(knowledge.publishes[0]["upserts"]) == 8
+
+
+def test_changed_source_replaces_only_its_own_chunks(knowledge, fake_embedder):
+    ingest_knowledge(sources())
+    before = doc_ids(knowledge)
+    fake_embedder.encoded = 0
+
+    changed = sources()
+    changed[0] = ("file:/docs/page0.txt", ".txt", b"About SysCraft.\n\nA rewritten case study.")
+    totals = ingest_knowledge(changed)
+
+    assert (totals["indexed"], totals["unchanged"], totals["vectors"]) == (1, 4, 1)
+    assert fake_embedder.encoded == 1
+    after = doc_ids(knowledge)
+    assert len(after) == 6
+    assert len(before - after) == 1  # the old case study; the shared chunk stays
+
+
+def test_failed_sources_are_reported_and_retried(knowledge):
+    batch = sources(2) + [("file:/docs/blank.txt", ".txt", b"   \n\n  ")]
+    totals = ingest_knowledge(batch)
+    assert (totals["indexed"], totals["errors"]) == (2, 1)
+
+    assert ingest_knowledge(batch)["errors"] == 1
+
+
+def test_remove_sources_keeps_shared_chunks(knowledge):
+    ingest_knowledge(sources(3))
+
+    assert remove_sources(["file:/docs/page1.txt", "file:/docs/unknown.txt"]) == 1
+    assert len(doc_ids(knowledge)) == 3
+    assert "file:/docs/page1.txt" not in knowledge_ingest._manifest_rows("default_company")
@@ -0,0 +1,84 @@
+import io
+import os
+import sqlite3
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from tools import upload_store
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """upload_store writing to its own database and uploads folder."""
+    monkeypatch.setattr(upload_store, "DB_PATH", str(tmp_path / "uploads.db"))
+    monkeypatch.setattr(upload_store, "UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    monkeypatch.setattr(upload_store, "BLOB_FOLDER", str(tmp_path / "uploads" / "blobs"))
+    monkeypatch.setattr(upload_store, "TMP_FOLDER", str(tmp_path / "uploads" / "tmp"))
+    upload_store.init_upload_db()
+    return upload_store
+
+
+def backdate(store, digest, minutes):
+    conn = sqlite3.connect(store.DB_PATH)
+    conn.execute("UPDATE uploads SET created_at = datetime('now', ?) WHERE digest = ?", (f"-{minutes} minutes", digest))
+    conn.commit()
+    conn.close()
+
+
+def blob_exists(store, stored):
+    return os.path.exists(os.path.join(store.UPLOAD_FOLDER, stored["path"]))
+
+
+def test_same_content_is_stored_once(store):
+    first = store.store_upload_bytes(b"resume body", "cv.pdf")
+    second = store.store_upload(FileStorage(io.BytesIO(b"resume body"), filename="other-name.pdf"))
+
+    assert not first["deduplicated"]
+    assert second["deduplicated"]
+    assert second["digest"] == first["digest"]
+    assert second["path"] == first["path"]
+    blobs = [name for _, _, names in os.walk(store.BLOB_FOLDER) for name in names]
+    assert blobs == [os.path.basename(first["path"])]
+    assert not os.listdir(store.TMP_FOLDER)
+
+
+def test_gc_keeps_referenced_and_recent_uploads(store):
+    referenced = store.store_upload_bytes(b"referenced", "a.txt")
+    orphan = store.store_upload_bytes(b"orphan", "b.txt")
+    recent = store.store_upload_bytes(b"recent", "c.txt")
+    assert store.add_upload_ref(referenced["digest"], "application", 1)
+    for stored in (referenced, orphan):
+        backdate(store, stored["digest"], store.GC_GRACE_MINUTES + 5)
+
+    assert store.collect_upload_garbage() == 1
+    assert blob_exists(store, referenced)
+    assert not blob_exists(store, orphan)
+    assert blob_exists(store, recent)
+
+    store.release_upload_refs("application", 1)
+    assert store.collect_upload_garbage() == 1
+    assert not blob_exists(store, referenced)
+
+
+def test_dedup_hit_restarts_the_grace_period(store):
+    stored = store.store_upload_bytes(b"uploaded again", "cv.docx")
+    backdate(store, stored["digest"], store.GC_GRACE_MINUTES + 5)
+
+    again = store.store_upload_bytes(b"uploaded again", "cv.docx")
+    assert again["deduplicated"]
+    assert store.collect_upload_garbage() == 0
+    assert blob_exists(store, again)
+
+
+def test_ref_to_a_missing_upload_is_not_recorded(store):
+    digest = "0" * 64
+    assert not store.add_upload_ref(digest, "session", "s1")
+    assert store.upload_ref_count(digest) == 0
+
+
+def test_resolve_upload_path_stays_inside_uploads(store):
+    stored = store.store_upload_bytes(b"report", "report.pdf")
+    assert store.resolve_upload_path(stored["path"]) == os.path.join(store.UPLOAD_FOLDER, stored["path"])
+    assert store.resolve_upload_path("uploads/../main.py") is None
+    assert store.resolve_upload_path("/etc/passwd") is None
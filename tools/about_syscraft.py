@@ -1,44 +1,231 @@
-from sentence_transformers import SentenceTransformer
-import pinecone
-from pinecone import ServerlessSpec
-import textwrap
+import hashlib
 import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 
-# Load MiniLM embedding model
-embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-
-# Pinecone init (v5 SDK)
-pc = pinecone.Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-
+# The embedding model and the vector index are created on first use, not at
+# import: importing this module must stay cheap and work without network
+# access. Call warm_up() to load both in the background ahead of time.
 INDEX_NAME = "company-descriptions"
 DIM = 384  # MiniLM embeddings have 384 dimensions
+EMBED_BATCH_SIZE = int(os.getenv("COMPANY_EMBED_BATCH_SIZE", "32"))
+UPSERT_BATCH_SIZE = int(os.getenv("COMPANY_UPSERT_BATCH_SIZE", "100"))  # Pinecone's recommended maximum
 
-# Create index if it does not exist
-if INDEX_NAME not in [index.name for index in pc.list_indexes()]:
-    pc.create_index(
-        name=INDEX_NAME,
-        dimension=DIM,
-        metric="cosine",
-        spec=ServerlessSpec(
-            cloud="aws",      # or "gcp"
-            region="us-east-1"   # must match your project
-        )
-    )
+_embedder = None
+_index = None
+_embedder_lock = threading.Lock()
+_index_lock = threading.Lock()
+_warmup_errors = {}
 
-index = pc.Index(INDEX_NAME)
+# Repeated get_company_info calls (the model often asks the same thing twice
+# in a turn, and visitors ask the same questions) skip the encoder and the
+# index. Results are keyed by the index generation, which
+# update_company_vectors bumps, so a description change is visible at once.
+EMBED_CACHE_SIZE = int(os.getenv("COMPANY_EMBED_CACHE_SIZE", "512"))
+RESULT_CACHE_SIZE = int(os.getenv("COMPANY_RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("COMPANY_RESULT_CACHE_TTL", "300"))
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-def update_company_vectors(description: str, company_id="default_company"):
-    """Update company description vectors in Pinecone using MiniLM + RecursiveCharacterTextSplitter"""
-    try:
-        index.delete(filter={"company_id": company_id})
-        print(f"🗑️ Old vectors deleted for {company_id}")
-    except Exception as e:
-        if "Namespace not found" in str(e) or "404" in str(e):
-            print(f"No old vectors to delete for {company_id}")
-        else:
-            print(f"⚠️ Unexpected error while deleting old vectors: {e}")
+class LRUCache:
+    """Thread-safe LRU mapping with an optional time-to-live and hit counters."""
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and (self.ttl is None or time.monotonic() - item[1] < self.ttl):
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = (value, time.monotonic())
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+_embedding_cache = LRUCache(EMBED_CACHE_SIZE)
+_result_cache = LRUCache(RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+_index_generation = 0
+
+# "hybrid": BM25 and vector results fused with reciprocal rank fusion, with
+# confident keyword matches answered from BM25 alone; "vector" or "lexical"
+# use one retriever only
+COMPANY_SEARCH_MODE = os.getenv("COMPANY_SEARCH_MODE", "hybrid").lower()
+HYBRID_CANDIDATES = 2  # each retriever contributes top_k * this to the fusion
+_lexical_indexes = {}
+_lexical_lock = threading.Lock()
+_search_stats = {"searches": 0, "lexical_shortcuts": 0}
+_search_stats_lock = threading.Lock()
+
+
+def get_embedder():
+    """The shared text embedder, resolved on first call.
+
+    The node's embedding service (tools.embedding_service) when it is
+    running, otherwise the EMBED_BACKEND model loaded in this process.
+    """
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                from tools.embedding_service import connect_embedder
+                _embedder = connect_embedder()
+    return _embedder
+
+
+def get_index():
+    """The company vector store (local or Pinecone, see tools.vector_store), opened on first call."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from tools.vector_store import open_vector_store
+                _index = open_vector_store(INDEX_NAME, DIM)
+    return _index
+
+
+def is_ready():
+    """True once both the embedding model and the index are loaded."""
+    return _embedder is not None and _index is not None
+
+
+def readiness():
+    return {
+        "embedder": _embedder is not None,
+        "index": _index is not None,
+        "ready": is_ready(),
+        "errors": dict(_warmup_errors),
+        "generation": index_generation(),
+        "cache": cache_stats(),
+    }
+
+
+def normalize_query(query):
+    """Case, whitespace and trailing punctuation don't change what is being asked."""
+    return re.sub(r"\s+", " ", query).strip().strip("?!.").strip().lower()
+
+
+def index_generation():
+    """Changes whenever the company vectors change, in this process or (local backend) another one."""
+    store_generation = getattr(_index, "generation", None) if _index is not None else None
+    return f"{_index_generation}.{store_generation or 0}"
+
+
+def bump_index_generation():
+    """Invalidate cached search results after the company vectors change."""
+    global _index_generation
+    _index_generation += 1
+    _result_cache.clear()
+
+
+def cache_stats():
+    return {"embeddings": _embedding_cache.stats(), "results": _result_cache.stats(), "search": _search_counts()}
+
+
+def _count_search(key):
+    with _search_stats_lock:
+        _search_stats[key] += 1
+
+
+def _search_counts():
+    with _search_stats_lock:
+        return dict(_search_stats)
+
+
+def embed_query(query):
+    """Embedding of the normalised query, from the LRU cache when possible."""
+    key = normalize_query(query)
+    embedding = _embedding_cache.get(key)
+    if embedding is None:
+        embedding = get_embedder().encode(key).tolist()
+        _embedding_cache.put(key, embedding)
+    return embedding
+
+
+def warm_up(background=True):
+    """Load the embedding model and resolve the index now instead of on the first query."""
+    def run():
+        for name, loader in (("embedder", get_embedder), ("index", get_index)):
+            try:
+                loader()
+                _warmup_errors.pop(name, None)
+            except Exception as e:
+                _warmup_errors[name] = str(e)
+                print(f"⚠️ Company knowledge warm-up: {name} unavailable ({e})")
+        if is_ready():
+            print("✅ Company knowledge base ready")
+            try:
+                backfill_company_vectors()
+            except Exception as e:
+                print(f"⚠️ Company vector backfill failed: {e}")
+
+    if background:
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+    run()
+    return None
+
+
+def __getattr__(name):
+    # Old callers import `embedder` / `index` from this module directly
+    if name == "embedder":
+        return get_embedder()
+    if name == "index":
+        return get_index()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _chunk_id(company_id, chunk):
+    # Includes the embedding space, so switching EMBED_BACKEND re-embeds every chunk
+    from tools.embedding_backends import embedding_space_id
+    key = embedding_space_id() + chunk
+    return f"{company_id}_{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}"
+
+
+def _company_vector_ids(index, company_id):
+    prefix = f"{company_id}_"
+    # The prefix alone would also match "<company_id>_<suffix>_<hash>" of another company
+    return {vid for vid in index.list_ids(prefix=prefix, filter={"company_id": company_id})
+            if "_" not in vid[len(prefix):]}
+
+
+def split_company_text(description):
+    """The chunks that get embedded for a company description."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
 
     # Use RecursiveCharacterTextSplitter
     splitter = RecursiveCharacterTextSplitter(
@@ -46,30 +233,154 @@ def update_company_vectors(description: str, company_id="default_company"):
         chunk_overlap=50,   # small overlap to preserve context
         separators=["\n\n", "\n", ".", " ", ""]
     )
-    chunks = splitter.split_text(description)
+    return splitter.split_text(description)
+
+
+def update_company_vectors(description: str, company_id="default_company"):
+    """Update company description vectors using MiniLM + RecursiveCharacterTextSplitter.
+
+    Chunks are identified by a hash of their text, so only new or edited
+    chunks are embedded (in one batched encode call) and only chunks that
+    disappeared are deleted. Returns {"added", "deleted", "unchanged"}.
+    """
+    chunks = {}
+    for chunk in split_company_text(description):
+        chunks.setdefault(_chunk_id(company_id, chunk), chunk)
+
+    index = get_index()
+    existing = _company_vector_ids(index, company_id)
+    new_ids = [vid for vid in chunks if vid not in existing]
+    stale_ids = sorted(existing - set(chunks))
+    summary = {"added": len(new_ids), "deleted": len(stale_ids), "unchanged": len(chunks) - len(new_ids)}
+    if not new_ids and not stale_ids:
+        print(f"✅ Company vectors already up to date for {company_id}")
+        return summary
 
     vectors = []
-    for i, chunk in enumerate(chunks):
-        embedding = embedder.encode(chunk).tolist()
-        vectors.append({
-            "id": f"{company_id}_{i}",
-            "values": embedding,
-            "metadata": {"company_id": company_id, "text": chunk}
-        })
+    if new_ids:
+        embeddings = get_embedder().encode([chunks[vid] for vid in new_ids], batch_size=EMBED_BATCH_SIZE)
+        vectors = [{
+            "id": vid,
+            "values": embedding.tolist(),
+            "metadata": {"company_id": company_id, "text": chunks[vid]}
+        } for vid, embedding in zip(new_ids, embeddings)]
+    # Built as a new index generation and published in one flip: searches see
+    # the old vectors or the new ones, never a partial set
+    index.apply(upserts=vectors, delete_ids=stale_ids, batch_size=UPSERT_BATCH_SIZE)
+    bump_index_generation()
+    print(f"✅ Company vectors updated for {company_id}: {summary['added']} added, "
+          f"{summary['deleted']} deleted, {summary['unchanged']} unchanged")
+    return summary
 
-    index.upsert(vectors)
-    print(f"✅ Company vectors updated for {company_id}")
 
+def saved_company_text():
+    """The company description and questionnaire answers saved in /admin/company, or None."""
+    from tools.hr_jobs import DB_PATH
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT description, {', '.join(f'q{i}' for i in range(1, 20))}
+            FROM company_info ORDER BY updated_at DESC LIMIT 1
+        """)
+        row = cursor.fetchone()
+        conn.close()
+    except sqlite3.Error:
+        return None
+    if not row or not row[0]:
+        return None
+    # Combined the same way main.py indexes it when the profile is saved
+    return row[0] + "\n\n" + "\n".join(filter(None, row[1:]))
 
-def search_company_info(query: str, company_id="default_company", top_k=5):
-    query_embedding = embedder.encode(query).tolist()
-    results = index.query(
-        vector=query_embedding,
+
+def backfill_company_vectors(company_id="default_company"):
+    """Index the saved company profile when the vector store has nothing for it.
+
+    A new or switched backend (VECTOR_BACKEND, see tools/vector_store.py)
+    starts empty; this fills it once from the database instead of waiting for
+    the profile to be saved again. Returns update_company_vectors' summary,
+    or None when nothing had to be done.
+    """
+    if _company_vector_ids(get_index(), company_id):
+        return None
+    text = saved_company_text()
+    if not text:
+        return None
+    print(f"🔁 Vector store empty for {company_id}: indexing the saved company profile")
+    return update_company_vectors(text, company_id)
+
+
+def get_lexical_index(company_id):
+    """BM25 over the company's indexed chunks, rebuilt once per index generation."""
+    from tools.lexical_index import BM25Index
+
+    generation = index_generation()
+    key = (generation, company_id)
+    cached = _lexical_indexes.get(key)
+    if cached is None:
+        cached = BM25Index(get_index().records(filter={"company_id": company_id}))
+        with _lexical_lock:
+            # Older generations are never asked for again
+            for stale in [k for k in _lexical_indexes if k[0] != generation]:
+                del _lexical_indexes[stale]
+            _lexical_indexes[key] = cached
+    return cached
+
+
+def _vector_matches(query, company_id, top_k):
+    return get_index().query(
+        vector=embed_query(query),
         top_k=top_k,
         filter={"company_id": company_id},
         include_metadata=True
-    )
+    )["matches"]
+
+
+def _search(query, company_id, top_k):
+    if COMPANY_SEARCH_MODE == "vector":
+        return {"matches": _vector_matches(query, company_id, top_k), "retrieval": "vector"}
+
+    from tools.lexical_index import reciprocal_rank_fusion
+
+    bm25 = get_lexical_index(company_id)
+    lexical_hits = bm25.search(query, limit=top_k * HYBRID_CANDIDATES)
+    lexical = [{"id": bm25.records[row]["id"], "score": score, "metadata": bm25.records[row]["metadata"]}
+               for row, score in lexical_hits]
+    if COMPANY_SEARCH_MODE == "lexical" or bm25.is_confident(query, lexical_hits):
+        _count_search("lexical_shortcuts")
+        return {"matches": lexical[:top_k], "retrieval": "lexical"}
+
+    try:
+        vector = _vector_matches(query, company_id, top_k * HYBRID_CANDIDATES)
+    except Exception as e:
+        if not lexical:
+            raise
+        # No embedder or index right now; keyword matches are better than nothing
+        print(f"⚠️ Vector search failed, using keyword matches only: {e}")
+        return {"matches": lexical[:top_k], "retrieval": "lexical"}
+
+    by_id = {match["id"]: match for match in lexical + vector}
+    fused = reciprocal_rank_fusion([[m["id"] for m in vector], [m["id"] for m in lexical]])
+    return {
+        "matches": [{**by_id[vid], "score": round(score, 5)} for vid, score in fused[:top_k]],
+        "retrieval": "hybrid",
+    }
+
+
+def search_company_info(query: str, company_id="default_company", top_k=5):
+    cache_key = (index_generation(), company_id, top_k, normalize_query(query))
+    cached = _result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    _count_search("searches")
+    try:
+        results = _search(query, company_id, top_k)
+    except Exception as e:
+        # Offline or misconfigured: let the assistant answer without the knowledge base
+        print(f"⚠️ Company info search failed: {e}")
+        return {"matches": [], "error": "Company knowledge base is temporarily unavailable."}
+    _result_cache.put(cache_key, results)
     return results
 
 # result = search_company_info("What syscraft do")
-# print(result)
\ No newline at end of file
+# print(result)
@@ -0,0 +1,354 @@
+import argparse
+import io
+import os
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from tools.extraction_cache import cached_extract, bytes_digest
+from tools.extraction_engines import extract_document, engine_chain_key, EXTRACTOR_VERSION
+from tools.extraction_sandbox import SANDBOX_WORKERS
+from tools.hr_jobs import save_job_applications_batch
+from tools.job_matching import rank_jobs_for_resume, schedule_shortlist_refresh, schedule_application_embedding
+from tools.resume_condenser import condense_resume, format_profile
+from tools.upload_store import (
+    store_upload_bytes, add_upload_ref, upload_owner, release_upload_refs, collect_upload_garbage, UPLOAD_FOLDER
+)
+
+# Bulk resume ingestion for HR (job fairs, agency dumps). Files are read in
+# chunks; each chunk is extracted concurrently in the extraction sandbox,
+# scored locally (resume profile + semantic job ranking) and inserted in a
+# single transaction. LLM summaries are optional and rate limited.
+BATCH_EXTENSIONS = (".pdf", ".docx", ".txt")
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+BATCH_MAX_FILE_BYTES = int(os.getenv("BATCH_MAX_FILE_MB", "10")) * 1024 * 1024
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "25"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(SANDBOX_WORKERS)))
+LLM_SUMMARIES_PER_MINUTE = int(os.getenv("BATCH_LLM_SUMMARIES_PER_MINUTE", "10"))
+# Finished admin jobs are dropped this long after they end
+INGEST_JOB_TTL_SECONDS = int(os.getenv("BATCH_JOB_TTL_MINUTES", "60")) * 60
+DEFAULT_POSITION = "General Application"
+
+
+# ---- Input files ----
+
+def _batch_limit_error(max_files):
+    return f"batch limit of {max_files} files reached; remaining files skipped"
+
+
+def _zip_members(archive):
+    """Yield (filename, ZipInfo, error) for the resumes inside a zip archive, without reading them."""
+    for info in archive.infolist():
+        name = os.path.basename(info.filename)
+        if info.is_dir() or not name or name.startswith(".") or "__MACOSX" in info.filename:
+            continue
+        if not name.lower().endswith(BATCH_EXTENSIONS):
+            yield name, None, "unsupported file type"
+        elif info.file_size > BATCH_MAX_FILE_BYTES:
+            yield name, None, "file too large"
+        else:
+            yield name, info, None
+
+
+def _read_file(name, source):
+    """(filename, bytes, error) for a file given as bytes or as a path on disk."""
+    size = os.path.getsize(source) if isinstance(source, str) else len(source)
+    if not name.lower().endswith(BATCH_EXTENSIONS):
+        return name, None, "unsupported file type"
+    if size > BATCH_MAX_FILE_BYTES:
+        return name, None, "file too large"
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return name, f.read(), None
+    return name, source, None
+
+
+def iter_batch_files(files, max_files=BATCH_MAX_FILES):
+    """Expand (filename, bytes or path) pairs, unpacking zips, into (filename, bytes, error) triples.
+
+    Files are read one at a time as they are yielded. After max_files the
+    next file is reported as the batch limit error and nothing more is read.
+    """
+    count = 0
+    for name, source in files:
+        if not name.lower().endswith(".zip"):
+            if count >= max_files:
+                yield name, None, _batch_limit_error(max_files)
+                return
+            count += 1
+            yield _read_file(name, source)
+            continue
+
+        try:
+            archive = zipfile.ZipFile(source if isinstance(source, str) else io.BytesIO(source))
+        except zipfile.BadZipFile:
+            yield name, None, "not a valid zip archive"
+            continue
+        with archive:
+            for member, info, error in _zip_members(archive):
+                if count >= max_files:
+                    yield member, None, _batch_limit_error(max_files)
+                    return
+                count += 1
+                yield member, (archive.read(info) if info else None), error
+
+
+# ---- LLM summaries ----
+
+_summary_llm = None
+_llm_lock = threading.Lock()
+_next_llm_call = 0.0
+
+
+def _wait_for_llm_slot():
+    """Space LLM calls at least 60/LLM_SUMMARIES_PER_MINUTE seconds apart."""
+    global _next_llm_call
+    with _llm_lock:
+        now = time.monotonic()
+        wait = max(0.0, _next_llm_call - now)
+        _next_llm_call = max(now, _next_llm_call) + 60.0 / max(1, LLM_SUMMARIES_PER_MINUTE)
+    if wait:
+        time.sleep(wait)
+
+
+def summarize_profile(profile_text):
+    """Two-sentence HR summary of a condensed resume profile."""
+    global _summary_llm
+    if _summary_llm is None:
+        from langchain.chat_models import init_chat_model
+        _summary_llm = init_chat_model("google_genai:gemini-2.5-flash")
+    _wait_for_llm_slot()
+    response = _summary_llm.invoke(
+        "Summarize this candidate for an HR reviewer in at most two sentences "
+        "(current role, years of experience, strongest skills):\n\n" + profile_text
+    )
+    return str(response.content).strip()
+
+
+# ---- Ingestion ----
+
+def _extract(item):
+    filename, data, error = item
+    result = {"filename": filename, "data": data, "error": error, "text": None, "digest": None}
+    if error:
+        return result
+    ext = os.path.splitext(filename)[1].lower()
+    result["digest"] = bytes_digest(data)
+    try:
+        text = cached_extract(
+            result["digest"], engine_chain_key(ext), EXTRACTOR_VERSION,
+            lambda: extract_document(data, ext=ext)
+        )
+    except Exception as e:
+        text = f"[Error extracting text: {e}]"
+    if not text or text.startswith(("[Error", "Error", "[Unsupported")):
+        result["error"] = text or "no text found"
+    else:
+        result["text"] = text
+    return result
+
+
+def _score(text, position, state):
+    """Resume profile plus the target position (the best-matching job when none is given)."""
+    profile = condense_resume(text)
+    scored = {"profile": profile, "position": position or DEFAULT_POSITION, "job_id": None, "match_percentage": None}
+    if position or state.get("ranking_failed"):
+        return scored
+    try:
+        ranking = rank_jobs_for_resume(text, top_k=1)
+        if ranking["success"] and ranking["matches"]:
+            best = ranking["matches"][0]
+            scored.update(position=best["title"], job_id=best["id"], match_percentage=best["match_percentage"])
+    except Exception as e:
+        # Same failure for every file (e.g. no embedding model); don't retry it
+        state["ranking_failed"] = True
+        print(f"⚠️ Job ranking unavailable, using '{scored['position']}': {e}")
+    return scored
+
+
+def _ingest_chunk(chunk, position, summarize, state, report):
+    """Extract, score and insert one chunk of files; returns the job ids that got applicants."""
+    with ThreadPoolExecutor(max_workers=max(1, BATCH_WORKERS)) as threads:
+        extracted = list(threads.map(_extract, chunk))
+
+    seen_digests = state["digests"]
+    rows, pending, outcomes = [], [], []
+    for item in extracted:
+        result = {"filename": item["filename"], "status": "error", "error": item["error"]}
+        outcomes.append(result)
+        if item["error"]:
+            continue
+        if item["digest"] in seen_digests or upload_owner(item["digest"], "application"):
+            result.update(status="duplicate", error="already ingested")
+            continue
+        seen_digests.add(item["digest"])
+
+        scored = _score(item["text"], position, state)
+        profile = scored["profile"]
+        # The full text is the resume body, as in the chat path; profiles are only built for prompts
+        resume_content = item["text"]
+        if summarize:
+            try:
+                summary = summarize_profile(format_profile(profile))
+                resume_content = f"HR summary: {summary}\n\n{item['text']}"
+                result["summary"] = summary
+            except Exception as e:
+                print(f"⚠️ LLM summary failed for {item['filename']}: {e}")
+
+        stored = store_upload_bytes(item["data"], item["filename"])
+        contact = profile.get("contact", {})
+        rows.append({
+            "name": profile.get("name") or os.path.splitext(item["filename"])[0],
+            "email": contact.get("email", ""),
+            "phone": contact.get("phone", ""),
+            "position": scored["position"],
+            "resume_filename": item["filename"],
+            "resume_content": resume_content,
+            "extracted_text": item["text"],
+            "file_path": stored["path"],
+        })
+        result.update(status="saved", error=None, position=scored["position"],
+                      match_percentage=scored["match_percentage"])
+        pending.append((stored["digest"], scored, result))
+
+    application_ids = save_job_applications_batch(rows) if rows else []
+    job_ids = set()
+    for application_id, (digest, scored, result) in zip(application_ids, pending):
+        add_upload_ref(digest, "application", application_id)
+        if scored["job_id"] is not None:
+            job_ids.add(scored["job_id"])
+        result["application_id"] = application_id
+
+    for result in outcomes:
+        report(result)
+    return job_ids
+
+
+def ingest_resumes(files, position=None, summarize=False, progress=None):
+    """Create job applications from many resume files.
+
+    files is an iterable of (filename, bytes or path); zips are unpacked. progress,
+    if given, is called as progress(result, totals) after every file.
+    Returns the totals plus the per-file results.
+    """
+    started = time.perf_counter()
+    totals = {"total": 0, "saved": 0, "duplicates": 0, "errors": 0}
+    results = []
+
+    def report(result):
+        totals["total"] += 1
+        totals[{"saved": "saved", "duplicate": "duplicates"}.get(result["status"], "errors")] += 1
+        result["index"] = totals["total"]
+        results.append(result)
+        if progress:
+            progress(result, dict(totals))
+
+    state = {"digests": set(), "ranking_failed": False}
+    job_ids, chunk = set(), []
+    for item in iter_batch_files(files):
+        chunk.append(item)
+        if len(chunk) >= BATCH_CHUNK_SIZE:
+            job_ids |= _ingest_chunk(chunk, position, summarize, state, report)
+            chunk = []
+    if chunk:
+        job_ids |= _ingest_chunk(chunk, position, summarize, state, report)
+
+    # New applicants change these jobs' shortlists; each refresh embeds them first
+    for job_id in job_ids:
+        schedule_shortlist_refresh(job_id)
+    if totals["saved"] and not job_ids:
+        schedule_application_embedding()
+
+    return {**totals, "elapsed_s": round(time.perf_counter() - started, 2), "results": results}
+
+
+# ---- Background jobs for the admin endpoint ----
+
+_ingest_jobs = {}
+_ingest_jobs_lock = threading.Lock()
+
+
+def _evict_ingest_jobs():
+    """Drop jobs that finished more than INGEST_JOB_TTL_SECONDS ago (caller holds the lock)."""
+    cutoff = time.monotonic() - INGEST_JOB_TTL_SECONDS
+    for job_id in [j for j, job in _ingest_jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]:
+        del _ingest_jobs[job_id]
+
+
+def start_ingest_job(uploads, position=None, summarize=False):
+    """Run ingest_resumes in a background thread; returns a job id for get_ingest_job.
+
+    uploads are upload_store.store_upload results: the files are already on
+    disk and are read one at a time by the job. They are referenced by the
+    job while it runs so upload GC leaves them alone.
+    """
+    job_id = uuid.uuid4().hex[:12]
+    job = {"job_id": job_id, "state": "running", "totals": {}, "results": [], "error": None, "finished_at": None}
+    with _ingest_jobs_lock:
+        _evict_ingest_jobs()
+        _ingest_jobs[job_id] = job
+    for stored in uploads:
+        add_upload_ref(stored["digest"], "batch", job_id)
+    files = [(stored["original_name"], os.path.join(UPLOAD_FOLDER, stored["path"])) for stored in uploads]
+
+    def progress(result, totals):
+        job["results"].append(result)
+        job["totals"] = totals
+
+    def run():
+        try:
+            summary = ingest_resumes(files, position, summarize, progress)
+            job["totals"] = {k: v for k, v in summary.items() if k != "results"}
+            job["state"] = "done"
+        except Exception as e:
+            job["error"] = str(e)
+            job["state"] = "failed"
+            print(f"❌ Batch ingestion {job_id} failed: {e}")
+        # Saved resumes are referenced by their applications now; zips and skipped files can go
+        release_upload_refs("batch", job_id)
+        collect_upload_garbage()
+        job["finished_at"] = time.monotonic()
+
+    threading.Thread(target=run, daemon=True).start()
+    return job_id
+
+
+def get_ingest_job(job_id, since=0):
+    """Job state with the per-file results after index `since`."""
+    with _ingest_jobs_lock:
+        _evict_ingest_jobs()
+        job = _ingest_jobs.get(job_id)
+    if not job:
+        return None
+    return {**job, "results": job["results"][since:]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create job applications from resume files or zip archives.")
+    parser.add_argument("paths", nargs="+", help="resume files (.pdf, .docx, .txt) or .zip archives")
+    parser.add_argument("--position", help="position for every resume (default: best-matching open job)")
+    parser.add_argument("--summarize", action="store_true", help="add a rate-limited LLM summary per resume")
+    args = parser.parse_args()
+
+    def read_files():
+        for path in args.paths:
+            with open(path, "rb") as f:
+                yield os.path.basename(path), f.read()
+
+    icons = {"saved": "✅", "duplicate": "♻️", "error": "❌"}
+
+    def progress(result, totals):
+        detail = result.get("error") or f"{result['position']} (#{result['application_id']})"
+        if result.get("match_percentage") is not None:
+            detail += f" {result['match_percentage']}% match"
+        print(f"{icons[result['status']]} [{totals['total']}] {result['filename']}: {detail}")
+
+    summary = ingest_resumes(read_files(), args.position, args.summarize, progress)
+    print(f"📊 {summary['saved']} saved, {summary['duplicates']} duplicates, "
+          f"{summary['errors']} errors out of {summary['total']} files in {summary['elapsed_s']}s")
+
+
+if __name__ == "__main__":
+    main()
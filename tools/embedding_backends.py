@@ -0,0 +1,164 @@
+import argparse
+import os
+
+import numpy as np
+
+# Interchangeable text embedders for the company knowledge base and job
+# matching. All of them produce 384-dimensional, L2-normalised float32
+# vectors and take SentenceTransformer-style encode() arguments, so callers
+# don't care which one is loaded:
+#   sentence-transformers  full PyTorch MiniLM (reference; heaviest)
+#   onnx-int8              the same MiniLM weights, int8-quantized, run by ONNX Runtime
+#   static                 model2vec static embeddings distilled from MiniLM
+#                          (token lookup + mean; no transformer at query time)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "sentence-transformers").lower()
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_ONNX_FILE = "onnx/model_quint8_avx2.onnx"
+EMBED_MODEL_NAME = os.getenv("EMBED_MODEL_NAME", DEFAULT_MODEL_NAME)
+MODELS_DIR = os.getenv("EMBED_MODELS_DIR", os.path.join(os.path.dirname(__file__), "models"))
+
+# Quantized export published with the model; model_qint8_avx512_vnni.onnx is
+# faster on CPUs that have VNNI. EMBED_ONNX_PATH points at a local file instead.
+EMBED_ONNX_FILE = os.getenv("EMBED_ONNX_FILE", DEFAULT_ONNX_FILE)
+EMBED_ONNX_PATH = os.getenv("EMBED_ONNX_PATH")
+EMBED_ONNX_THREADS = int(os.getenv("EMBED_ONNX_THREADS", "0"))  # 0 = ONNX Runtime default
+EMBED_STATIC_PATH = os.getenv("EMBED_STATIC_PATH", os.path.join(MODELS_DIR, "minilm-static"))
+EMBED_DIM = 384
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2's max_seq_length
+
+BACKENDS = ("sentence-transformers", "onnx-int8", "static")
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def _as_batch(sentences):
+    single = isinstance(sentences, str)
+    return [sentences] if single else list(sentences), single
+
+
+class OnnxEmbedder:
+    """MiniLM through ONNX Runtime: tokenizer + transformer + mean pooling, no PyTorch."""
+
+    def __init__(self, model_name=EMBED_MODEL_NAME, onnx_path=EMBED_ONNX_PATH, onnx_file=EMBED_ONNX_FILE):
+        import onnxruntime
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        if not onnx_path:
+            onnx_path = hf_hub_download(model_name, onnx_file)
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(model_name, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = onnxruntime.SessionOptions()
+        if EMBED_ONNX_THREADS:
+            options.intra_op_num_threads = EMBED_ONNX_THREADS
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = np.zeros_like(input_ids)
+        token_embeddings = self.session.run(None, feed)[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return _normalize(pooled)
+
+    def encode(self, sentences, batch_size=32, normalize_embeddings=True, **_):
+        texts, single = _as_batch(sentences)
+        if not texts:
+            return np.zeros((0, EMBED_DIM), dtype=np.float32)
+        # Sorting by length keeps padding per batch small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = np.empty((len(texts), EMBED_DIM), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            out[rows] = self._encode_batch([texts[i] for i in rows])
+        return out[0] if single else out
+
+
+class StaticEmbedder:
+    """model2vec static embeddings distilled from MiniLM (see `distill-static` below)."""
+
+    def __init__(self, path=EMBED_STATIC_PATH):
+        from model2vec import StaticModel
+
+        if not os.path.isdir(path):
+            raise FileNotFoundError(
+                f"No static embedding model at {path}; create it with "
+                f"`python -m tools.embedding_backends distill-static`"
+            )
+        self.model = StaticModel.from_pretrained(path)
+
+    def encode(self, sentences, batch_size=1024, normalize_embeddings=True, **_):
+        texts, single = _as_batch(sentences)
+        vectors = _normalize(np.asarray(self.model.encode(texts, batch_size=batch_size), dtype=np.float32))
+        return vectors[0] if single else vectors
+
+
+def load_embedder(backend=None):
+    """Load the embedder for `backend` (default EMBED_BACKEND)."""
+    backend = (backend or EMBED_BACKEND).lower()
+    if backend == "sentence-transformers":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(EMBED_MODEL_NAME)
+    if backend == "onnx-int8":
+        return OnnxEmbedder()
+    if backend == "static":
+        return StaticEmbedder()
+    raise ValueError(f"Unknown EMBED_BACKEND: {backend} (expected one of {', '.join(BACKENDS)})")
+
+
+def embedding_space_id(backend=None):
+    """Identifies the vector space of stored embeddings; empty for the reference model.
+
+    Stored vectors from different backends, models or ONNX exports are not
+    comparable, so callers fold this into their content hashes to re-embed
+    after a switch, and the embedding service reports it so workers only
+    use a service that embeds into their space. Settings left at their
+    defaults are omitted, which keeps existing ids stable.
+    """
+    backend = (backend or EMBED_BACKEND).lower()
+    settings = []
+    if EMBED_MODEL_NAME != DEFAULT_MODEL_NAME:
+        settings.append(EMBED_MODEL_NAME)
+    if backend == "onnx-int8":
+        onnx_file = os.path.basename(EMBED_ONNX_PATH) if EMBED_ONNX_PATH else EMBED_ONNX_FILE
+        if onnx_file != DEFAULT_ONNX_FILE:
+            settings.append(onnx_file)
+    elif backend == "static" and os.path.basename(EMBED_STATIC_PATH) != "minilm-static":
+        settings.append(os.path.basename(EMBED_STATIC_PATH))
+    if backend == "sentence-transformers" and not settings:
+        return ""
+    return "".join(f"{part}:" for part in [backend] + settings)
+
+
+def distill_static(out_dir=EMBED_STATIC_PATH, model_name=EMBED_MODEL_NAME):
+    """Distill MiniLM into a static model2vec model (needs sentence-transformers once, at build time)."""
+    from model2vec.distill import distill
+
+    # pca_dims=None keeps all 384 dimensions so the vector stores don't change shape
+    model = distill(model_name=model_name, pca_dims=None)
+    model.save_pretrained(out_dir)
+    print(f"✅ Static embedding model saved to {out_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build local embedding models.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    distill_cmd = sub.add_parser("distill-static", help="distill MiniLM into a static model2vec model")
+    distill_cmd.add_argument("--out", default=EMBED_STATIC_PATH)
+    args = parser.parse_args()
+    if args.command == "distill-static":
+        distill_static(args.out)
+
+
+if __name__ == "__main__":
+    main()
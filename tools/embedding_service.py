@@ -0,0 +1,331 @@
+"""Node-local embedding service shared by all web workers.
+
+    python -m tools.embedding_service [--socket PATH]
+
+Loads the embedder (EMBED_BACKEND) once and serves encode requests on a
+Unix socket. Small requests that arrive within EMBED_SERVICE_WINDOW_MS of
+each other are coalesced into one encode() call of up to
+EMBED_SERVICE_MAX_BATCH texts, so concurrent chat turns across gunicorn
+workers share a forward pass instead of each worker holding its own model
+and encoding one query at a time. Bulk requests are encoded in slices of
+that size, with chat queries served between slices.
+
+Workers pick it up through get_embedder() in tools.about_syscraft: when the
+socket answers (and embeds into the same vector space) they use it, otherwise
+they load the model in-process as before, and they fall back the same way
+if the service goes away later.
+"""
+import argparse
+import json
+import collections
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import numpy as np
+
+from tools.embedding_backends import EMBED_BACKEND, EMBED_DIM, embedding_space_id, load_embedder
+
+EMBED_SERVICE = os.getenv("EMBED_SERVICE", "1") != "0"
+EMBED_SERVICE_SOCKET = os.getenv("EMBED_SERVICE_SOCKET", "/tmp/syscraft-embeddings.sock")
+EMBED_SERVICE_WINDOW_MS = float(os.getenv("EMBED_SERVICE_WINDOW_MS", "5"))
+EMBED_SERVICE_MAX_BATCH = int(os.getenv("EMBED_SERVICE_MAX_BATCH", "64"))
+# Requests with at most this many texts are interactive and jump ahead of bulk ones
+EMBED_SERVICE_INTERACTIVE_MAX = int(os.getenv("EMBED_SERVICE_INTERACTIVE_MAX", "8"))
+EMBED_SERVICE_TIMEOUT = float(os.getenv("EMBED_SERVICE_TIMEOUT", "30"))
+# After the service fails, encode in-process and try the socket again after this long
+EMBED_SERVICE_RETRY_SECONDS = float(os.getenv("EMBED_SERVICE_RETRY_SECONDS", "30"))
+
+_HEADER = struct.Struct("!I")
+
+
+# ---- Wire format: 4-byte big-endian length + JSON, then raw float32 rows ----
+
+def _recv_exact(sock, size):
+    chunks, remaining = [], size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            raise ConnectionError("embedding service closed the connection")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _send_message(sock, header, payload=b""):
+    body = json.dumps(header).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(body)) + body + payload)
+
+
+def _recv_message(sock):
+    (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, length))
+
+
+# ---- Server ----
+
+class MicroBatcher:
+    """Coalesces small encode requests for a short window; runs bulk requests in slices.
+
+    Requests of up to EMBED_SERVICE_INTERACTIVE_MAX texts (chat queries)
+    are batched together and always served first. Larger ones (re-indexing,
+    job matching, knowledge ingestion) are encoded one slice of at most
+    max_batch texts (or the caller's batch_size) at a time, and waiting
+    interactive requests go between their slices.
+    """
+
+    def __init__(self, embedder, window_ms=EMBED_SERVICE_WINDOW_MS, max_batch=EMBED_SERVICE_MAX_BATCH,
+                 interactive_max=EMBED_SERVICE_INTERACTIVE_MAX):
+        self.embedder = embedder
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.interactive_max = interactive_max
+        self._interactive = collections.deque()
+        self._bulk = collections.deque()
+        self._ready = threading.Condition()
+        self.stats = {"requests": 0, "texts": 0, "batches": 0, "bulk_slices": 0}
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def encode(self, texts, batch_size=None):
+        """Called from connection threads; blocks until this request's rows are ready."""
+        if not texts:
+            return np.zeros((0, EMBED_DIM), dtype=np.float32)
+        request = {"texts": texts, "batch_size": batch_size or self.max_batch, "done": threading.Event(),
+                   "parts": [], "vectors": None, "error": None}
+        with self._ready:
+            (self._interactive if len(texts) <= self.interactive_max else self._bulk).append(request)
+            self.stats["requests"] += 1
+            self.stats["texts"] += len(texts)
+            self._ready.notify()
+        request["done"].wait()
+        if request["error"]:
+            raise RuntimeError(request["error"])
+        return request["vectors"]
+
+    def _encode(self, texts):
+        vectors = self.embedder.encode(texts, batch_size=max(len(texts), 1))
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+
+    def _next_interactive_batch(self):
+        """Interactive requests arriving within the window, up to max_batch texts; called with the lock held."""
+        batch = [self._interactive.popleft()]
+        size = len(batch[0]["texts"])
+        deadline = time.monotonic() + self.window
+        while size < self.max_batch:
+            if not self._interactive:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._ready.wait(remaining)
+                continue
+            if size + len(self._interactive[0]["texts"]) > self.max_batch:
+                break
+            request = self._interactive.popleft()
+            batch.append(request)
+            size += len(request["texts"])
+        return batch
+
+    def _run_interactive(self, batch):
+        texts = [text for request in batch for text in request["texts"]]
+        try:
+            vectors = self._encode(texts)
+            start = 0
+            for request in batch:
+                request["vectors"] = vectors[start:start + len(request["texts"])]
+                start += len(request["texts"])
+        except Exception as e:
+            for request in batch:
+                request["error"] = str(e)
+        self.stats["batches"] += 1
+        for request in batch:
+            request["done"].set()
+
+    def _run_bulk_slice(self, request):
+        """Encode the next slice of a bulk request; True when the request is finished."""
+        done = sum(len(part) for part in request["parts"])
+        size = max(1, min(self.max_batch, request["batch_size"]))
+        try:
+            request["parts"].append(self._encode(request["texts"][done:done + size]))
+        except Exception as e:
+            request["error"] = str(e)
+        self.stats["bulk_slices"] += 1
+        if request["error"] or done + size >= len(request["texts"]):
+            if not request["error"]:
+                request["vectors"] = np.concatenate(request["parts"])
+            request["done"].set()
+            return True
+        return False
+
+    def _run(self):
+        while True:
+            with self._ready:
+                while not self._interactive and not self._bulk:
+                    self._ready.wait()
+                if self._interactive:
+                    batch, request = self._next_interactive_batch(), None
+                else:
+                    batch, request = None, self._bulk[0]
+            if batch:
+                self._run_interactive(batch)
+            elif self._run_bulk_slice(request):
+                with self._ready:
+                    self._bulk.popleft()
+
+
+def serve(socket_path=EMBED_SERVICE_SOCKET):
+    """Load the embedder and serve encode requests until interrupted."""
+    started = time.perf_counter()
+    batcher = MicroBatcher(load_embedder())
+    print(f"✅ Embedding model ({EMBED_BACKEND}) loaded in {time.perf_counter() - started:.1f}s")
+
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            while True:
+                try:
+                    message = _recv_message(self.request)
+                except (ConnectionError, OSError):
+                    return
+                if message.get("op") == "ping":
+                    _send_message(self.request, {"backend": EMBED_BACKEND, "space": embedding_space_id(),
+                                                 "dim": EMBED_DIM, "stats": batcher.stats})
+                    continue
+                try:
+                    vectors = batcher.encode(message["texts"], message.get("batch_size"))
+                    _send_message(self.request, {"shape": list(vectors.shape)}, vectors.tobytes())
+                except Exception as e:
+                    _send_message(self.request, {"error": str(e)})
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+        request_queue_size = 128  # every worker thread holds a connection
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)  # left over from a previous run
+    with Server(socket_path, Handler) as server:
+        os.chmod(socket_path, 0o660)
+        print(f"🔌 Embedding service listening on {socket_path}")
+        try:
+            server.serve_forever()
+        finally:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+# ---- Client ----
+
+class EmbeddingServiceClient:
+    """encode() over the Unix socket; one persistent connection per thread."""
+
+    def __init__(self, socket_path=EMBED_SERVICE_SOCKET):
+        self.socket_path = socket_path
+        self._local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(EMBED_SERVICE_TIMEOUT)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _request(self, header):
+        for attempt in range(2):
+            sock = self._connection()
+            try:
+                _send_message(sock, header)
+                response = _recv_message(sock)
+                if "shape" in response:
+                    rows, dim = response["shape"]
+                    data = _recv_exact(sock, rows * dim * 4)
+                    return response, np.frombuffer(data, dtype=np.float32).reshape(rows, dim)
+                return response, None
+            except (ConnectionError, OSError):
+                # Stale connection (service restarted); reconnect once
+                sock.close()
+                self._local.sock = None
+                if attempt:
+                    raise
+
+    def ping(self):
+        return self._request({"op": "ping"})[0]
+
+    def encode(self, sentences, batch_size=32, normalize_embeddings=True, **_):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, EMBED_DIM), dtype=np.float32)
+        response, vectors = self._request({"texts": texts, "batch_size": batch_size})
+        if vectors is None:
+            raise RuntimeError(f"Embedding service error: {response.get('error')}")
+        return vectors[0] if single else vectors
+
+
+class ServiceOrLocalEmbedder:
+    """Uses the embedding service when it is up, the in-process model otherwise."""
+
+    def __init__(self, socket_path=EMBED_SERVICE_SOCKET):
+        self.client = EmbeddingServiceClient(socket_path)
+        self._local = None
+        self._local_lock = threading.Lock()
+        self._retry_at = 0.0
+        self.using_service = False
+        self._check_service()
+
+    def _check_service(self):
+        try:
+            info = self.client.ping()
+        except (ConnectionError, OSError):
+            self.using_service = False
+        else:
+            # A service on another backend, model or ONNX export would mix vector spaces
+            self.using_service = info.get("backend") == EMBED_BACKEND and info.get("space") == embedding_space_id()
+            if not self.using_service:
+                print(f"⚠️ Embedding service embeds into {info.get('backend')} {info.get('space')!r}, this worker uses "
+                      f"{EMBED_BACKEND} {embedding_space_id()!r}; encoding locally")
+        self._retry_at = time.monotonic() + EMBED_SERVICE_RETRY_SECONDS
+        return self.using_service
+
+    def _local_embedder(self):
+        if self._local is None:
+            with self._local_lock:
+                if self._local is None:
+                    self._local = load_embedder()
+        return self._local
+
+    def encode(self, sentences, **kwargs):
+        if self.using_service or (time.monotonic() >= self._retry_at and self._check_service()):
+            try:
+                return self.client.encode(sentences, **kwargs)
+            except (ConnectionError, OSError) as e:
+                print(f"⚠️ Embedding service unavailable ({e}); encoding in-process")
+                self.using_service = False
+                self._retry_at = time.monotonic() + EMBED_SERVICE_RETRY_SECONDS
+        return self._local_embedder().encode(sentences, **kwargs)
+
+
+def connect_embedder():
+    """The embedder a web worker should use: the service if reachable, else a local model."""
+    if EMBED_SERVICE and os.path.exists(EMBED_SERVICE_SOCKET):
+        embedder = ServiceOrLocalEmbedder()
+        if embedder.using_service:
+            return embedder
+    return load_embedder()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve text embeddings to local workers over a Unix socket.")
+    parser.add_argument("--socket", default=EMBED_SERVICE_SOCKET)
+    args = parser.parse_args()
+    serve(args.socket)
+
+
+if __name__ == "__main__":
+    main()
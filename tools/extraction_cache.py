@@ -0,0 +1,135 @@
+import sqlite3
+import hashlib
+import json
+import os
+import re
+import time
+
+# Extracted document text, keyed by content hash + extractor name + extractor
+# version, so re-uploaded or re-analysed documents skip the parse. Kept in its
+# own database so the HR tables stay small.
+CACHE_DB_PATH = os.getenv("EXTRACTION_CACHE_DB_PATH", os.path.join(os.path.dirname(__file__), "extraction_cache.db"))
+MAX_CACHE_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "256")) * 1024 * 1024
+# Don't refresh last_access on every hit; LRU order only needs to be roughly right
+TOUCH_INTERVAL_SECONDS = 60
+
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def init_extraction_cache():
+    """Create the extraction cache table."""
+    conn = sqlite3.connect(CACHE_DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS extraction_cache (
+            key TEXT PRIMARY KEY,
+            digest TEXT NOT NULL,
+            extractor TEXT NOT NULL,
+            version TEXT NOT NULL,
+            text TEXT NOT NULL,
+            pages TEXT,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_extraction_cache_access ON extraction_cache (last_access)")
+    conn.commit()
+    conn.close()
+
+
+def bytes_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(file_path):
+    """SHA-256 of a file; uploads stored by digest are not re-read."""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    if DIGEST_RE.match(stem) and os.sep + "blobs" + os.sep in os.path.abspath(file_path):
+        return stem
+
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _cache_key(digest, extractor, version):
+    return f"{digest}:{extractor}:{version}"
+
+
+def get_cached_extraction(digest, extractor, version):
+    """Return {"text", "pages"} for a cached extraction, or None."""
+    key = _cache_key(digest, extractor, version)
+    conn = sqlite3.connect(CACHE_DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT text, pages, last_access FROM extraction_cache WHERE key = ?", (key,))
+    row = cursor.fetchone()
+    if row and time.time() - row[2] > TOUCH_INTERVAL_SECONDS:
+        cursor.execute("UPDATE extraction_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+    conn.close()
+
+    if not row:
+        return None
+    return {"text": row[0], "pages": json.loads(row[1]) if row[1] else None}
+
+
+def put_cached_extraction(digest, extractor, version, text, pages=None):
+    """Store an extraction result and evict least recently used entries over the size cap."""
+    key = _cache_key(digest, extractor, version)
+    size = len(text.encode("utf-8"))
+    now = time.time()
+
+    conn = sqlite3.connect(CACHE_DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT OR REPLACE INTO extraction_cache
+        (key, digest, extractor, version, text, pages, size, created_at, last_access)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (key, digest, extractor, str(version), text, json.dumps(pages) if pages is not None else None, size, now, now))
+
+    cursor.execute("SELECT COALESCE(SUM(size), 0) FROM extraction_cache")
+    total = cursor.fetchone()[0]
+    if total > MAX_CACHE_BYTES:
+        cursor.execute("SELECT key, size FROM extraction_cache ORDER BY last_access ASC")
+        evicted = []
+        for old_key, old_size in cursor.fetchall():
+            if total <= MAX_CACHE_BYTES * 0.9:
+                break
+            if old_key == key:
+                continue
+            evicted.append((old_key,))
+            total -= old_size
+        cursor.executemany("DELETE FROM extraction_cache WHERE key = ?", evicted)
+
+    conn.commit()
+    conn.close()
+
+
+def cached_extract(digest, extractor, version, extract_fn):
+    """Return cached text for digest, or run extract_fn and cache its result.
+
+    extract_fn returns either the text or (text, pages). Results flagged as
+    errors (see is_extraction_error) or as partial (pages["complete"] is
+    False, e.g. cut short by a sandbox limit) are returned but not cached.
+    """
+    cached = get_cached_extraction(digest, extractor, version)
+    if cached is not None:
+        return cached["text"]
+
+    result = extract_fn()
+    text, pages = result if isinstance(result, tuple) else (result, None)
+    partial = isinstance(pages, dict) and pages.get("complete") is False
+    if text and not partial and not is_extraction_error(text):
+        put_cached_extraction(digest, extractor, version, text, pages)
+    return text
+
+
+def is_extraction_error(text):
+    """Extractors in this repo report failures in-band; those must not be cached."""
+    return text.startswith(("[Error", "Error", "[Unsupported"))
+
+
+init_extraction_cache()
@@ -0,0 +1,171 @@
+import importlib.util
+import os
+import time
+
+from tools.extraction_sandbox import run_sandboxed, TIMEOUT_SECONDS
+from tools.pdf_extraction import (
+    extract_pdf_text, extract_pdf_pages, iter_pymupdf_pages, iter_pypdf2_pages, PDF_MAX_PAGES, open_source
+)
+
+# Every document text extractor in one place. Each format has an ordered
+# engine list; the first engine that is installed and returns text wins, and
+# the next one is tried when an engine fails or finds nothing. The PDF order
+# comes from benchmarks/bench_extraction_engines.py and can be overridden with
+# e.g. PDF_ENGINES=pdfplumber,pymupdf.
+DEFAULT_ENGINE_ORDER = {
+    ".pdf": "pymupdf,pdfplumber,pypdf2",
+    ".docx": "python-docx",
+    ".txt": "txt",
+}
+
+# Version of extract_document's output in the extraction cache, shared by
+# every caller that caches it; bump when the output changes
+EXTRACTOR_VERSION = 3
+
+_ENGINES = {}
+
+
+def register_engine(name, formats, extract, requires=None):
+    """Add an engine. extract(source, max_pages, max_chars, deadline) returns (text, pages).
+
+    source is a file path or the document's bytes; every engine accepts both.
+
+    max_chars is a text budget (None for everything): engines should stop
+    parsing once they have produced that much text. deadline is a
+    time.monotonic() value shared by the whole fallback chain; sandboxed
+    engines pass it to run_sandboxed instead of starting their own timeout.
+    """
+    _ENGINES[name] = {
+        "name": name,
+        "formats": tuple(formats),
+        "extract": extract,
+        "requires": requires,
+    }
+
+
+def engine_available(name):
+    engine = _ENGINES.get(name)
+    if not engine:
+        return False
+    return engine["requires"] is None or importlib.util.find_spec(engine["requires"]) is not None
+
+
+def engines_for(ext):
+    """Installed engines for a file extension, in preference order."""
+    ext = ext.lower()
+    order = os.getenv(f"{ext.lstrip('.').upper()}_ENGINES", DEFAULT_ENGINE_ORDER.get(ext, ""))
+    names = [name.strip() for name in order.split(",") if name.strip()]
+    return [name for name in names if ext in _ENGINES.get(name, {}).get("formats", ()) and engine_available(name)]
+
+
+def engine_chain_key(ext, max_pages=PDF_MAX_PAGES, max_chars=None):
+    """Extractor name for the extraction cache; changes whenever the engine order or budget does."""
+    engines = engines_for(ext)
+    if not engines:
+        return None
+    key = ">".join(engines)
+    if ext.lower() == ".pdf":
+        key += f"-max{max_pages}"
+    if max_chars:
+        key += f"-chars{max_chars}"
+    return key
+
+
+def extract_document(source, engines=None, max_pages=PDF_MAX_PAGES, max_chars=None, ext=None,
+                     timeout=TIMEOUT_SECONDS):
+    """Extract text with the first engine that succeeds; returns (text, pages).
+
+    source is a file path, or the file's bytes together with ext (".pdf" etc.).
+
+    pages records the engine used and any engines that were skipped. When
+    every engine fails the last error is returned as "[Error extracting text: ...]".
+    With max_chars (roughly 4 characters per token) parsing stops early and
+    at most that many characters are returned.
+
+    The whole chain shares one timeout: a fallback engine only gets the time
+    the engines before it left, and none is started once it has run out.
+    """
+    is_path = isinstance(source, str)
+    ext = (ext or (os.path.splitext(source)[1] if is_path else "")).lower()
+    label = os.path.basename(source) if is_path else f"{len(source)} byte {ext} upload"
+    engines = engines or engines_for(ext)
+    if not engines:
+        return "[Unsupported file type uploaded]", None
+
+    deadline = time.monotonic() + timeout
+    fallbacks = []
+    last_error = None
+    for name in engines:
+        if time.monotonic() >= deadline:
+            last_error = f"extraction timed out after {timeout}s"
+            fallbacks.append({"engine": name, "reason": "timed out"})
+            continue
+        try:
+            text, pages = _ENGINES[name]["extract"](source, max_pages, max_chars, deadline)
+        except Exception as e:
+            last_error = str(e)
+            fallbacks.append({"engine": name, "reason": last_error})
+            print(f"⚠️ {name} failed on {label}: {e}")
+            continue
+
+        text = (text or "").strip()
+        if not text:
+            fallbacks.append({"engine": name, "reason": "no text"})
+            continue
+
+        pages = dict(pages or {})
+        pages["engine"] = name
+        if fallbacks:
+            pages["fallbacks"] = fallbacks
+        return text, pages
+
+    if last_error:
+        return f"[Error extracting text: {last_error}]", None
+    return "", {"engine": None, "fallbacks": fallbacks}
+
+
+# ---- Built-in engines ----
+
+def iter_docx_paragraphs(source, max_chars=None):
+    from docx import Document
+    doc = Document(open_source(source))
+    used = 0
+    for para in doc.paragraphs:
+        if para.text.strip():
+            yield para.text
+            used += len(para.text)
+            if max_chars and used >= max_chars:
+                return
+
+
+def _extract_docx(source, max_pages, max_chars, deadline):
+    result = run_sandboxed(iter_docx_paragraphs, source, max_chars, deadline=deadline)
+    if result["error"] and not result["items"]:
+        raise RuntimeError(result["error"])
+    text = "\n".join(result["items"])
+    return (text[:max_chars] if max_chars else text), {"complete": result["complete"]}
+
+
+def _extract_txt(source, max_pages, max_chars, deadline):
+    if isinstance(source, (bytes, bytearray)):
+        text = source.decode("utf-8", errors="ignore")
+        return (text[:max_chars] if max_chars else text), None
+    with open(source, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read(max_chars or -1), None
+
+
+register_engine("pymupdf", [".pdf"],
+                lambda path, max_pages, max_chars, deadline: extract_pdf_pages(
+                    iter_pymupdf_pages, path, max_pages, max_chars, deadline=deadline),
+                requires="fitz")
+# pdfplumber is the slowest engine but splits long documents across workers
+register_engine("pdfplumber", [".pdf"],
+                lambda path, max_pages, max_chars, deadline: extract_pdf_text(
+                    path, max_pages=max_pages, max_chars=max_chars, deadline=deadline),
+                requires="pdfplumber")
+register_engine("pypdf2", [".pdf"],
+                lambda path, max_pages, max_chars, deadline: extract_pdf_pages(
+                    iter_pypdf2_pages, path, max_pages, max_chars, deadline=deadline),
+                requires="PyPDF2")
+register_engine("python-docx", [".docx"], _extract_docx, requires="docx")
+register_engine("txt", [".txt"], _extract_txt)
@@ -0,0 +1,231 @@
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from tools.extraction_worker import recv_message, send_message
+
+# Document parsing runs in a small pool of supervised worker processes so a
+# pathological file cannot pin or bloat a web worker. Each task is a
+# generator function; whatever it yielded before a limit was hit is
+# returned as a partial result. Workers are started as
+# `python -m tools.extraction_worker`, not by re-importing the web app, so
+# they start fast and small under their memory limit.
+SANDBOX_ENABLED = os.getenv("EXTRACTION_SANDBOX", "1") != "0"
+SANDBOX_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+TIMEOUT_SECONDS = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "20"))
+MEMORY_LIMIT_MB = int(os.getenv("EXTRACTION_MEMORY_MB", "1024"))
+CPU_LIMIT_SECONDS = int(os.getenv("EXTRACTION_CPU_SECONDS", "30"))
+MAX_TASKS_PER_WORKER = int(os.getenv("EXTRACTION_MAX_TASKS_PER_WORKER", "25"))
+# How long a task may wait for a free worker before it is turned away as busy
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("EXTRACTION_QUEUE_TIMEOUT_SECONDS", "10"))
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _Worker:
+    def __init__(self, memory_mb, cpu_seconds):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "tools.extraction_worker", str(memory_mb), str(cpu_seconds)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=PROJECT_ROOT
+        )
+        # A reader thread turns the result pipe into a queue, which can be
+        # waited on with a timeout on every platform
+        self.messages = queue.Queue()
+        threading.Thread(target=self._read_results, daemon=True).start()
+        self.tasks = 0
+
+    def _read_results(self):
+        try:
+            while True:
+                self.messages.put(recv_message(self.process.stdout))
+        except Exception:
+            self.messages.put(("exit", None))
+
+    def send(self, task):
+        send_message(self.process.stdin, task)
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def kill(self):
+        if self.is_alive():
+            self.process.kill()
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            pass
+        for pipe in (self.process.stdin, self.process.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    def stop(self):
+        try:
+            self.send(None)
+            self.process.wait(timeout=1)
+        except (BrokenPipeError, OSError, subprocess.TimeoutExpired):
+            pass
+        self.kill()
+
+
+class ExtractionSupervisor:
+    """Pool of rlimited worker processes with per-task deadlines and recycling."""
+
+    def __init__(self, workers=SANDBOX_WORKERS, memory_mb=MEMORY_LIMIT_MB,
+                 cpu_seconds=CPU_LIMIT_SECONDS, max_tasks=MAX_TASKS_PER_WORKER,
+                 queue_timeout=QUEUE_TIMEOUT_SECONDS):
+        self.size = max(1, workers)
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.max_tasks = max_tasks
+        self.queue_timeout = queue_timeout
+        self._idle = queue.Queue()
+        self._started = 0
+        self._lock = threading.Lock()
+        self.stats = {"tasks": 0, "timeouts": 0, "crashes": 0, "errors": 0, "recycled": 0, "busy": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _acquire(self, deadline):
+        """An idle worker, a new one while the pool is below size, or None once deadline passes."""
+        with self._lock:
+            if self._idle.empty() and self._started < self.size:
+                self._started += 1
+                return _Worker(self.memory_mb, self.cpu_seconds)
+        try:
+            return self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            return None
+
+    def _release(self, worker, healthy):
+        if healthy and worker.tasks < self.max_tasks and worker.is_alive():
+            self._idle.put(worker)
+            return
+        if healthy:
+            self._count("recycled")
+            worker.stop()
+        else:
+            worker.kill()
+        # Replace it right away: other requests may be blocked waiting for a worker
+        self._idle.put(_Worker(self.memory_mb, self.cpu_seconds))
+
+    def run(self, func, *args, timeout=TIMEOUT_SECONDS, deadline=None):
+        """Run generator function func(*args) in a worker.
+
+        Returns {"items", "complete", "error", "elapsed"}. When the deadline
+        passes or the worker dies (memory/CPU rlimit), the items received so
+        far are returned with complete=False. When no worker frees up within
+        queue_timeout (or before the deadline), nothing runs and error is
+        "extraction workers busy".
+        """
+        started = time.monotonic()
+        deadline = deadline or started + timeout
+        if deadline <= started:
+            # An earlier step of the same document used up the shared deadline
+            self._count("timeouts")
+            return {"items": [], "complete": False, "error": "time limit exceeded", "elapsed": 0.0}
+        worker = self._acquire(min(deadline, started + self.queue_timeout))
+        if worker is None:
+            self._count("busy")
+            print(f"⚠️ Sandboxed {func.__name__} not run: all extraction workers busy")
+            return {"items": [], "complete": False, "error": "extraction workers busy",
+                    "elapsed": round(time.monotonic() - started, 3)}
+        worker.tasks += 1
+        self._count("tasks")
+
+        items, complete, error, healthy = [], False, None, True
+        try:
+            worker.send((func.__module__, func.__name__, args))
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    error, healthy = "time limit exceeded", False
+                    self._count("timeouts")
+                    break
+                try:
+                    kind, payload = worker.messages.get(timeout=min(remaining, 0.5))
+                except queue.Empty:
+                    continue
+                if kind == "item":
+                    items.append(payload)
+                elif kind == "done":
+                    complete = True
+                    break
+                elif kind == "exit":
+                    error, healthy = "extraction worker died (resource limit)", False
+                    self._count("crashes")
+                    break
+                else:
+                    error = payload
+                    self._count("errors")
+                    break
+        except (BrokenPipeError, OSError):
+            error, healthy = "extraction worker died (resource limit)", False
+            self._count("crashes")
+        finally:
+            self._release(worker, healthy)
+
+        if error:
+            print(f"⚠️ Sandboxed {func.__name__} stopped early: {error} ({len(items)} items kept)")
+        return {
+            "items": items,
+            "complete": complete,
+            "error": error,
+            "elapsed": round(time.monotonic() - started, 3)
+        }
+
+    def shutdown(self):
+        while not self._idle.empty():
+            self._idle.get().stop()
+        with self._lock:
+            self._started = 0
+
+
+def _run_inline(func, args):
+    started = time.monotonic()
+    items, error = [], None
+    try:
+        items.extend(func(*args))
+    except Exception as e:
+        error = str(e)
+    return {"items": items, "complete": error is None, "error": error,
+            "elapsed": round(time.monotonic() - started, 3)}
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+
+def get_supervisor():
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = ExtractionSupervisor()
+        return _supervisor
+
+
+def configure_supervisor(**kwargs):
+    """Replace the shared supervisor, e.g. to size it for a benchmark run."""
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is not None:
+            _supervisor.shutdown()
+        _supervisor = ExtractionSupervisor(**kwargs)
+        return _supervisor
+
+
+def run_sandboxed(func, *args, timeout=TIMEOUT_SECONDS, deadline=None):
+    """Run a generator-function extraction task in the shared supervised pool.
+
+    With EXTRACTION_SANDBOX=0 the task runs in-process (no limits), which is
+    handy when debugging an extractor.
+    """
+    if not SANDBOX_ENABLED:
+        return _run_inline(func, args)
+    return get_supervisor().run(func, *args, timeout=timeout, deadline=deadline)
@@ -0,0 +1,99 @@
+"""Entry point of a sandboxed extraction worker process.
+
+    python -m tools.extraction_worker MEMORY_MB CPU_SECONDS
+
+Started by tools/extraction_sandbox.py. Only the standard library is
+imported before the rlimits are applied; the extraction module a task names
+is imported on first use, so a worker never loads the web app, the chat
+graph or the embedding model. Tasks and results are length-prefixed
+pickles on stdin/stdout; anything the extractors print goes to stderr.
+"""
+import importlib
+import os
+import pickle
+import struct
+import sys
+
+try:
+    import resource  # POSIX only; on Windows workers run without rlimits
+except ImportError:
+    resource = None
+
+_HEADER = struct.Struct("!I")
+
+
+def send_message(stream, message):
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(_HEADER.pack(len(data)) + data)
+    stream.flush()
+
+
+def _read_exact(stream, size):
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError("extraction worker pipe closed")
+        data += chunk
+    return data
+
+
+def recv_message(stream):
+    (length,) = _HEADER.unpack(_read_exact(stream, _HEADER.size))
+    return pickle.loads(_read_exact(stream, length))
+
+
+def _limit_memory(memory_mb):
+    if resource is None or not memory_mb:
+        return
+    limit = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _limit_cpu_for_next_task(cpu_seconds):
+    """Allow cpu_seconds more CPU time; the kernel sends SIGXCPU past that."""
+    if resource is None or not cpu_seconds:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + cpu_seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def worker_loop(tasks, results, memory_mb, cpu_seconds):
+    """Run one generator task at a time, streaming its items back."""
+    _limit_memory(memory_mb)
+    while True:
+        try:
+            task = recv_message(tasks)
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        module_name, func_name, args = task
+        _limit_cpu_for_next_task(cpu_seconds)
+        try:
+            func = getattr(importlib.import_module(module_name), func_name)
+            for item in func(*args):
+                send_message(results, ("item", item))
+            send_message(results, ("done", None))
+        except MemoryError:
+            send_message(results, ("error", f"memory limit of {memory_mb} MB exceeded"))
+        except Exception as e:
+            send_message(results, ("error", str(e)))
+
+
+def main():
+    memory_mb, cpu_seconds = int(sys.argv[1]), int(sys.argv[2])
+    # Keep the real stdout for results; stray prints from extractors go to stderr
+    results = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    worker_loop(sys.stdin.buffer, results, memory_mb, cpu_seconds)
+
+
+if __name__ == "__main__":
+    main()
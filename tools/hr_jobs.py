@@ -1,12 +1,16 @@
 import sqlite3
 import os
+import hashlib
 from datetime import datetime
-import PyPDF2
-import io
 import base64
+from tools.extraction_cache import cached_extract, bytes_digest
+from tools.extraction_sandbox import run_sandboxed
+from tools.pdf_extraction import iter_pypdf2_pages
 
-# Database path
-DB_PATH = os.path.join(os.path.dirname(__file__), "hr_applications.db")
+# Database path; HR_DB_PATH points benchmarks and tests at a scratch copy
+DB_PATH = os.getenv("HR_DB_PATH", os.path.join(os.path.dirname(__file__), "hr_applications.db"))
+# PRAGMA user_version once migrate_hr_db has run; 1 = resume bodies moved to resume_blobs
+HR_SCHEMA_VERSION = 1
 
 def init_hr_db():
     """Initialize the HR applications database."""
@@ -43,10 +47,131 @@ def init_hr_db():
             is_active BOOLEAN DEFAULT 1
         )
     ''')
-    
+
+    # Resume bodies live outside job_applications, keyed by SHA-256 of the body,
+    # so list scans only walk compact metadata rows.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS resume_blobs (
+            hash TEXT PRIMARY KEY,
+            content TEXT,
+            extracted_text TEXT,
+            size INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    try:
+        cursor.execute("ALTER TABLE job_applications ADD COLUMN resume_hash TEXT")
+    except sqlite3.OperationalError:
+        pass
+
+    # Indexes for the admin listing: newest first, optionally filtered by status/position
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_job_applications_date ON job_applications (application_date DESC, id DESC)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_job_applications_status ON job_applications (status, application_date DESC, id DESC)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_job_applications_position ON job_applications (position, application_date DESC, id DESC)")
+
+    cursor.execute("PRAGMA user_version")
+    if cursor.fetchone()[0] < HR_SCHEMA_VERSION:
+        cursor.execute("SELECT 1 FROM job_applications WHERE resume_content IS NOT NULL AND resume_hash IS NULL LIMIT 1")
+        if cursor.fetchone():
+            print("⚠️ job_applications still holds inline resumes; run: python -m tools.hr_jobs migrate")
+        else:
+            # New or already migrated database: nothing to move
+            cursor.execute(f"PRAGMA user_version = {HR_SCHEMA_VERSION}")
+
     conn.commit()
     conn.close()
 
+def migrate_hr_db():
+    """One-off schema migration; returns the number of resume bodies moved.
+
+    Run once after upgrading (python -m tools.hr_jobs migrate). Does nothing
+    when PRAGMA user_version is already HR_SCHEMA_VERSION.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA user_version")
+    if cursor.fetchone()[0] >= HR_SCHEMA_VERSION:
+        conn.close()
+        return 0
+
+    migrated = _migrate_resume_content(cursor)
+    cursor.execute(f"PRAGMA user_version = {HR_SCHEMA_VERSION}")
+    conn.commit()
+    if migrated:
+        # Reclaim the pages the inline resume bodies used to occupy
+        conn.execute("VACUUM")
+    conn.close()
+    print(f"📦 Moved {migrated} resume bodies into resume_blobs")
+    return migrated
+
+def _resume_hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def put_resume_blob(cursor, content, extracted_text=None):
+    """Store a resume body (and its extracted text) once; return its hash."""
+    if content is None:
+        return None
+    resume_hash = _resume_hash(content)
+    if extracted_text == content:
+        extracted_text = None  # plain-text resumes: don't store the body twice
+    cursor.execute('''
+        INSERT OR IGNORE INTO resume_blobs (hash, content, extracted_text, size)
+        VALUES (?, ?, ?, ?)
+    ''', (resume_hash, content, extracted_text, len(content)))
+    if extracted_text:
+        cursor.execute(
+            "UPDATE resume_blobs SET extracted_text = ? WHERE hash = ? AND extracted_text IS NULL",
+            (extracted_text, resume_hash)
+        )
+    return resume_hash
+
+def get_resume_blob(resume_hash):
+    """Get a stored resume body and its extracted text by hash."""
+    if not resume_hash:
+        return None
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT content, extracted_text, size FROM resume_blobs WHERE hash = ?", (resume_hash,))
+    row = cursor.fetchone()
+    conn.close()
+    if not row:
+        return None
+    return {
+        "hash": resume_hash,
+        "content": row[0],
+        "extracted_text": row[1] or row[0],
+        "size": row[2]
+    }
+
+def prune_resume_blobs():
+    """Delete resume blobs no application references any more."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        DELETE FROM resume_blobs
+        WHERE hash NOT IN (SELECT resume_hash FROM job_applications WHERE resume_hash IS NOT NULL)
+    ''')
+    removed = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return removed
+
+def _migrate_resume_content(cursor):
+    """Move legacy inline resume_content values into resume_blobs."""
+    cursor.execute('''
+        SELECT id, resume_content FROM job_applications
+        WHERE resume_content IS NOT NULL AND resume_hash IS NULL
+    ''')
+    rows = cursor.fetchall()
+    for app_id, content in rows:
+        resume_hash = put_resume_blob(cursor, content)
+        cursor.execute(
+            "UPDATE job_applications SET resume_hash = ?, resume_content = NULL WHERE id = ?",
+            (resume_hash, app_id)
+        )
+    return len(rows)
+
 def add_job_opening(title, department, description, requirements, location="Indore", employment_type="Full-time"):
     """Add a new job opening."""
     conn = sqlite3.connect(DB_PATH)
@@ -57,8 +182,11 @@ def add_job_opening(title, department, description, requirements, location="Indo
         VALUES (?, ?, ?, ?, ?, ?)
     ''', (title, department, description, requirements, location, employment_type))
     
+    job_id = cursor.lastrowid
     conn.commit()
     conn.close()
+    
+    return job_id
 
 def get_active_job_openings():
     """Get all active job openings."""
@@ -89,61 +217,64 @@ def get_active_job_openings():
         for job in jobs
     ]
 
+# Bump when extract_text_from_pdf output changes so cached results are not reused
+PDF_EXTRACTOR_VERSION = 1
+
 def extract_text_from_pdf(pdf_content):
-    """Extract text from PDF content using PyPDF2 with optimized performance."""
+    """Extract text from PDF content using PyPDF2 with optimized performance.
+
+    Results are cached by content hash, so the same resume sent again (e.g. as
+    base64 on every chat message) is not parsed again.
+    """
     try:
         # Convert base64 to bytes if needed
         if isinstance(pdf_content, str):
             pdf_bytes = base64.b64decode(pdf_content)
         else:
             pdf_bytes = pdf_content
-            
-        pdf_file = io.BytesIO(pdf_bytes)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        
-        # Check if PDF is encrypted
-        if pdf_reader.is_encrypted:
-            try:
-                pdf_reader.decrypt("")  # Try empty password
-            except:
-                return "Error: PDF is password protected and cannot be read."
-        
-        text = ""
-        total_pages = len(pdf_reader.pages)
-        
-        # Limit to first 3 pages for speed (most resumes are 1-2 pages)
-        max_pages = min(total_pages, 3)
-        
-        # Extract text from pages
-        for page_num in range(max_pages):
-            try:
-                page = pdf_reader.pages[page_num]
-                page_text = page.extract_text()
-                if page_text.strip():  # Only add non-empty pages
-                    text += page_text + "\n"
-            except Exception as page_error:
-                print(f"Error reading page {page_num + 1}: {page_error}")
-                continue
-        
-        # Basic text cleanup
-        if text.strip():
-            # Remove excessive whitespace
-            import re
-            text = re.sub(r'\s+', ' ', text)
-            text = text.strip()
-            
-            # Limit text length for processing speed (first 5000 characters)
-            if len(text) > 5000:
-                text = text[:5000] + "..."
-            
-            return text
-        else:
-            return "Error: No readable text found in PDF. The PDF might be image-based or corrupted."
-            
     except Exception as e:
         print(f"PDF extraction error: {str(e)}")
         return f"Error extracting text from PDF: {str(e)}"
 
+    return cached_extract(
+        bytes_digest(pdf_bytes), "pypdf2", PDF_EXTRACTOR_VERSION,
+        lambda: _extract_text_from_pdf_bytes(pdf_bytes)
+    )
+
+def _extract_text_from_pdf_bytes(pdf_bytes):
+    # Parsing runs in a supervised worker process with time/memory limits
+    result = run_sandboxed(iter_pypdf2_pages, pdf_bytes, 3)  # First 3 pages (most resumes are 1-2 pages)
+    items = result["items"]
+    if not items:
+        print(f"PDF extraction error: {result['error']}")
+        if result["error"] and "password protected" in result["error"]:
+            return "Error: PDF is password protected and cannot be read."
+        return f"Error extracting text from PDF: {result['error']}"
+
+    total_pages = items[0][1]
+    page_texts = [page_text for _, page_text in items[1:]]
+    text = "".join(page_text + "\n" for page_text in page_texts if page_text.strip())
+
+    # Basic text cleanup
+    if text.strip():
+        # Remove excessive whitespace
+        import re
+        text = re.sub(r'\s+', ' ', text)
+        text = text.strip()
+
+        # Limit text length for processing speed (first 5000 characters)
+        if len(text) > 5000:
+            text = text[:5000] + "..."
+
+        pages = {"page_count": total_pages, "pages_read": len(page_texts), "complete": result["complete"]}
+        if result["error"]:
+            pages["error"] = result["error"]
+        return text, pages
+    elif not result["complete"]:
+        return f"Error extracting text from PDF: {result['error']}"
+    else:
+        return "Error: No readable text found in PDF. The PDF might be image-based or corrupted."
+
 def clean_extracted_text(text):
     """Clean and format extracted text for better processing."""
     if not text:
@@ -252,18 +383,20 @@ def analyze_resume_text(extracted_text):
     
     return analysis
 
-def save_job_application(name, email, phone, position, resume_filename, resume_content, file_path):
-    """Save a job application with resume."""
+def save_job_application(name, email, phone, position, resume_filename, resume_content, file_path, extracted_text=None):
+    """Save a job application with resume.
+
+    The resume body goes to resume_blobs; the application row only keeps its hash.
+    """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    # Extract text from PDF
-    # extracted_text = extract_text_from_pdf(resume_content)
+    resume_hash = put_resume_blob(cursor, resume_content, extracted_text)
     
     cursor.execute('''
-        INSERT INTO job_applications (name, email, phone, position, resume_filename, resume_content, file_path)
+        INSERT INTO job_applications (name, email, phone, position, resume_filename, resume_hash, file_path)
         VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (name, email, phone, position, resume_filename, resume_content, file_path))
+    ''', (name, email, phone, position, resume_filename, resume_hash, file_path))
     
     application_id = cursor.lastrowid
     conn.commit()
@@ -271,6 +404,33 @@ def save_job_application(name, email, phone, position, resume_filename, resume_c
     
     return application_id, file_path
 
+def save_job_applications_batch(applications):
+    """Save many applications in one transaction; returns their ids in order.
+
+    Each item is a dict with the save_job_application arguments.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    application_ids = []
+    try:
+        for app in applications:
+            resume_hash = put_resume_blob(cursor, app["resume_content"], app.get("extracted_text"))
+            cursor.execute('''
+                INSERT INTO job_applications (name, email, phone, position, resume_filename, resume_hash, file_path)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (app["name"], app["email"], app["phone"], app["position"],
+                  app["resume_filename"], resume_hash, app["file_path"]))
+            application_ids.append(cursor.lastrowid)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return application_ids
+
+
 # def get_job_application(application_id):
 #     """Get job application by ID."""
 #     conn = sqlite3.connect(DB_PATH)
@@ -299,21 +459,29 @@ def save_job_application(name, email, phone, position, resume_filename, resume_c
 #         }
 #     return None
 
-def get_job_application(application_id):
-    """Get job application by ID."""
+def get_job_application(application_id, include_resume=True):
+    """Get job application by ID.
+
+    The resume text is only loaded from resume_blobs when include_resume is set.
+    """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
     cursor.execute('''
-        SELECT id, name, email, phone, position, resume_filename, resume_content, file_path, application_date, status
+        SELECT id, name, email, phone, position, resume_filename, resume_hash, file_path, application_date, status,
+               CASE WHEN resume_hash IS NULL AND ? THEN resume_content END
         FROM job_applications 
         WHERE id = ?
-    ''', (application_id,))
+    ''', (1 if include_resume else 0, application_id))
     
     application = cursor.fetchone()
     conn.close()
     
     if application:
+        blob = get_resume_blob(application[6]) if include_resume else None
+        if blob is None and application[10]:
+            # Not migrated yet (python -m tools.hr_jobs migrate): the body is still inline
+            blob = {"content": application[10], "extracted_text": application[10]}
         return {
             "id": application[0],
             "name": application[1],
@@ -321,7 +489,10 @@ def get_job_application(application_id):
             "phone": application[3],
             "position": application[4],
             "resume_filename": application[5],
-            "resume_content": application[6],   # ✅ FIX
+            "resume_hash": application[6],
+            # The stored body (base64 file for old chat uploads) and its extracted text
+            "resume_content": blob["content"] if blob else None,
+            "resume_text": blob["extracted_text"] if blob else None,
             "file_path": application[7],
             "application_date": application[8],
             "status": application[9]
@@ -358,6 +529,93 @@ def get_all_applications():
         for app in applications
     ]
 
+def _application_filters(status=None, position=None, date_from=None, date_to=None):
+    """Build the WHERE clause shared by the paginated application queries."""
+    clauses = []
+    params = []
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    if position:
+        clauses.append("position = ?")
+        params.append(position)
+    if date_from:
+        clauses.append("application_date >= ?")
+        params.append(date_from)
+    if date_to:
+        # date_to is a day (YYYY-MM-DD); include the whole day
+        clauses.append("application_date < date(?, '+1 day')")
+        params.append(date_to)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+def get_applications_page(page=1, per_page=25, status=None, position=None, date_from=None, date_to=None):
+    """Get one page of job applications, newest first, with optional filters."""
+    page = max(1, int(page))
+    per_page = max(1, min(int(per_page), 200))
+    where, params = _application_filters(status, position, date_from, date_to)
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute(f"SELECT COUNT(*) FROM job_applications {where}", params)
+    total = cursor.fetchone()[0]
+
+    cursor.execute(f'''
+        SELECT id, name, email, phone, position, resume_filename, application_date, status
+        FROM job_applications
+        {where}
+        ORDER BY application_date DESC, id DESC
+        LIMIT ? OFFSET ?
+    ''', (*params, per_page, (page - 1) * per_page))
+
+    applications = cursor.fetchall()
+    conn.close()
+
+    return {
+        "applications": [
+            {
+                "id": app[0],
+                "name": app[1],
+                "email": app[2],
+                "phone": app[3],
+                "position": app[4],
+                "resume_filename": app[5],
+                "application_date": app[6],
+                "status": app[7]
+            }
+            for app in applications
+        ],
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "pages": max(1, (total + per_page - 1) // per_page)
+    }
+
+def get_recent_applications(limit=5):
+    """Get the most recent job applications."""
+    return get_applications_page(page=1, per_page=limit)["applications"]
+
+def count_applications():
+    """Count all job applications."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM job_applications")
+    total = cursor.fetchone()[0]
+    conn.close()
+    return total
+
+def get_application_filter_options():
+    """Distinct statuses and positions, for the admin filter dropdowns."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT status FROM job_applications ORDER BY status")
+    statuses = [row[0] for row in cursor.fetchall() if row[0]]
+    cursor.execute("SELECT DISTINCT position FROM job_applications ORDER BY position")
+    positions = [row[0] for row in cursor.fetchall() if row[0]]
+    conn.close()
+    return {"statuses": statuses, "positions": positions}
+
 # Initialize the database when module is imported
 init_hr_db()
 
@@ -409,3 +667,11 @@ def add_sample_jobs():
 
 # Add sample jobs
 add_sample_jobs()
+
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] == ["migrate"]:
+        migrate_hr_db()
+    else:
+        print("usage: python -m tools.hr_jobs migrate")
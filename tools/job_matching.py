@@ -0,0 +1,470 @@
+import sqlite3
+import hashlib
+import re
+import threading
+import time
+
+import numpy as np
+
+from tools.embedding_backends import embedding_space_id
+from tools.hr_jobs import DB_PATH, get_active_job_openings
+
+# Cosine similarities from MiniLM rarely leave this band, so it is stretched
+# to 0-100 when we report a "match percentage" to the user.
+SCORE_FLOOR = 0.15
+SCORE_CEILING = 0.65
+
+MAX_RESUME_SECTIONS = 12
+SECTION_CHARS = 600
+
+EMBED_BATCH_SIZE = 64
+
+RESUME_HEADINGS = [
+    "summary", "objective", "profile", "about me",
+    "education", "qualification", "academic",
+    "experience", "employment", "work history", "professional experience", "internship",
+    "skills", "technical skills", "competencies", "technologies",
+    "projects", "portfolio", "certifications", "certificates", "achievements", "awards",
+]
+
+# In-process copy of the job vectors, rebuilt whenever the version in
+# job_matrix_meta moves (another worker may have saved a job).
+_cache_lock = threading.Lock()
+_job_matrix = None
+_job_rows = []
+_job_matrix_version = None
+
+_shortlist_locks = {}
+_shortlist_locks_guard = threading.Lock()
+# One application embedding pass at a time; a queued pass finds nothing left to do
+_application_sync_lock = threading.Lock()
+
+
+def _get_embedder():
+    from tools.about_syscraft import get_embedder
+    return get_embedder()
+
+
+def init_job_matching_db():
+    """Create the tables that hold job embeddings."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_embeddings (
+            job_id INTEGER PRIMARY KEY,
+            text_hash TEXT NOT NULL,
+            embedding BLOB NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_matrix_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO job_matrix_meta (id, version) VALUES (1, 0)")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS application_embeddings (
+            application_id INTEGER PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            embedding BLOB NOT NULL
+        )
+    ''')
+
+    # Resume and embedding space each vector was built from, so pending
+    # applications can be found with a join instead of re-hashing every resume
+    for column in ("resume_hash", "space"):
+        try:
+            cursor.execute(f"ALTER TABLE application_embeddings ADD COLUMN {column} TEXT")
+        except sqlite3.OperationalError:
+            pass
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_shortlists (
+            job_id INTEGER NOT NULL,
+            application_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            job_hash TEXT NOT NULL,
+            scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (job_id, application_id)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_job_shortlists_score ON job_shortlists (job_id, score DESC)")
+
+    conn.commit()
+    conn.close()
+
+
+def job_embedding_text(job):
+    """Text used to embed a job opening."""
+    return " ".join(filter(None, [
+        job.get("title"), job.get("department"), job.get("description"), job.get("requirements")
+    ]))
+
+
+def _text_hash(text):
+    # Stored vectors from another embedding backend are stale too
+    return hashlib.sha1((embedding_space_id() + text).encode("utf-8")).hexdigest()
+
+
+def _bump_version(cursor):
+    cursor.execute("UPDATE job_matrix_meta SET version = version + 1 WHERE id = 1")
+
+
+def sync_job_embeddings():
+    """Embed new or edited active jobs and drop vectors of inactive/deleted ones.
+
+    All stale jobs are encoded in a single batched call. Returns the number of
+    jobs (re)embedded.
+    """
+    jobs = get_active_job_openings()
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT job_id, text_hash FROM job_embeddings")
+    stored = dict(cursor.fetchall())
+
+    stale_jobs, stale_texts = [], []
+    for job in jobs:
+        text = job_embedding_text(job)
+        if stored.get(job["id"]) != _text_hash(text):
+            stale_jobs.append(job)
+            stale_texts.append(text)
+
+    active_ids = {job["id"] for job in jobs}
+    removed_ids = [job_id for job_id in stored if job_id not in active_ids]
+
+    if stale_texts:
+        vectors = _get_embedder().encode(stale_texts, normalize_embeddings=True)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        cursor.executemany('''
+            INSERT OR REPLACE INTO job_embeddings (job_id, text_hash, embedding, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ''', [
+            (job["id"], _text_hash(text), vector.tobytes())
+            for job, text, vector in zip(stale_jobs, stale_texts, vectors)
+        ])
+
+    if removed_ids:
+        cursor.executemany("DELETE FROM job_embeddings WHERE job_id = ?", [(i,) for i in removed_ids])
+
+    if stale_texts or removed_ids:
+        _bump_version(cursor)
+        print(f"🧮 Job embeddings synced: {len(stale_texts)} embedded, {len(removed_ids)} removed")
+
+    conn.commit()
+    conn.close()
+    return len(stale_texts)
+
+
+def _current_version():
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT version FROM job_matrix_meta WHERE id = 1")
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+
+def get_job_matrix():
+    """Return (matrix, jobs) for all active jobs.
+
+    The matrix is a contiguous float32 array of L2-normalised rows, one per
+    job, aligned with the returned job list.
+    """
+    global _job_matrix, _job_rows, _job_matrix_version
+
+    version = _current_version()
+    with _cache_lock:
+        if _job_matrix is not None and version == _job_matrix_version:
+            return _job_matrix, _job_rows
+
+        if _job_matrix is None:
+            # First use in this process: make sure jobs inserted without going
+            # through the admin (e.g. the sample jobs) have vectors.
+            sync_job_embeddings()
+            version = _current_version()
+
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT j.id, j.title, j.department, j.location, j.employment_type, e.embedding
+            FROM job_embeddings e
+            JOIN job_openings j ON j.id = e.job_id
+            WHERE j.is_active = 1
+            ORDER BY j.id
+        ''')
+        rows = cursor.fetchall()
+        conn.close()
+
+        if rows:
+            matrix = np.ascontiguousarray(
+                np.vstack([np.frombuffer(row[5], dtype=np.float32) for row in rows])
+            )
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+
+        _job_rows = [
+            {"id": r[0], "title": r[1], "department": r[2], "location": r[3], "employment_type": r[4]}
+            for r in rows
+        ]
+        _job_matrix = matrix
+        _job_matrix_version = version
+        return _job_matrix, _job_rows
+
+
+def split_resume_sections(resume_text):
+    """Split resume text into sections on heading lines, falling back to fixed-size chunks."""
+    lines = [line.strip() for line in resume_text.splitlines() if line.strip()]
+
+    sections, current = [], []
+    for line in lines:
+        lowered = line.lower().rstrip(":")
+        is_heading = len(line) <= 40 and any(lowered.startswith(h) for h in RESUME_HEADINGS)
+        if is_heading and current:
+            sections.append(" ".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append(" ".join(current))
+
+    if len(sections) <= 1:
+        flat = re.sub(r"\s+", " ", resume_text).strip()
+        sections = [flat[i:i + SECTION_CHARS] for i in range(0, len(flat), SECTION_CHARS)]
+
+    return [s for s in sections if s][:MAX_RESUME_SECTIONS]
+
+
+def to_match_percentage(score):
+    scaled = (score - SCORE_FLOOR) / (SCORE_CEILING - SCORE_FLOOR)
+    return int(round(max(0.0, min(1.0, scaled)) * 100))
+
+
+def rank_jobs_for_resume(resume_text, top_k=5):
+    """Rank active jobs for a resume with one matrix multiply.
+
+    The whole resume (truncated) and each of its sections are embedded in one
+    batch; a job's score blends whole-document similarity with its best
+    section similarity.
+    """
+    started = time.perf_counter()
+    matrix, jobs = get_job_matrix()
+    if not jobs or not resume_text or not resume_text.strip():
+        return {"success": False, "error": "No active job openings or empty resume", "matches": []}
+
+    sections = split_resume_sections(resume_text)
+    document = re.sub(r"\s+", " ", resume_text).strip()[:2000]
+
+    vectors = _get_embedder().encode([document] + sections, normalize_embeddings=True)
+    vectors = np.asarray(vectors, dtype=np.float32)
+
+    similarities = vectors @ matrix.T  # (1 + sections, jobs)
+    if len(sections) > 0:
+        scores = 0.5 * similarities[0] + 0.5 * similarities[1:].max(axis=0)
+    else:
+        scores = similarities[0]
+
+    top_k = max(1, min(int(top_k), len(jobs)))
+    order = np.argsort(-scores)[:top_k]
+
+    matches = [
+        {
+            **jobs[i],
+            "score": round(float(scores[i]), 4),
+            "match_percentage": to_match_percentage(float(scores[i])),
+        }
+        for i in order
+    ]
+
+    return {
+        "success": True,
+        "total_jobs": len(jobs),
+        "matches": matches,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def _pending_application_texts(cursor):
+    """(application_id, resume_hash, text to embed) for applications without a current vector.
+
+    Only new applications, changed resumes and vectors from another embedding
+    space are returned, so a save costs the same however many are stored.
+    """
+    cursor.execute('''
+        SELECT a.id, a.resume_hash, a.position, COALESCE(b.extracted_text, b.content)
+        FROM job_applications a
+        LEFT JOIN application_embeddings e ON e.application_id = a.id
+        LEFT JOIN resume_blobs b ON b.hash = a.resume_hash
+        WHERE e.application_id IS NULL OR e.resume_hash IS NOT a.resume_hash OR e.space IS NOT ?
+    ''', (embedding_space_id(),))
+    return [(app_id, resume_hash, " ".join(filter(None, [position, content])))
+            for app_id, resume_hash, position, content in cursor.fetchall()]
+
+
+def sync_application_embeddings():
+    """Embed applications that are new or whose resume changed, in batches.
+
+    Returns the number of applications (re)embedded.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    # Vectors and scores of deleted applications
+    cursor.execute("DELETE FROM application_embeddings WHERE application_id NOT IN (SELECT id FROM job_applications)")
+    cursor.execute("DELETE FROM job_shortlists WHERE application_id NOT IN (SELECT id FROM job_applications)")
+
+    pending = []
+    for app_id, resume_hash, text in _pending_application_texts(cursor):
+        text = re.sub(r"\s+", " ", text).strip()[:2000]
+        if text:
+            pending.append((app_id, resume_hash, text))
+
+    space = embedding_space_id()
+    for start in range(0, len(pending), EMBED_BATCH_SIZE):
+        batch = pending[start:start + EMBED_BATCH_SIZE]
+        vectors = _get_embedder().encode([text for _, _, text in batch], normalize_embeddings=True)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        cursor.executemany('''
+            INSERT OR REPLACE INTO application_embeddings (application_id, content_hash, embedding, resume_hash, space)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(app_id, _text_hash(text), vector.tobytes(), resume_hash, space)
+              for (app_id, resume_hash, text), vector in zip(batch, vectors)])
+        # A changed resume invalidates every score computed from its old vector
+        cursor.executemany("DELETE FROM job_shortlists WHERE application_id = ?", [(app_id,) for app_id, _, _ in batch])
+        conn.commit()
+
+    conn.commit()
+    conn.close()
+    return len(pending)
+
+
+def embed_pending_applications():
+    """sync_application_embeddings, serialised across threads."""
+    with _application_sync_lock:
+        return sync_application_embeddings()
+
+
+def schedule_application_embedding():
+    """Embed newly saved applications in a background thread, off the request path."""
+    def run():
+        try:
+            embed_pending_applications()
+        except Exception as e:
+            print(f"⚠️ Application embedding failed: {e}")
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def _job_lock(job_id):
+    with _shortlist_locks_guard:
+        return _shortlist_locks.setdefault(job_id, threading.Lock())
+
+
+def score_applicants_for_job(job_id):
+    """Score stored applications against one job and persist the shortlist.
+
+    Incremental: only applications without a score for the job's current text
+    are scored, and editing the job text discards its old scores. Applications
+    are embedded when they are saved (schedule_application_embedding), so only
+    those already embedded are scored here. Returns the number of applications
+    scored in this run.
+    """
+    with _job_lock(job_id):
+        sync_job_embeddings()
+
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute("SELECT text_hash, embedding FROM job_embeddings WHERE job_id = ?", (job_id,))
+        job_row = cursor.fetchone()
+        if not job_row:
+            # Inactive or deleted job: nothing to rank against
+            cursor.execute("DELETE FROM job_shortlists WHERE job_id = ?", (job_id,))
+            conn.commit()
+            conn.close()
+            return 0
+
+        job_hash, job_blob = job_row
+        job_vector = np.frombuffer(job_blob, dtype=np.float32)
+
+        cursor.execute("DELETE FROM job_shortlists WHERE job_id = ? AND job_hash != ?", (job_id, job_hash))
+        cursor.execute('''
+            SELECT e.application_id, e.embedding
+            FROM application_embeddings e
+            LEFT JOIN job_shortlists s ON s.application_id = e.application_id AND s.job_id = ?
+            WHERE s.application_id IS NULL
+        ''', (job_id,))
+        pending = cursor.fetchall()
+
+        if pending:
+            matrix = np.ascontiguousarray(
+                np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in pending])
+            )
+            scores = matrix @ job_vector
+            cursor.executemany('''
+                INSERT OR REPLACE INTO job_shortlists (job_id, application_id, score, job_hash)
+                VALUES (?, ?, ?, ?)
+            ''', [(job_id, app_id, float(score), job_hash) for (app_id, _), score in zip(pending, scores)])
+            print(f"📋 Shortlist for job {job_id}: scored {len(pending)} applications")
+
+        conn.commit()
+        conn.close()
+        return len(pending)
+
+
+def schedule_shortlist_refresh(job_id):
+    """Sync job vectors, embed pending applications and run score_applicants_for_job, in a background thread.
+
+    Job add/edit/delete handlers call this instead of embedding on the request.
+    """
+    def run():
+        try:
+            # First, so rank_jobs_for_resume sees the job change without waiting for applications
+            sync_job_embeddings()
+            embed_pending_applications()
+            score_applicants_for_job(job_id)
+        except Exception as e:
+            print(f"⚠️ Shortlist refresh failed for job {job_id}: {e}")
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def get_job_shortlist(job_id, limit=25):
+    """Ranked applicants stored for a job."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT a.id, a.name, a.email, a.position, a.application_date, a.status, s.score, s.scored_at
+        FROM job_shortlists s
+        JOIN job_applications a ON a.id = s.application_id
+        WHERE s.job_id = ?
+        ORDER BY s.score DESC
+        LIMIT ?
+    ''', (job_id, limit))
+    rows = cursor.fetchall()
+    conn.close()
+
+    return [
+        {
+            "id": r[0],
+            "name": r[1],
+            "email": r[2],
+            "position": r[3],
+            "application_date": r[4],
+            "status": r[5],
+            "score": round(r[6], 4),
+            "match_percentage": to_match_percentage(r[6]),
+            "scored_at": r[7]
+        }
+        for r in rows
+    ]
+
+
+init_job_matching_db()
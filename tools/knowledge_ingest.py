@@ -0,0 +1,340 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+
+from tools import about_syscraft
+from tools.embedding_backends import embedding_space_id
+from tools.extraction_cache import cached_extract, bytes_digest
+from tools.extraction_engines import extract_document, engine_chain_key, EXTRACTOR_VERSION
+from tools.extraction_sandbox import SANDBOX_WORKERS
+from tools.hr_jobs import DB_PATH, get_active_job_openings
+
+# Bulk ingestion into the company knowledge index: brochures, case-study
+# PDFs, service pages saved as HTML, and the open job postings. Documents
+# stream through in groups: each group is extracted, cleaned and chunked in
+# parallel and embedded in large batches. Only the new vectors are kept until
+# the end of the run, which is published as one index generation (a Pinecone
+# generation copies the whole namespace, so one publish per group would cost
+# groups x corpus upserts) and then recorded in the manifest. A rerun skips
+# every source whose content hash is already in the manifest.
+KNOWLEDGE_EXTENSIONS = (".pdf", ".docx", ".txt", ".md", ".html", ".htm")
+KNOWLEDGE_GROUP_SIZE = int(os.getenv("KNOWLEDGE_GROUP_SIZE", "20"))
+KNOWLEDGE_EMBED_BATCH = int(os.getenv("KNOWLEDGE_EMBED_BATCH", "128"))
+KNOWLEDGE_WORKERS = int(os.getenv("KNOWLEDGE_WORKERS", str(SANDBOX_WORKERS)))
+KNOWLEDGE_MAX_FILE_BYTES = int(os.getenv("KNOWLEDGE_MAX_FILE_MB", "25")) * 1024 * 1024
+KNOWLEDGE_MAX_CHARS = int(os.getenv("KNOWLEDGE_MAX_CHARS", "300000"))
+# Follows the shared extractor version, so engine changes invalidate knowledge extractions too
+KNOWLEDGE_EXTRACTOR_VERSION = f"{EXTRACTOR_VERSION}-knowledge1"
+DEFAULT_COMPANY_ID = "default_company"
+
+
+def init_knowledge_manifest():
+    """Create the manifest of ingested knowledge sources."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS knowledge_manifest (
+            source TEXT PRIMARY KEY,
+            company_id TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            chunk_ids TEXT NOT NULL,
+            chars INTEGER NOT NULL,
+            ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def _manifest_rows(company_id):
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT source, content_hash, chunk_ids FROM knowledge_manifest WHERE company_id = ?", (company_id,))
+    rows = {source: {"hash": content_hash, "chunk_ids": json.loads(chunk_ids)}
+            for source, content_hash, chunk_ids in cursor.fetchall()}
+    conn.close()
+    return rows
+
+
+def _record_sources(company_id, done, removed):
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.executemany('''
+        INSERT OR REPLACE INTO knowledge_manifest (source, company_id, content_hash, chunk_ids, chars)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(doc["source"], company_id, doc["hash"], json.dumps(doc["chunk_ids"]), doc["chars"]) for doc in done])
+    cursor.executemany("DELETE FROM knowledge_manifest WHERE source = ?", [(source,) for source in removed])
+    conn.commit()
+    conn.close()
+
+
+# ---- Sources ----
+
+def iter_file_sources(paths):
+    """Yield (source, ext, bytes) for files under the given paths, directories walked recursively."""
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        else:
+            files = [path]
+        for file_path in files:
+            ext = os.path.splitext(file_path)[1].lower()
+            if ext not in KNOWLEDGE_EXTENSIONS or os.path.basename(file_path).startswith("."):
+                continue
+            if os.path.getsize(file_path) > KNOWLEDGE_MAX_FILE_BYTES:
+                print(f"⚠️ Skipping {file_path}: larger than {KNOWLEDGE_MAX_FILE_BYTES // (1024 * 1024)} MB")
+                continue
+            with open(file_path, "rb") as f:
+                yield f"file:{os.path.abspath(file_path)}", ext, f.read()
+
+
+def job_knowledge_text(job):
+    """A job opening as a knowledge document."""
+    details = ", ".join(filter(None, [job.get("department"), job.get("location"), job.get("employment_type")]))
+    lines = [f"Job opening: {job['title']}" + (f" ({details})" if details else "")]
+    if job.get("description"):
+        lines.append(job["description"])
+    if job.get("requirements"):
+        lines.append(f"Requirements: {job['requirements']}")
+    return "\n".join(lines)
+
+
+def iter_job_sources():
+    for job in get_active_job_openings():
+        yield f"job:{job['id']}", ".txt", job_knowledge_text(job).encode("utf-8")
+
+
+# ---- Extraction and cleaning ----
+
+class _HTMLText(HTMLParser):
+    """Visible text of a saved web page, without scripts, styles and site chrome."""
+    SKIP = {"script", "style", "noscript", "nav", "header", "footer", "svg", "form"}
+    BLOCK = {"p", "div", "br", "li", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "section", "article"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self.skipping += 1
+        elif tag in self.BLOCK:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self.skipping:
+            self.skipping -= 1
+        elif tag in self.BLOCK:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+
+def html_to_text(data):
+    parser = _HTMLText()
+    parser.feed(data.decode("utf-8", errors="ignore"))
+    return "".join(parser.parts)
+
+
+def clean_text(text):
+    """Collapse whitespace and drop page numbers and headers/footers repeated on many pages."""
+    lines = [re.sub(r"[ \t ]+", " ", line).strip() for line in text.splitlines()]
+    counts = {}
+    for line in lines:
+        if line:
+            counts[line] = counts.get(line, 0) + 1
+    kept = []
+    for line in lines:
+        if re.fullmatch(r"(page\s*)?\d+(\s*(of|/)\s*\d+)?", line, re.I):
+            continue
+        if line and counts[line] > 2 and len(line) < 80:
+            continue  # running header/footer
+        if line or (kept and kept[-1]):
+            kept.append(line)
+    return "\n".join(kept).strip()
+
+
+def _extract(item):
+    """(source, ext, bytes) -> document dict with cleaned text, or an error."""
+    source, ext, data = item
+    doc = {"source": source, "hash": bytes_digest(data), "text": "", "error": None}
+    try:
+        if ext in (".html", ".htm"):
+            text = html_to_text(data)
+        elif ext in (".txt", ".md"):
+            text = data.decode("utf-8", errors="ignore")
+        else:
+            text = cached_extract(
+                doc["hash"], engine_chain_key(ext, max_chars=KNOWLEDGE_MAX_CHARS), KNOWLEDGE_EXTRACTOR_VERSION,
+                lambda: extract_document(data, ext=ext, max_chars=KNOWLEDGE_MAX_CHARS)
+            )
+            if text.startswith(("[Error", "Error", "[Unsupported")):
+                raise ValueError(text)
+        doc["text"] = clean_text(text)[:KNOWLEDGE_MAX_CHARS]
+        if not doc["text"]:
+            doc["error"] = "no text found"
+    except Exception as e:
+        doc["error"] = str(e)
+    return doc
+
+
+def _chunk(doc, company_id):
+    """Attach the document's chunks; ids are content hashes, so shared chunks are stored once."""
+    doc["chunks"] = {}
+    for chunk in about_syscraft.split_company_text(doc["text"]):
+        key = embedding_space_id() + chunk
+        chunk_id = f"{company_id}_doc_{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}"
+        doc["chunks"].setdefault(chunk_id, chunk)
+    doc["chunk_ids"] = list(doc["chunks"])
+    doc["chars"] = len(doc["text"])
+    return doc
+
+
+# ---- Pipeline ----
+
+def _ingest_group(group, company_id, manifest, run, report):
+    """Extract, chunk and embed one group of changed sources into the run's pending publish."""
+    with ThreadPoolExecutor(max_workers=max(1, KNOWLEDGE_WORKERS)) as threads:
+        docs = [_chunk(doc, company_id) if not doc["error"] else doc for doc in threads.map(_extract, group)]
+    good = [doc for doc in docs if not doc["error"]]
+
+    pending = {}
+    for doc in good:
+        for chunk_id, chunk in doc["chunks"].items():
+            if chunk_id not in run["existing"] and chunk_id not in run["vectors"]:
+                pending.setdefault(chunk_id, (chunk, doc["source"]))
+        # Chunks of the previous version; dropped at publish unless still referenced then
+        run["stale"].update(manifest.get(doc["source"], {}).get("chunk_ids", []))
+
+    ids = list(pending)
+    embedder = about_syscraft.get_embedder()
+    for start in range(0, len(ids), KNOWLEDGE_EMBED_BATCH):
+        batch = ids[start:start + KNOWLEDGE_EMBED_BATCH]
+        embeddings = embedder.encode([pending[cid][0] for cid in batch], batch_size=KNOWLEDGE_EMBED_BATCH)
+        for cid, embedding in zip(batch, embeddings):
+            run["vectors"][cid] = {
+                "id": cid,
+                "values": embedding.tolist(),
+                "metadata": {"company_id": company_id, "text": pending[cid][0], "source": pending[cid][1]},
+            }
+
+    for doc in good:
+        manifest[doc["source"]] = {"hash": doc["hash"], "chunk_ids": doc["chunk_ids"]}
+        doc.pop("chunks")
+        doc.pop("text")
+        run["done"].append(doc)
+    for doc in docs:
+        report({"source": doc["source"], "status": "error" if doc["error"] else "indexed",
+                "error": doc["error"], "chunks": len(doc.get("chunk_ids", []))})
+    return len(pending)
+
+
+def _publish_run(run, company_id, manifest):
+    """Publish every group of the run as one index generation, then record the sources."""
+    referenced = {cid for row in manifest.values() for cid in row["chunk_ids"]}
+    stale = sorted(run["stale"] - referenced)
+    if run["vectors"] or stale:
+        about_syscraft.get_index().apply(upserts=list(run["vectors"].values()), delete_ids=stale,
+                                         batch_size=about_syscraft.UPSERT_BATCH_SIZE)
+        about_syscraft.bump_index_generation()
+    _record_sources(company_id, run["done"], [])
+
+
+def remove_sources(sources, company_id=DEFAULT_COMPANY_ID):
+    """Drop sources (e.g. closed job postings) and the chunks only they used."""
+    manifest = _manifest_rows(company_id)
+    sources = [s for s in sources if s in manifest]
+    if not sources:
+        return 0
+    keep = {cid for source, row in manifest.items() if source not in sources for cid in row["chunk_ids"]}
+    stale = sorted({cid for source in sources for cid in manifest[source]["chunk_ids"]} - keep)
+    if stale:
+        about_syscraft.get_index().apply(delete_ids=stale, batch_size=about_syscraft.UPSERT_BATCH_SIZE)
+        about_syscraft.bump_index_generation()
+    _record_sources(company_id, [], sources)
+    return len(sources)
+
+
+def ingest_knowledge(sources, company_id=DEFAULT_COMPANY_ID, progress=None):
+    """Index an iterable of (source, ext, bytes); unchanged sources are skipped via the manifest.
+
+    progress, if given, is called as progress(result, totals) per source.
+    """
+    started = time.perf_counter()
+    manifest = _manifest_rows(company_id)
+    totals = {"total": 0, "indexed": 0, "unchanged": 0, "errors": 0, "vectors": 0}
+
+    def report(result):
+        totals["total"] += 1
+        totals[{"indexed": "indexed", "unchanged": "unchanged"}.get(result["status"], "errors")] += 1
+        if progress:
+            progress(result, dict(totals))
+
+    index = about_syscraft.get_index()
+    run = {"existing": set(index.list_ids(prefix=f"{company_id}_doc_", filter={"company_id": company_id})),
+           "vectors": {}, "stale": set(), "done": []}
+    group = []
+    for source, ext, data in sources:
+        previous = manifest.get(source)
+        if previous and previous["hash"] == bytes_digest(data):
+            report({"source": source, "status": "unchanged", "error": None, "chunks": len(previous["chunk_ids"])})
+            continue
+        group.append((source, ext, data))
+        if len(group) >= KNOWLEDGE_GROUP_SIZE:
+            totals["vectors"] += _ingest_group(group, company_id, manifest, run, report)
+            group = []
+    if group:
+        totals["vectors"] += _ingest_group(group, company_id, manifest, run, report)
+    _publish_run(run, company_id, manifest)
+
+    totals["elapsed_s"] = round(time.perf_counter() - started, 2)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add documents and job openings to the company knowledge index.")
+    parser.add_argument("paths", nargs="*", help="files or directories (.pdf, .docx, .txt, .md, .html)")
+    parser.add_argument("--jobs", action="store_true", help="index the active job openings (closed ones are removed)")
+    parser.add_argument("--remove", nargs="+", metavar="SOURCE", help="remove sources (as listed in the manifest)")
+    parser.add_argument("--company-id", default=DEFAULT_COMPANY_ID)
+    args = parser.parse_args()
+
+    if args.remove:
+        removed = remove_sources([s if ":" in s else f"file:{os.path.abspath(s)}" for s in args.remove], args.company_id)
+        print(f"🗑️ Removed {removed} sources")
+
+    icons = {"indexed": "✅", "unchanged": "♻️", "error": "❌"}
+
+    def progress(result, totals):
+        detail = result["error"] or f"{result['chunks']} chunks"
+        print(f"{icons[result['status']]} [{totals['total']}] {result['source']}: {detail}")
+
+    def sources():
+        yield from iter_file_sources(args.paths)
+        if args.jobs:
+            yield from iter_job_sources()
+
+    if args.paths or args.jobs:
+        summary = ingest_knowledge(sources(), args.company_id, progress)
+        if args.jobs:
+            active = {f"job:{job['id']}" for job in get_active_job_openings()}
+            closed = [s for s in _manifest_rows(args.company_id) if s.startswith("job:") and s not in active]
+            if closed:
+                print(f"🗑️ Removed {remove_sources(closed, args.company_id)} closed job openings")
+        print(f"📊 {summary['indexed']} indexed, {summary['unchanged']} unchanged, {summary['errors']} errors "
+              f"out of {summary['total']} sources; {summary['vectors']} new vectors in {summary['elapsed_s']}s")
+
+
+init_knowledge_manifest()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import math
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+# BM25 over the company knowledge chunks, used next to the vector index:
+# short keyword questions ("Indore office address", "React services") match
+# best on exact terms, and a clear lexical winner lets search_company_info
+# answer without embedding the query at all.
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60  # the usual reciprocal rank fusion constant
+# A lexical hit skips the vector search when the query is short, every query
+# term occurs in the best chunk and it beats the runner-up by this factor
+LEXICAL_SHORTCUT_MAX_TERMS = int(os.getenv("LEXICAL_SHORTCUT_MAX_TERMS", "4"))
+LEXICAL_SHORTCUT_MARGIN = float(os.getenv("LEXICAL_SHORTCUT_MARGIN", "2.5"))
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "in", "is", "it", "me", "my", "of", "on", "or", "our", "the", "to", "we", "what",
+    "when", "where", "which", "who", "why", "with", "you", "your", "about", "have", "has",
+    "any", "there", "this", "that", "tell", "us", "get", "give", "please", "syscraft",
+}
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of records ({"id", "metadata": {"text", ...}})."""
+
+    def __init__(self, records):
+        self.records = records
+        docs = [Counter(tokenize(record["metadata"].get("text", ""))) for record in records]
+        self.doc_terms = docs
+        lengths = np.array([sum(doc.values()) for doc in docs], dtype=np.float32)
+        average = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+        self.length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average)
+
+        postings = {}
+        for row, doc in enumerate(docs):
+            for term, count in doc.items():
+                postings.setdefault(term, []).append((row, count))
+        n = len(docs)
+        self.postings = {
+            term: (math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5)),
+                   np.array([r for r, _ in rows]), np.array([c for _, c in rows], dtype=np.float32))
+            for term, rows in postings.items()
+        }
+
+    def search(self, query, limit=10):
+        """[(row, score)] best first; rows with no query term are left out."""
+        scores = np.zeros(len(self.records), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            idf, rows, counts = self.postings[term]
+            scores[rows] += idf * counts * (BM25_K1 + 1) / (counts + self.length_norm[rows])
+        hits = np.flatnonzero(scores)
+        best = hits[np.argsort(-scores[hits])][:limit]
+        return [(int(row), float(scores[row])) for row in best]
+
+    def is_confident(self, query, hits):
+        """True when the top hit is a clear, complete match for a short keyword query."""
+        terms = set(tokenize(query))
+        if not hits or not terms or len(terms) > LEXICAL_SHORTCUT_MAX_TERMS:
+            return False
+        if not terms <= set(self.doc_terms[hits[0][0]]):
+            return False
+        return len(hits) == 1 or hits[0][1] >= LEXICAL_SHORTCUT_MARGIN * hits[1][1]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse ranked id lists into [(id, score)] best first (score = sum of 1 / (k + rank))."""
+    scores = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
@@ -0,0 +1,221 @@
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tools.extraction_sandbox import run_sandboxed, TIMEOUT_SECONDS, SANDBOX_WORKERS
+
+# Page-parallel pdfplumber extraction. Page ranges run as separate tasks in
+# the supervised extraction workers (tools/extraction_sandbox.py), so every
+# document is bounded by a wall-clock deadline and the workers' rlimits.
+# Documents shorter than PDF_PARALLEL_MIN_PAGES are parsed as one task: for a
+# one or two page resume the extra round trips cost more than they save.
+PDF_EXTRACTION_MODE = os.getenv("PDF_EXTRACTION_MODE", "auto")  # auto | serial | parallel
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(SANDBOX_WORKERS)))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "50"))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "6"))
+
+
+# ---- Tasks executed inside the extraction workers ----
+# source is a file path or the document's bytes
+
+def open_source(source):
+    """Parsers take a path or a file object; raw bytes are wrapped in a buffer."""
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+
+def iter_pdf_page_count(source):
+    import pdfplumber
+    with pdfplumber.open(open_source(source)) as pdf:
+        yield len(pdf.pages)
+
+
+def within_budget(pages, max_chars=None):
+    """Pass (page_index, text) items through until max_chars of text have been produced.
+
+    Closing the page generator on the way out stops the parser, so pages past
+    the budget are never parsed.
+    """
+    used = 0
+    try:
+        for index, text in pages:
+            yield index, text
+            used += len(text)
+            if max_chars and used >= max_chars:
+                return
+    finally:
+        pages.close()
+
+
+def _pdfplumber_pages(pdf, start, end):
+    for index in range(start, min(end, len(pdf.pages))):
+        page = pdf.pages[index]
+        # Pages with no characters (blank or scanned images) skip layout analysis
+        yield index, (page.extract_text() or "") if page.chars else ""
+        # pdfplumber caches layout objects per page; drop them as we go
+        page.flush_cache()
+
+
+def iter_page_range(source, start, end, max_chars=None):
+    """Yield (page_index, text) for pages [start, end) of a PDF."""
+    import pdfplumber
+    with pdfplumber.open(open_source(source)) as pdf:
+        yield from within_budget(_pdfplumber_pages(pdf, start, end), max_chars)
+
+
+def _pypdf2_pages(reader, max_pages):
+    for index in range(min(len(reader.pages), max_pages)):
+        page = reader.pages[index]
+        if page.get("/Contents") is None:
+            yield index, ""  # Blank page: nothing to decode
+            continue
+        try:
+            yield index, page.extract_text() or ""
+        except Exception as page_error:
+            print(f"Error reading page {index + 1}: {page_error}")
+
+
+def iter_pypdf2_pages(source, max_pages, max_chars=None):
+    """Yield (page_index, text) using PyPDF2; first item is ("page_count", n)."""
+    import PyPDF2
+    reader = PyPDF2.PdfReader(open_source(source))
+    if reader.is_encrypted:
+        try:
+            reader.decrypt("")  # Try empty password
+        except Exception:
+            raise ValueError("PDF is password protected and cannot be read.")
+    yield "page_count", len(reader.pages)
+    yield from within_budget(_pypdf2_pages(reader, max_pages), max_chars)
+
+
+def _pymupdf_pages(doc, max_pages):
+    for index in range(min(doc.page_count, max_pages)):
+        page = doc[index]
+        # get_text("text") never rasterises images; pages without content streams are skipped
+        yield index, (page.get_text("text") or "") if page.get_contents() else ""
+
+
+def iter_pymupdf_pages(source, max_pages, max_chars=None):
+    """Yield (page_index, text) using PyMuPDF; first item is ("page_count", n)."""
+    try:
+        import pymupdf as fitz
+    except ImportError:
+        import fitz  # PyMuPDF < 1.24
+    if isinstance(source, (bytes, bytearray)):
+        doc = fitz.open(stream=source, filetype="pdf")
+    else:
+        doc = fitz.open(source)
+    with doc:
+        yield "page_count", doc.page_count
+        yield from within_budget(_pymupdf_pages(doc, max_pages), max_chars)
+
+
+# ---- Supervisor side ----
+
+def pdf_page_count(source, timeout=TIMEOUT_SECONDS, deadline=None):
+    result = run_sandboxed(iter_pdf_page_count, source, timeout=timeout, deadline=deadline)
+    if not result["items"]:
+        raise RuntimeError(result["error"] or "could not read PDF page count")
+    return result["items"][0]
+
+
+def _page_ranges(page_count, parts):
+    """Split [0, page_count) into at most `parts` contiguous ranges."""
+    parts = max(1, min(parts, page_count))
+    size, extra = divmod(page_count, parts)
+    ranges, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def _join_pages(results, page_count, max_chars=None):
+    """Reassemble sandbox results (in page order) into (text, page metadata).
+
+    The page texts are joined once here; with max_chars the result is cut to
+    the budget and pages["truncated"] is set.
+    """
+    page_texts = [text for result in results for _, text in result["items"]]
+    errors = [result["error"] for result in results if result["error"]]
+    text = "\n".join(t for t in page_texts if t)
+    pages = {
+        "page_count": page_count,
+        "pages_read": len(page_texts),
+        "pages_with_text": sum(1 for t in page_texts if t),
+        "complete": all(result["complete"] for result in results),
+    }
+    if errors:
+        pages["error"] = errors[0]
+    if max_chars and len(text) >= max_chars:
+        text = text[:max_chars]
+        pages["truncated"] = True
+    return text, pages
+
+
+def extract_pdf_pages(task, source, max_pages=PDF_MAX_PAGES, max_chars=None, timeout=TIMEOUT_SECONDS,
+                      deadline=None):
+    """Run a ("page_count", n)-first page task such as iter_pymupdf_pages; returns (text, pages)."""
+    result = run_sandboxed(task, source, max_pages, max_chars, timeout=timeout, deadline=deadline)
+    items = result["items"]
+    if not items:
+        raise RuntimeError(result["error"] or "extraction produced no output")
+    page_count = items[0][1]
+    result["items"] = items[1:]
+    return _join_pages([result], page_count, max_chars)
+
+
+def extract_pdf_text_serial(source, max_pages=PDF_MAX_PAGES, page_count=None, timeout=TIMEOUT_SECONDS,
+                            max_chars=None, deadline=None):
+    """Extract up to max_pages pages as a single sandboxed task; returns (text, page metadata).
+
+    With max_chars the worker stops parsing once that much text has been read.
+    """
+    deadline = deadline or time.monotonic() + timeout
+    if page_count is None:
+        page_count = pdf_page_count(source, deadline=deadline)
+    result = run_sandboxed(iter_page_range, source, 0, min(page_count, max_pages), max_chars, deadline=deadline)
+    return _join_pages([result], page_count, max_chars)
+
+
+def extract_pdf_text_parallel(source, max_pages=PDF_MAX_PAGES, workers=PDF_WORKERS,
+                              page_count=None, timeout=TIMEOUT_SECONDS, deadline=None):
+    """Extract up to max_pages pages split into ranges run concurrently, reassembled in page order."""
+    deadline = deadline or time.monotonic() + timeout
+    if page_count is None:
+        page_count = pdf_page_count(source, deadline=deadline)
+    limit = min(page_count, max_pages)
+    if limit == 0:
+        return _join_pages([], page_count)
+
+    # Two ranges per worker evens out pages that are much slower than others
+    ranges = _page_ranges(limit, workers * 2)
+    with ThreadPoolExecutor(max_workers=workers) as threads:
+        results = list(threads.map(
+            lambda r: run_sandboxed(iter_page_range, source, r[0], r[1], deadline=deadline),
+            ranges
+        ))
+    return _join_pages(results, page_count)
+
+
+def extract_pdf_text(source, mode=None, max_pages=PDF_MAX_PAGES, timeout=TIMEOUT_SECONDS, max_chars=None,
+                     deadline=None):
+    """Extract PDF text serially or page-parallel depending on mode and document size.
+
+    Returns (text, pages); pages["complete"] is False when a time or memory
+    limit cut extraction short and text holds what was extracted until then.
+    A max_chars budget always runs serially, since pages are read in order
+    and parsing stops as soon as the budget is met. The page count and the
+    extraction share one deadline (timeout from now unless one is given).
+    """
+    mode = mode or PDF_EXTRACTION_MODE
+    deadline = deadline or time.monotonic() + timeout
+    page_count = pdf_page_count(source, deadline=deadline)
+    if max_chars:
+        return extract_pdf_text_serial(source, max_pages, page_count, max_chars=max_chars, deadline=deadline)
+    if mode == "serial" or PDF_WORKERS <= 1:
+        return extract_pdf_text_serial(source, max_pages, page_count, deadline=deadline)
+    if mode == "parallel" or min(page_count, max_pages) >= PDF_PARALLEL_MIN_PAGES:
+        return extract_pdf_text_parallel(source, max_pages, PDF_WORKERS, page_count, deadline=deadline)
+    return extract_pdf_text_serial(source, max_pages, page_count, deadline=deadline)
@@ -0,0 +1,124 @@
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from datetime import datetime
+
+from tools.about_syscraft import get_lexical_index, search_company_info
+from tools.lexical_index import tokenize
+from tools.tool_compaction import format_company_info
+
+# A company question used to cost two model calls: one that decides to call
+# get_company_info and one that answers from its result. chat2 now starts
+# the company search as soon as a message looks company-related, while it
+# builds the rest of the request, and puts the top passages (and the current
+# date, so get_date_and_time is not needed either) into the first prompt.
+PRE_RETRIEVAL = os.getenv("PRE_RETRIEVAL", "1") != "0"
+PRE_RETRIEVAL_TOP_K = int(os.getenv("PRE_RETRIEVAL_TOP_K", "3"))
+PRE_RETRIEVAL_BUDGET = int(os.getenv("PRE_RETRIEVAL_BUDGET", "350"))
+# Past this the turn goes ahead without the passages (the model can still
+# call get_company_info); the search keeps running and warms the caches
+PRE_RETRIEVAL_TIMEOUT = float(os.getenv("PRE_RETRIEVAL_TIMEOUT", "2"))
+# Share of a message's terms that must occur in the company chunks for a
+# message with no other cue ("Django FastAPI React") to count as a company question
+PRE_RETRIEVAL_MIN_COVERAGE = float(os.getenv("PRE_RETRIEVAL_MIN_COVERAGE", "0.5"))
+
+# Job and resume turns are served by their own tools
+HR_PATTERN = re.compile(
+    r"\b(jobs?|openings?|vacanc\w*|apply|applying|application|resume|cv|internships?|positions?|roles?|"
+    r"salary|interview\w*|hiring|fresher)\b",
+    re.IGNORECASE
+)
+# A question put to the assistant ("do you build mobile apps") is about the
+# company when it also names something the company chunks talk about;
+# "you" alone is small talk ("how are you", "can you help me")
+ADDRESSED_PATTERN = re.compile(r"\b(you|your|yours)\b", re.IGNORECASE)
+SMALL_TALK_PATTERN = re.compile(r"\b(thank(s| you)|see you|bye)\b", re.IGNORECASE)
+
+COMPANY_PATTERN = re.compile(
+    r"\b(syscraft|compan(y|ies)|about (you|us)|who are you|your (team|firm|services?|work|clients?|office|"
+    r"experience|portfolio|process|pricing|rates?|stack|developers?|engineers?)|services?|offer(ings?)?|provide|clients?|"
+    r"industr(y|ies)|portfolio|case stud(y|ies)|office|address|located|location|headquarter|branch|"
+    r"founded|founder|ceo|established|history|mission|vision|values|certif\w*|iso|awards?|partners?|"
+    r"technolog(y|ies)|tech stack|pricing|cost|budget|quote|engagement|hire (\w+ )?(team|developers?)|"
+    r"outsourc\w*|maintenance|support|contact( details)?|website|working hours|team size|employees)\b",
+    re.IGNORECASE
+)
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pre-retrieval")
+_stats_lock = threading.Lock()
+_stats = {"turns": 0, "single_pass_turns": 0, "pre_retrieved_turns": 0,
+          "pre_retrieved_single_pass": 0, "timeouts": 0}
+
+
+def _corpus_terms(message, company_id="default_company"):
+    """(terms of the message found in the company chunks, all its terms)."""
+    terms = set(tokenize(message))
+    if not terms:
+        return 0, 0
+    try:
+        postings = get_lexical_index(company_id).postings
+    except Exception:
+        return 0, len(terms)
+    return sum(term in postings for term in terms), len(terms)
+
+
+def looks_company_related(message):
+    if not message or HR_PATTERN.search(message):
+        return False
+    message = SMALL_TALK_PATTERN.sub(" ", message)
+    if COMPANY_PATTERN.search(message):
+        return True
+    found, total = _corpus_terms(message)
+    if ADDRESSED_PATTERN.search(message) and found:
+        return True
+    return total > 0 and found / total >= PRE_RETRIEVAL_MIN_COVERAGE
+
+
+def start_pre_retrieval(message):
+    """Future of the company search for this message, or None when it does not need one."""
+    if not PRE_RETRIEVAL or not looks_company_related(message):
+        return None
+    return _executor.submit(search_company_info, message, top_k=PRE_RETRIEVAL_TOP_K)
+
+
+def turn_context(future):
+    """The context block for this turn's prompts: the current date, plus company passages when found."""
+    lines = [f"Current date and time: {datetime.now().isoformat(timespec='minutes')}"]
+    passages = None
+    if future is not None:
+        try:
+            result = future.result(timeout=PRE_RETRIEVAL_TIMEOUT)
+        except TimeoutError:
+            with _stats_lock:
+                _stats["timeouts"] += 1
+            print("⚠️ Company pre-retrieval timed out; answering without it")
+            result = None
+        if result and result.get("matches"):
+            passages = format_company_info(result, PRE_RETRIEVAL_BUDGET)
+    if passages:
+        lines += [
+            "Company knowledge retrieved for the user's latest message. Answer from it directly; "
+            "call get_company_info only if it does not cover the question.",
+            passages,
+        ]
+    return "\n".join(lines), passages is not None
+
+
+def record_turn(pre_retrieved, llm_calls):
+    """Count one chat turn and whether it was answered in a single model call."""
+    single_pass = llm_calls == 1
+    with _stats_lock:
+        _stats["turns"] += 1
+        _stats["single_pass_turns"] += single_pass
+        _stats["pre_retrieved_turns"] += pre_retrieved
+        _stats["pre_retrieved_single_pass"] += pre_retrieved and single_pass
+
+
+def pre_retrieval_stats():
+    with _stats_lock:
+        stats = json.loads(json.dumps(_stats))
+    stats["enabled"] = PRE_RETRIEVAL
+    stats["single_pass_rate"] = round(stats["single_pass_turns"] / stats["turns"], 3) if stats["turns"] else 0.0
+    return stats
@@ -0,0 +1,234 @@
+import hashlib
+import os
+import re
+
+from tools.hr_jobs import analyze_resume_text
+from tools.session_payloads import save_session_payload, get_session_payload
+
+# Resume turns send the model a compact structured profile instead of the
+# raw extracted text (contact blocks, repeated page headers, boilerplate).
+# The raw text is kept with the chat session under the profile's resume id
+# so a tool can fetch it when the model really needs it.
+RESUME_CONDENSE = os.getenv("RESUME_CONDENSE", "1") != "0"
+RAW_RESUME_KIND = "resume-raw"
+
+MAX_ROLES = 4
+MAX_EDUCATION = 2
+MAX_PROJECTS = 3
+MAX_SKILLS = 20
+MAX_SUMMARY_CHARS = 160
+MAX_ITEM_CHARS = 80
+
+# Heading text -> profile section
+SECTION_HEADINGS = {
+    "summary": "summary", "objective": "summary", "profile": "summary", "about me": "summary",
+    "career objective": "summary", "professional summary": "summary",
+    "education": "education", "qualification": "education", "academic": "education",
+    "experience": "experience", "employment": "experience", "work history": "experience",
+    "professional experience": "experience", "work experience": "experience", "internship": "experience",
+    "skills": "skills", "technical skills": "skills", "competencies": "skills", "technologies": "skills",
+    "projects": "projects", "key projects": "projects", "portfolio": "projects",
+    "certifications": "certifications", "certificates": "certifications",
+    "achievements": "achievements", "awards": "achievements", "publications": "achievements",
+    "declaration": "boilerplate", "references": "boilerplate", "personal details": "boilerplate",
+    "hobbies": "boilerplate", "interests": "boilerplate", "languages known": "boilerplate",
+    "strengths": "boilerplate",
+}
+# Title lines carry nothing; dropped wherever they appear
+TITLE_LINES = {"resume", "curriculum vitae", "cv", "biodata", "bio-data"}
+
+ROLE_PATTERN = re.compile(
+    r"\b(engineer|developer|programmer|architect|manager|lead|designer|analyst|consultant|"
+    r"intern|trainee|administrator|tester|scientist|specialist|executive|officer|head|director)\b",
+    re.IGNORECASE
+)
+DEGREE_PATTERN = re.compile(
+    r"\b(b\.?\s?tech|m\.?\s?tech|b\.?\s?e\b|m\.?\s?e\b|bca|mca|b\.?\s?sc|m\.?\s?sc|bba|mba|ph\.?\s?d|"
+    r"bachelor|master|diploma|degree|12th|hsc)",
+    re.IGNORECASE
+)
+DATE_RANGE_PATTERN = re.compile(
+    r"((?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s*)?(19|20)\d{2}\s*(?:-|–|to)\s*"
+    r"(((?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s*)?(19|20)\d{2}|present|current|now)",
+    re.IGNORECASE
+)
+CONTACT_PATTERN = re.compile(r"@|\+?\d[\d\s-]{8,}\d|linkedin|github\.com|https?://", re.IGNORECASE)
+
+
+def resume_id_for(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _heading(line):
+    key = line.lower().strip(" :-|•").strip()
+    if len(key) > 40:
+        return None
+    return SECTION_HEADINGS.get(key)
+
+
+def _split_sections(lines):
+    """Group lines under the heading they follow; lines before any heading are the header block."""
+    sections = {"header": []}
+    current = "header"
+    for line in lines:
+        section = _heading(line)
+        if section:
+            current = section
+            sections.setdefault(current, [])
+            continue
+        sections.setdefault(current, []).append(line)
+    return sections
+
+
+def _clean_lines(text):
+    """Non-empty lines with repeated page headers/footers and page numbers dropped."""
+    lines = [re.sub(r"\s+", " ", line).strip(" •▪●-*\t") for line in text.splitlines()]
+    lines = [line for line in lines
+             if line and line.lower() not in TITLE_LINES
+             and not re.fullmatch(r"(page\s*)?\d+(\s*(of|/)\s*\d+)?", line, re.I)]
+    counts = {}
+    for line in lines:
+        counts[line] = counts.get(line, 0) + 1
+    # A short line repeated on every page (name banner, "<Name> - Resume") is page
+    # furniture; it is only kept where it opens the document
+    return [line for i, line in enumerate(lines)
+            if counts[line] == 1 or len(line) > 80 or (i < 5 and lines.index(line) == i)]
+
+
+def _clip(text, limit=MAX_ITEM_CHARS):
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def _unique(items, limit):
+    seen, out = set(), []
+    for item in items:
+        key = item.lower()
+        if key not in seen:
+            seen.add(key)
+            out.append(_clip(item))
+        if len(out) >= limit:
+            break
+    return out
+
+
+def _skills(text, analysis):
+    # analyze_resume_text matches substrings ("go" in "good"); keep whole-word hits only
+    return [s for s in analysis.get("skills", [])
+            if re.search(r"(?<![\w.+#])" + re.escape(s.lower()) + r"(?![\w+#])", text.lower())]
+
+
+def _roles(sections):
+    lines = sections.get("experience") or sections.get("header", [])
+    roles = [line for line in lines if ROLE_PATTERN.search(line) and len(line) <= 100]
+    return _unique(roles, MAX_ROLES)
+
+
+def _education(sections, lines):
+    candidates = sections.get("education") or lines
+    return _unique([line for line in candidates if DEGREE_PATTERN.search(line)], MAX_EDUCATION)
+
+
+def _projects(sections):
+    lines = sections.get("projects", [])
+    # Project titles are the short lines; descriptions under them are dropped
+    titles = [line for line in lines if len(line) <= 80 and not line.endswith(".")]
+    return _unique(titles or lines, MAX_PROJECTS)
+
+
+def _summary(sections):
+    """Leading sentences of the summary section, up to MAX_SUMMARY_CHARS."""
+    text = " ".join(sections.get("summary", []))
+    summary = ""
+    for sentence in re.split(r"(?<=[.!?])\s+", text):
+        if summary and len(summary) + len(sentence) + 1 > MAX_SUMMARY_CHARS:
+            break
+        summary = f"{summary} {sentence}".strip()
+    return _clip(summary, MAX_SUMMARY_CHARS)
+
+
+def _name(sections):
+    for line in sections.get("header", [])[:5]:
+        if not CONTACT_PATTERN.search(line) and 1 < len(line.split()) <= 4 and not any(ch.isdigit() for ch in line):
+            return line
+    return ""
+
+
+def _years_from_dates(text):
+    """Rough total experience from date ranges when no "N years" phrase is present."""
+    from datetime import datetime
+    total = 0
+    for match in DATE_RANGE_PATTERN.finditer(text):
+        start = int(re.search(r"(19|20)\d{2}", match.group(0)).group(0))
+        end_years = re.findall(r"(?:19|20)\d{2}", match.group(3) or "")
+        end = int(end_years[0]) if end_years else datetime.now().year
+        if start <= end:
+            total += end - start
+    return total or None
+
+
+def condense_resume(text):
+    """Turn extracted resume text into a compact profile dict."""
+    analysis = analyze_resume_text(text)
+    if "error" in analysis:
+        return {"error": analysis["error"]}
+
+    lines = _clean_lines(text)
+    sections = _split_sections(lines)
+    experience_text = "\n".join(sections.get("experience", []))
+    return {
+        "resume_id": resume_id_for(text),
+        "name": _name(sections),
+        "contact": analysis.get("contact_info", {}),
+        "experience_years": analysis.get("experience_years") or _years_from_dates(experience_text),
+        "roles": _roles(sections),
+        "skills": sorted(_skills(text, analysis))[:MAX_SKILLS],
+        "education": _education(sections, lines),
+        "projects": _projects(sections),
+        "certifications": _unique(sections.get("certifications", []), MAX_EDUCATION),
+        "summary": _summary(sections),
+        "raw_chars": len(text),
+    }
+
+
+def format_profile(profile):
+    """Render a profile as the compact block placed in the prompt."""
+    if "error" in profile:
+        return f"Resume could not be read: {profile['error']}"
+
+    contact = " | ".join(v for v in (profile["contact"].get("email"), profile["contact"].get("phone")) if v)
+    years = profile["experience_years"]
+    rows = [
+        ("Name", profile["name"]),
+        ("Contact", contact),
+        ("Experience", f"{years} years" if years is not None else ""),
+        ("Roles", "; ".join(profile["roles"])),
+        ("Skills", ", ".join(profile["skills"])),
+        ("Education", "; ".join(profile["education"])),
+        ("Projects", "; ".join(profile["projects"])),
+        ("Certifications", "; ".join(profile["certifications"])),
+        ("Summary", profile["summary"]),
+    ]
+    body = "\n".join(f"{label}: {value}" for label, value in rows if value)
+    return (
+        f"Resume ID: {profile['resume_id']}\n{body}\n"
+        f"(Condensed profile; full text via get_resume_text)"
+    )
+
+
+def remember_raw_resume(text, session_id):
+    """Keep the raw text retrievable by resume id within the session; returns the id."""
+    resume_id = resume_id_for(text)
+    save_session_payload(session_id, RAW_RESUME_KIND, resume_id, text)
+    return resume_id
+
+
+def get_raw_resume(resume_id, session_id):
+    return get_session_payload(session_id, RAW_RESUME_KIND, resume_id.strip())
+
+
+def condensed_resume_block(text, session_id):
+    """Profile block for the prompt; the raw text stays retrievable by its resume id for the session."""
+    profile = condense_resume(text)
+    if "error" not in profile:
+        remember_raw_resume(text, session_id)
+    return format_profile(profile)
@@ -0,0 +1,73 @@
+import sqlite3
+import os
+from datetime import datetime, timedelta
+
+from tools.hr_jobs import DB_PATH
+
+# Full payloads a chat session points at by ref: compacted tool outputs
+# (get_tool_output) and raw resume text behind a condensed profile
+# (get_resume_text). Unlike the extraction cache these are never evicted
+# by size: a ref stays valid for as long as the conversation can mention
+# it, and only sessions idle for SESSION_PAYLOAD_TTL_DAYS are dropped.
+SESSION_PAYLOAD_TTL_DAYS = int(os.getenv("SESSION_PAYLOAD_TTL_DAYS", "30"))
+
+
+def init_session_payload_db():
+    """Create the session payload table and drop expired sessions."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS session_payloads (
+            session_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            ref TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (session_id, kind, ref)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_session_payloads_created ON session_payloads (created_at)")
+    conn.commit()
+    conn.close()
+    expire_session_payloads()
+
+
+def save_session_payload(session_id, kind, ref, content):
+    """Keep content retrievable as (session_id, kind, ref)."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT OR REPLACE INTO session_payloads (session_id, kind, ref, content)
+        VALUES (?, ?, ?, ?)
+    ''', (str(session_id), kind, ref, content))
+    conn.commit()
+    conn.close()
+
+
+def get_session_payload(session_id, kind, ref):
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT content FROM session_payloads WHERE session_id = ? AND kind = ? AND ref = ?",
+                   (str(session_id), kind, ref))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def expire_session_payloads(ttl_days=SESSION_PAYLOAD_TTL_DAYS):
+    """Delete the payloads of sessions with nothing stored in the last ttl_days; returns rows removed."""
+    cutoff = (datetime.utcnow() - timedelta(days=ttl_days)).strftime("%Y-%m-%d %H:%M:%S")
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        DELETE FROM session_payloads WHERE session_id IN (
+            SELECT session_id FROM session_payloads GROUP BY session_id HAVING MAX(created_at) < ?
+        )
+    ''', (cutoff,))
+    removed = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return removed
+
+
+init_session_payload_db()
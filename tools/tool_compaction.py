@@ -0,0 +1,393 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+from tools.session_payloads import save_session_payload, get_session_payload
+
+# Tool results stay in the conversation for the rest of the session and are
+# re-sent on every later model call, so chat2 rewrites them into compact,
+# deduplicated text under a per-tool token budget before they enter the
+# state. The full payload is kept with the session (tools/session_payloads.py)
+# under a short ref that the model can pass to get_tool_output when the
+# compact text is not enough.
+TOOL_COMPACTION = os.getenv("TOOL_COMPACTION", "1") != "0"
+TOOL_OUTPUT_KIND = "tool-output"
+
+DEFAULT_TOOL_BUDGET = int(os.getenv("TOOL_BUDGET_DEFAULT", "400"))
+# Token budgets per tool; TOOL_BUDGET_<TOOL NAME> overrides one
+TOOL_BUDGETS = {
+    "get_company_info": 350,
+    "get_job_openings": 450,
+    "analyze_resume_for_roles": 250,
+}
+# Outputs the model asked for in full, or too small to be worth rewriting
+UNCOMPACTED_TOOLS = {"get_resume_text", "get_tool_output", "get_date_and_time"}
+
+MAX_DESCRIPTION_CHARS = 140
+MAX_REQUIREMENTS_CHARS = 120
+# Company chunks are split with a 50 character overlap
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 120
+
+# Once the assistant has answered from a tool output, the output is replaced
+# by a one-line digest (TOOL_DIGESTS=0 keeps them); outputs already this
+# small are left alone
+TOOL_DIGESTS = os.getenv("TOOL_DIGESTS", "1") != "0"
+DIGEST_CHARS = 200
+DIGEST_MIN_TOKENS = 60
+# Long string arguments of answered tool calls (resume text passed to a
+# tool) are clipped to this many characters
+MAX_TOOL_ARG_CHARS = 200
+
+_stats_lock = threading.Lock()
+_stats = {"tool_outputs": 0, "raw_tokens": 0, "compact_tokens": 0, "digested_outputs": 0,
+          "clipped_tool_calls": 0, "llm_calls": 0, "prompt_tokens_saved": 0, "by_tool": {}}
+
+
+def _token_counter():
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return (lambda text: len(encoding.encode(text))), "tiktoken cl100k_base"
+    except ImportError:
+        return (lambda text: max(1, len(text) // 4)), "chars/4 estimate"
+
+
+count_tokens, TOKEN_COUNTER = _token_counter()
+
+
+def tool_budget(name):
+    return int(os.getenv(f"TOOL_BUDGET_{name.upper()}", TOOL_BUDGETS.get(name, DEFAULT_TOOL_BUDGET)))
+
+
+def _clip(text, limit):
+    text = re.sub(r"\s+", " ", str(text or "")).strip()
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def _first_sentence(text, limit):
+    text = re.sub(r"\s+", " ", str(text or "")).strip()
+    return _clip(re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0], limit)
+
+
+def _fit(header, lines, budget, short_lines=None):
+    """Header plus as many lines as fit in the budget, then a count of the rest.
+
+    When short_lines is given and the full lines do not all fit, the short
+    form of every line is tried before anything is dropped.
+    """
+    if short_lines is not None and count_tokens("\n".join([header] + lines)) > budget:
+        lines = short_lines
+    kept, used = [], count_tokens(header)
+    for line in lines:
+        cost = count_tokens(line) + 1
+        if kept and used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    if len(kept) < len(lines):
+        kept.append(f"…and {len(lines) - len(kept)} more")
+    return "\n".join([header] + kept)
+
+
+# ---- Per-tool formatters ----
+
+def _strip_overlap(text, earlier):
+    """Drop a leading run of text that repeats the end of an earlier passage (splitter overlap)."""
+    for size in range(min(len(text), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if any(passage.endswith(text[:size]) for passage in earlier):
+            return text[size:].lstrip(" ,.;:")
+    return text
+
+
+def format_company_info(payload, budget):
+    if isinstance(payload, dict) and payload.get("error"):
+        return f"Company search failed: {payload['error']}"
+    matches = payload.get("matches", []) if isinstance(payload, dict) else []
+    # Neighbouring chunks overlap and hybrid search can return near-copies;
+    # keep each sentence once, in rank order
+    seen, texts, passages = set(), [], []
+    for match in matches:
+        text = re.sub(r"\s+", " ", (match.get("metadata") or {}).get("text", "")).strip()
+        overlapped = _strip_overlap(text, texts)
+        texts.append(text)
+        text = overlapped
+        sentences = []
+        for sentence in re.split(r"(?<=[.!?])\s+", text):
+            key = re.sub(r"\W+", " ", sentence.lower()).strip()
+            if key and key not in seen:
+                seen.add(key)
+                sentences.append(sentence.strip())
+        if sentences:
+            passages.append("- " + " ".join(sentences))
+    if not passages:
+        return "No company information found for this query."
+    return _fit(f"Company info ({len(passages)} passages, best first):", passages, budget)
+
+
+def _compact_job_openings(payload, budget):
+    if isinstance(payload, dict):
+        return f"Could not load job openings: {payload.get('error')}"
+    if not payload:
+        return "There are no active job openings."
+    # Reposted openings with identical details share one line
+    groups = {}
+    for job in payload:
+        key = tuple(str(job.get(field) or "").strip().lower()
+                    for field in ("title", "department", "location", "employment_type", "requirements", "description"))
+        groups.setdefault(key, []).append(job)
+    lines, short_lines = [], []
+    for jobs in groups.values():
+        job = jobs[0]
+        ids = ", ".join(f"#{j.get('id')}" for j in jobs)
+        details = ", ".join(v for v in (job.get("department"), job.get("location"), job.get("employment_type")) if v)
+        short = f"- {ids} {job.get('title')}" + (f" ({details})" if details else "")
+        line = short
+        if job.get("requirements"):
+            line += f"; needs: {_clip(job['requirements'], MAX_REQUIREMENTS_CHARS)}"
+        if job.get("description"):
+            line += f"; about: {_first_sentence(job['description'], MAX_DESCRIPTION_CHARS)}"
+        lines.append(line)
+        short_lines.append(short)
+    return _fit(f"{len(payload)} open positions:", lines, budget, short_lines)
+
+
+def _compact_resume_roles(payload, budget):
+    if not payload.get("success"):
+        return f"Resume analysis failed: {payload.get('error')}"
+    lines = []
+    for match in payload.get("matching_roles", []):
+        line = f"- {match.get('title')} (#{match.get('id')}): {match.get('match_percentage')}% match"
+        if match.get("matched_skills"):
+            line += f"; skills: {', '.join(match['matched_skills'])}"
+        lines.append(line)
+    header = f"Top roles out of {payload.get('total_jobs')} open positions (already ranked):"
+    return _fit(header, lines, budget)
+
+
+def _drop_empty(value):
+    if isinstance(value, dict):
+        return {k: _drop_empty(v) for k, v in value.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [_drop_empty(v) for v in value]
+    return value
+
+
+def _compact_generic(payload, budget):
+    text = payload if isinstance(payload, str) else json.dumps(
+        _drop_empty(payload), ensure_ascii=False, separators=(",", ":"))
+    if count_tokens(text) <= budget:
+        return text
+    return _clip(text, budget * 4)
+
+
+FORMATTERS = {
+    "get_company_info": format_company_info,
+    "get_job_openings": _compact_job_openings,
+    "analyze_resume_for_roles": _compact_resume_roles,
+}
+
+
+# ---- Digests of consumed outputs ----
+
+def _digest_company_info(payload):
+    if isinstance(payload, dict) and payload.get("error"):
+        return "company search failed"
+    matches = payload.get("matches", []) if isinstance(payload, dict) else []
+    return f"{len(matches)} company passages"
+
+
+def _digest_job_openings(payload):
+    if isinstance(payload, dict):
+        return "job openings could not be loaded"
+    titles = list(dict.fromkeys(job.get("title") for job in payload))
+    return f"{len(payload)} open positions: " + ", ".join(map(str, titles))
+
+
+def _digest_resume_roles(payload):
+    if not payload.get("success"):
+        return "resume analysis failed"
+    return "top roles: " + ", ".join(f"{m.get('title')} ({m.get('match_percentage')}%)"
+                                     for m in payload.get("matching_roles", []))
+
+
+DIGESTERS = {
+    "get_company_info": _digest_company_info,
+    "get_job_openings": _digest_job_openings,
+    "analyze_resume_for_roles": _digest_resume_roles,
+}
+
+
+def digest_tool_output(name, content, ref):
+    """One line standing in for a tool output the assistant has already answered from."""
+    try:
+        payload = json.loads(content)
+    except (TypeError, ValueError):
+        payload = content
+    digester = DIGESTERS.get(name)
+    try:
+        summary = digester(payload) if digester else _clip(
+            payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False), DIGEST_CHARS)
+    except (AttributeError, KeyError, TypeError):
+        summary = _clip(content, DIGEST_CHARS)
+    return f"[Already used] {name}: {_clip(summary, DIGEST_CHARS)} (full output via get_tool_output ref={ref})"
+
+
+# ---- Full payloads ----
+
+def remember_tool_output(content, session_id):
+    """Keep a full tool output retrievable for the session; returns its ref."""
+    ref = hashlib.sha256(content.encode("utf-8")).hexdigest()[:12]
+    save_session_payload(session_id, TOOL_OUTPUT_KIND, ref, content)
+    return ref
+
+
+def get_tool_output(ref, session_id):
+    return get_session_payload(session_id, TOOL_OUTPUT_KIND, ref.strip())
+
+
+def compact_tool_output(name, content, session_id):
+    """(text for the prompt, compaction info or None when the output is kept as is).
+
+    content is the ToolMessage content: the tool's return value, which
+    ToolNode has already serialised to JSON when it was not a string. The
+    full content is stored for session_id (the chat's thread id).
+    """
+    if not TOOL_COMPACTION or name in UNCOMPACTED_TOOLS or not isinstance(content, str):
+        return content, None
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        payload = content
+    formatter = FORMATTERS.get(name, _compact_generic)
+    try:
+        compact = formatter(payload, tool_budget(name))
+    except (AttributeError, KeyError, TypeError) as e:
+        print(f"⚠️ Could not compact {name} output: {e}")
+        return content, None
+
+    raw_tokens, compact_tokens = count_tokens(content), count_tokens(compact)
+    if compact_tokens >= raw_tokens:
+        return content, None
+    ref = remember_tool_output(content, session_id)
+    compact += f"\n(Compacted; full output via get_tool_output ref={ref})"
+    info = {"ref": ref, "raw_tokens": raw_tokens, "compact_tokens": count_tokens(compact),
+            "digest": digest_tool_output(name, content, ref)}
+    _record_compaction(name, info)
+    return compact, info
+
+
+# ---- Savings ----
+
+def _record_compaction(name, info):
+    with _stats_lock:
+        _stats["tool_outputs"] += 1
+        _stats["raw_tokens"] += info["raw_tokens"]
+        _stats["compact_tokens"] += info["compact_tokens"]
+        tool = _stats["by_tool"].setdefault(name, {"calls": 0, "raw_tokens": 0, "compact_tokens": 0})
+        tool["calls"] += 1
+        tool["raw_tokens"] += info["raw_tokens"]
+        tool["compact_tokens"] += info["compact_tokens"]
+
+
+def prompt_tokens_saved(messages):
+    """Tokens the compacted and digested tool messages in a prompt save over their raw outputs."""
+    saved = 0
+    for message in messages:
+        info = (getattr(message, "response_metadata", None) or {}).get("compaction")
+        if info:
+            saved += info["raw_tokens"] - info.get("digest_tokens", info["compact_tokens"])
+    return saved
+
+
+def record_prompt(messages):
+    """Count one model call and the tokens compaction kept out of its prompt."""
+    saved = prompt_tokens_saved(messages)
+    with _stats_lock:
+        _stats["llm_calls"] += 1
+        _stats["prompt_tokens_saved"] += saved
+    return saved
+
+
+# ---- Pruning answered turns ----
+
+def _clip_args(args):
+    # The marker fits inside the limit, so clipped arguments are not clipped again
+    return {key: (f"{value[:MAX_TOOL_ARG_CHARS - 20]}…({len(value)} chars)"
+                  if isinstance(value, str) and len(value) > MAX_TOOL_ARG_CHARS else value)
+            for key, value in args.items()}
+
+
+def _digest_tool_message(message, session_id):
+    """Copy of a consumed ToolMessage with its content replaced by a digest, or None to keep it."""
+    metadata = message.response_metadata or {}
+    info = metadata.get("compaction")
+    if info and info.get("digest_tokens") is not None:
+        return None  # already digested
+    if info:
+        digest = info["digest"]
+    else:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+        if count_tokens(content) <= DIGEST_MIN_TOKENS:
+            return None
+        ref = remember_tool_output(content, session_id)
+        digest = digest_tool_output(message.name, content, ref)
+        info = {"ref": ref, "raw_tokens": count_tokens(content), "compact_tokens": count_tokens(content)}
+    info = {key: value for key, value in info.items() if key != "digest"}
+    info["digest_tokens"] = count_tokens(digest)
+    return message.model_copy(update={"content": digest, "response_metadata": {**metadata, "compaction": info}})
+
+
+def _clip_tool_call_message(message):
+    """Copy of an answered AIMessage with long tool-call arguments clipped, or None to keep it."""
+    if not any(isinstance(v, str) and len(v) > MAX_TOOL_ARG_CHARS
+               for call in message.tool_calls for v in call["args"].values()):
+        return None
+    tool_calls = [{**call, "args": _clip_args(call["args"])} for call in message.tool_calls]
+    additional_kwargs = dict(message.additional_kwargs)
+    function_call = additional_kwargs.get("function_call")
+    if function_call:
+        # Older Gemini integrations replay this instead of tool_calls
+        clipped = next((c for c in tool_calls if c["name"] == function_call.get("name")), None)
+        if clipped:
+            additional_kwargs["function_call"] = {**function_call, "arguments": json.dumps(clipped["args"])}
+    return message.model_copy(update={"tool_calls": tool_calls, "additional_kwargs": additional_kwargs})
+
+
+def prune_answered_tool_messages(messages, session_id):
+    """Replacements for the tool results and tool calls the final reply has answered.
+
+    Meant to run once the last message is the assistant's reply (no tool
+    calls). Every earlier ToolMessage becomes a one-line digest and long
+    arguments of earlier tool calls are clipped; the messages keep their
+    ids, tool_call_ids and names, so add_messages replaces them in place
+    and each function call still has its function response. Outputs
+    digested without having been compacted are stored for session_id.
+    """
+    if not TOOL_DIGESTS or not messages:
+        return []
+    replacements = []
+    for message in messages[:-1]:
+        if message.type == "tool":
+            replacement = _digest_tool_message(message, session_id)
+        elif message.type == "ai" and message.tool_calls:
+            replacement = _clip_tool_call_message(message)
+        else:
+            replacement = None
+        if replacement is not None:
+            replacements.append(replacement)
+    with _stats_lock:
+        _stats["digested_outputs"] += sum(1 for m in replacements if m.type == "tool")
+        _stats["clipped_tool_calls"] += sum(1 for m in replacements if m.type == "ai")
+    return replacements
+
+
+def compaction_stats():
+    with _stats_lock:
+        stats = json.loads(json.dumps(_stats))
+    stats["enabled"] = TOOL_COMPACTION
+    stats["digests_enabled"] = TOOL_DIGESTS
+    stats["avg_saved_per_llm_call"] = round(stats["prompt_tokens_saved"] / stats["llm_calls"], 1) if stats["llm_calls"] else 0.0
+    return stats
@@ -0,0 +1,308 @@
+import sqlite3
+import hashlib
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+
+from tools.hr_jobs import DB_PATH
+
+# Uploaded files are stored once under their SHA-256 digest:
+#   uploads/blobs/<first two hex chars>/<digest><ext>
+UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+BLOB_FOLDER = os.path.join(UPLOAD_FOLDER, "blobs")
+TMP_FOLDER = os.path.join(UPLOAD_FOLDER, "tmp")
+
+CHUNK_SIZE = 64 * 1024
+# Uploads up to this size are read into memory and parsed from the buffer;
+# they only reach the disk if the document has to be kept.
+IN_MEMORY_UPLOAD_MAX_BYTES = int(os.getenv("IN_MEMORY_UPLOAD_MAX_KB", "2048")) * 1024
+SESSION_REF_TTL_DAYS = int(os.getenv("UPLOAD_SESSION_TTL_DAYS", "30"))
+# Unreferenced files younger than this are kept, so a file stored a moment ago
+# is not collected before its first reference is added.
+GC_GRACE_MINUTES = 60
+
+DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def init_upload_db():
+    """Create the upload index and reference tables."""
+    os.makedirs(BLOB_FOLDER, exist_ok=True)
+    os.makedirs(TMP_FOLDER, exist_ok=True)
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS uploads (
+            digest TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            ext TEXT,
+            size INTEGER,
+            original_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS upload_refs (
+            digest TEXT NOT NULL,
+            ref_type TEXT NOT NULL,
+            ref_id TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (digest, ref_type, ref_id)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_upload_refs_owner ON upload_refs (ref_type, ref_id)")
+
+    conn.commit()
+    conn.close()
+
+
+def _blob_path(digest, ext):
+    return os.path.join("blobs", digest[:2], f"{digest}{ext}")
+
+
+def store_upload(file_storage):
+    """Stream an uploaded file to disk while hashing it and store it once by digest.
+
+    Returns a dict with digest, path (relative to uploads/), size, ext,
+    original_name and whether the content was already stored.
+    """
+    original_name = file_storage.filename or ""
+    ext = os.path.splitext(original_name)[1].lower()
+    hasher = hashlib.sha256()
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=TMP_FOLDER)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = file_storage.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+
+        digest = hasher.hexdigest()
+        rel_path = _blob_path(digest, ext)
+        full_path = os.path.join(UPLOAD_FOLDER, rel_path)
+
+        # Claimed before the file is placed, so GC cannot remove it in between
+        _claim_upload(digest, rel_path, ext, size, original_name)
+        deduplicated = os.path.exists(full_path)
+        if deduplicated:
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            os.replace(tmp_path, full_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return _upload_info(digest, rel_path, ext, size, original_name, deduplicated)
+
+
+def _claim_upload(digest, rel_path, ext, size, original_name):
+    """Create the upload row, or restart the GC grace period of an existing one.
+
+    A dedup hit may land on an orphan that is about to be collected; touching
+    created_at keeps collect_upload_garbage away from it until the caller
+    has had GC_GRACE_MINUTES to reference it.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("UPDATE uploads SET created_at = CURRENT_TIMESTAMP WHERE digest = ?", (digest,))
+    cursor.execute('''
+        INSERT OR IGNORE INTO uploads (digest, path, ext, size, original_name)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (digest, rel_path, ext, size, original_name))
+    conn.commit()
+    conn.close()
+
+
+def _upload_info(digest, rel_path, ext, size, original_name, deduplicated):
+    return {
+        "digest": digest,
+        "path": rel_path,
+        "size": size,
+        "ext": ext,
+        "original_name": original_name,
+        "deduplicated": deduplicated
+    }
+
+
+def read_small_upload(file_storage, max_bytes=IN_MEMORY_UPLOAD_MAX_BYTES):
+    """Return the upload's bytes if it is at most max_bytes, else None.
+
+    A larger upload is rewound so it can still be streamed with store_upload.
+    """
+    data = file_storage.stream.read(max_bytes + 1)
+    if len(data) <= max_bytes:
+        return data
+    file_storage.stream.seek(0)
+    return None
+
+
+def store_upload_bytes(data, original_name):
+    """store_upload for content already held in memory; same return value."""
+    ext = os.path.splitext(original_name or "")[1].lower()
+    digest = hashlib.sha256(data).hexdigest()
+    rel_path = _blob_path(digest, ext)
+    full_path = os.path.join(UPLOAD_FOLDER, rel_path)
+
+    _claim_upload(digest, rel_path, ext, len(data), original_name or "")
+    deduplicated = os.path.exists(full_path)
+    if not deduplicated:
+        fd, tmp_path = tempfile.mkstemp(dir=TMP_FOLDER)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(data)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            os.replace(tmp_path, full_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    return _upload_info(digest, rel_path, ext, len(data), original_name or "", deduplicated)
+
+
+def upload_digest(value):
+    """Find the upload digest in a digest, a stored path or an LLM-echoed path string."""
+    if not value:
+        return None
+    match = DIGEST_RE.search(str(value))
+    return match.group(0) if match else None
+
+
+def upload_reference(stored):
+    """Compact marker kept in the chat log instead of the document text."""
+    return f"[upload:{stored['digest']}] {stored.get('original_name', '')}".strip()
+
+
+def add_upload_ref(digest_or_path, ref_type, ref_id):
+    """Record that ref_type/ref_id (e.g. a session or an application) uses an upload.
+
+    Returns True when the reference is in place, False when there is no such
+    upload (nothing is recorded then).
+    """
+    digest = upload_digest(digest_or_path)
+    if not digest:
+        return False
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT OR IGNORE INTO upload_refs (digest, ref_type, ref_id)
+        SELECT digest, ?, ? FROM uploads WHERE digest = ?
+    ''', (ref_type, str(ref_id), digest))
+    if cursor.rowcount == 0:
+        # Either the reference already existed or the upload is gone
+        cursor.execute("SELECT 1 FROM upload_refs WHERE digest = ? AND ref_type = ? AND ref_id = ?",
+                       (digest, ref_type, str(ref_id)))
+        added = cursor.fetchone() is not None
+    else:
+        added = True
+    conn.commit()
+    conn.close()
+    if not added:
+        print(f"⚠️ Upload {digest[:12]} not found; no {ref_type} reference recorded for {ref_id}")
+    return added
+
+
+def release_upload_refs(ref_type, ref_id=None):
+    """Drop the references held by one owner, or by every owner of a type when ref_id is None."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    if ref_id is None:
+        cursor.execute("DELETE FROM upload_refs WHERE ref_type = ?", (ref_type,))
+    else:
+        cursor.execute("DELETE FROM upload_refs WHERE ref_type = ? AND ref_id = ?", (ref_type, str(ref_id)))
+    released = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return released
+
+
+def upload_ref_count(digest):
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM upload_refs WHERE digest = ?", (digest,))
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+
+def upload_owner(digest, ref_type):
+    """ref_id of one owner of the given type holding the upload, or None."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT ref_id FROM upload_refs WHERE digest = ? AND ref_type = ? LIMIT 1", (digest, ref_type))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def _delete_upload(cursor, digest, rel_path):
+    full_path = os.path.join(UPLOAD_FOLDER, rel_path)
+    if os.path.exists(full_path):
+        os.remove(full_path)
+    cursor.execute("DELETE FROM uploads WHERE digest = ?", (digest,))
+
+
+def collect_upload_garbage(session_ttl_days=SESSION_REF_TTL_DAYS):
+    """Expire old session references and delete uploads nothing references.
+
+    Returns the number of files removed.
+    """
+    session_cutoff = (datetime.utcnow() - timedelta(days=session_ttl_days)).strftime("%Y-%m-%d %H:%M:%S")
+    grace_cutoff = (datetime.utcnow() - timedelta(minutes=GC_GRACE_MINUTES)).strftime("%Y-%m-%d %H:%M:%S")
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM upload_refs WHERE ref_type = 'session' AND created_at < ?", (session_cutoff,))
+    cursor.execute('''
+        SELECT u.digest, u.path FROM uploads u
+        WHERE u.created_at < ?
+          AND NOT EXISTS (SELECT 1 FROM upload_refs r WHERE r.digest = u.digest)
+    ''', (grace_cutoff,))
+    orphans = cursor.fetchall()
+    for digest, rel_path in orphans:
+        _delete_upload(cursor, digest, rel_path)
+    conn.commit()
+    conn.close()
+
+    if orphans:
+        print(f"🧹 Removed {len(orphans)} unreferenced uploads")
+    return len(orphans)
+
+
+def resolve_upload_path(file_path):
+    """Absolute path of a stored upload from whatever was saved as its file_path."""
+    if not file_path:
+        return None
+
+    digest = upload_digest(file_path)
+    if digest:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute("SELECT path FROM uploads WHERE digest = ?", (digest,))
+        row = cursor.fetchone()
+        conn.close()
+        if row:
+            return os.path.join(UPLOAD_FOLDER, row[0])
+
+    # Legacy rows: "uploads/<name>", "<name>" or "The file path is: uploads/<name>"
+    name = str(file_path).split(":")[-1].strip()
+    if name.startswith("uploads/"):
+        name = name[len("uploads/"):]
+    # Only plain names inside uploads/ - never an absolute path or one climbing out with ".."
+    if not name or os.path.isabs(name) or ".." in re.split(r"[\\/]", name):
+        return None
+    full_path = os.path.join(UPLOAD_FOLDER, name)
+    return full_path if os.path.isfile(full_path) else None
+
+
+init_upload_db()
@@ -0,0 +1,519 @@
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+try:
+    import fcntl  # POSIX; Windows locks through msvcrt instead
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Where the company knowledge vectors live. "local" keeps them in a
+# memory-mapped float32 matrix on disk next to the app: the corpus is a few
+# hundred chunks, so an exact scan costs well under a millisecond and saves
+# a network round trip per question. "pinecone" keeps the serverless index
+# and is the default whenever PINECONE_API_KEY is set: a local index only
+# sees profile saves made on its own node. A backend that starts out empty is
+# filled from the saved company profile at warm-up
+# (about_syscraft.backfill_company_vectors).
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone" if os.getenv("PINECONE_API_KEY") else "local").lower()
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", os.path.join(os.path.dirname(__file__), "vector_index"))
+PINECONE_CLOUD = os.getenv("PINECONE_CLOUD", "aws")
+PINECONE_REGION = os.getenv("PINECONE_REGION", "us-east-1")
+
+VECTORS_FILE = "vectors.npy"
+METADATA_FILE = "metadata.json"
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = ".lock"
+# Generations kept after a flip (the published one included)
+KEEP_GENERATIONS = int(os.getenv("VECTOR_KEEP_GENERATIONS", "2"))
+# How long a new Pinecone namespace may take to show all its vectors before the flip is abandoned
+PINECONE_PUBLISH_TIMEOUT = float(os.getenv("PINECONE_PUBLISH_TIMEOUT", "120"))
+# The published Pinecone generation is a record in the index itself, so every
+# node sharing the index sees a flip; nodes re-read it after this many seconds.
+# The previous generation survives until the next publish, so a node that is
+# one TTL behind still queries a namespace that exists.
+PINECONE_POINTER_TTL = float(os.getenv("PINECONE_POINTER_TTL", "10"))
+POINTER_NAMESPACE = "_generation"
+POINTER_ID = "current"
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock on path across processes (flock on POSIX, msvcrt on Windows)."""
+    with open(path, "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.1)  # LK_LOCK gives up after ten seconds
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _matches_filter(metadata, filter):
+    """Pinecone-style metadata filter: {"field": value}, {"field": {"$eq"|"$ne"|"$in"|"$nin": ...}}."""
+    for field, condition in filter.items():
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, expected in condition.items():
+            if op == "$eq" and value != expected:
+                return False
+            if op == "$ne" and value == expected:
+                return False
+            if op == "$in" and value not in expected:
+                return False
+            if op == "$nin" and value in expected:
+                return False
+            if op not in ("$eq", "$ne", "$in", "$nin"):
+                raise ValueError(f"Unsupported filter operator: {op}")
+    return True
+
+
+class LocalVectorStore:
+    """Exact cosine search over unit-normalised vectors kept under <directory>.
+
+    Every write builds a complete new generation directory (gen-000042/
+    holding vectors.npy and metadata.json) and then publishes it by
+    replacing the CURRENT pointer file, so readers see either the old index
+    or the new one, never a half-written or empty one. Older generations
+    are garbage-collected after the flip. The matrix is opened with mmap,
+    so every process serving requests shares the page cache instead of
+    holding its own copy. Queries, upserts and deletes take Pinecone-shaped
+    arguments.
+    """
+
+    def __init__(self, directory=LOCAL_VECTOR_DIR, dim=384):
+        self.directory = directory
+        self.dim = dim
+        self._write_lock = threading.Lock()
+        self._loaded_pointer = None
+        self._pointer_stamp = None
+        self._generation = 0
+        # (matrix, ids, metadata, candidates by filter) replaced as a whole on reload
+        self._snapshot = (np.zeros((0, dim), dtype=np.float32), [], [], {})
+        os.makedirs(directory, exist_ok=True)
+        self._reload()
+
+    @property
+    def _pointer_path(self):
+        return os.path.join(self.directory, CURRENT_FILE)
+
+    def _generation_dir(self, generation):
+        return os.path.join(self.directory, f"gen-{generation:06d}")
+
+    def _read_pointer(self):
+        """(generation, directory) of the published generation, or None for an empty store."""
+        try:
+            with open(self._pointer_path, encoding="utf-8") as f:
+                generation = int(f.read().strip())
+            return generation, self._generation_dir(generation)
+        except FileNotFoundError:
+            pass
+        if os.path.exists(os.path.join(self.directory, METADATA_FILE)):
+            # Single-directory layout written before generations existed
+            return 0, self.directory
+        return None
+
+    def _reload(self):
+        # A stat per query; the pointer is only read back when it was replaced
+        try:
+            st = os.stat(self._pointer_path)
+            stamp = (st.st_mtime_ns, st.st_ino)  # every flip writes a new file
+        except FileNotFoundError:
+            stamp = None
+        if stamp is not None and stamp == self._pointer_stamp:
+            return
+        pointer = self._read_pointer()
+        self._pointer_stamp = stamp
+        if pointer is None or pointer == self._loaded_pointer:
+            return
+        generation, directory = pointer
+        with open(os.path.join(directory, METADATA_FILE), encoding="utf-8") as f:
+            saved = json.load(f)
+        matrix = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r")
+        self._snapshot = (matrix, saved["ids"], saved["metadata"], {})
+        self._generation = generation
+        self._loaded_pointer = pointer
+
+    @property
+    def generation(self):
+        """Number of the published generation; moves when any process changes the vectors."""
+        self._reload()
+        return self._generation
+
+    @contextmanager
+    def _exclusive(self):
+        """Serialise writers across threads and processes."""
+        with self._write_lock, _file_lock(os.path.join(self.directory, LOCK_FILE)):
+            yield
+
+    def _publish(self, matrix, ids, metadata):
+        """Write a complete new generation, flip CURRENT to it, then collect old ones."""
+        generation = self._generation + 1
+        final_dir = self._generation_dir(generation)
+        build_dir = final_dir + ".building"
+        shutil.rmtree(build_dir, ignore_errors=True)
+        os.makedirs(build_dir)
+        with open(os.path.join(build_dir, VECTORS_FILE), "wb") as f:
+            np.save(f, np.ascontiguousarray(np.asarray(matrix).reshape(-1, self.dim), dtype=np.float32))
+            f.flush()
+            os.fsync(f.fileno())
+        with open(os.path.join(build_dir, METADATA_FILE), "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "generation": generation, "ids": ids, "metadata": metadata}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(build_dir, final_dir)
+
+        pointer_tmp = self._pointer_path + ".tmp"
+        with open(pointer_tmp, "w", encoding="utf-8") as f:
+            f.write(str(generation))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer_tmp, self._pointer_path)
+        self._reload()
+        self._collect_garbage()
+
+    def _collect_garbage(self):
+        """Remove generations older than the last KEEP_GENERATIONS and leftovers of crashed writers."""
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith("gen-"):
+                number = name[4:].split(".")[0]
+                if name.endswith(".building") or int(number) <= self._generation - KEEP_GENERATIONS:
+                    shutil.rmtree(path, ignore_errors=True)
+            elif name in (VECTORS_FILE, METADATA_FILE):
+                # Pre-generation layout, superseded by the first published generation
+                os.remove(path)
+        # Processes that still have an old matrix mapped keep reading it until
+        # they reload; unlinking the files does not invalidate the mapping.
+
+    def apply(self, upserts=(), delete_ids=(), delete_filter=None, delete_all=False, batch_size=None):
+        """Upsert and delete in one step, published as a single new generation."""
+        with self._exclusive():
+            self._reload()
+            matrix, ids, metadata, _ = self._snapshot
+            drop = set(delete_ids)
+            keep = [i for i, (vid, meta) in enumerate(zip(ids, metadata))
+                    if not (delete_all or vid in drop or (delete_filter and _matches_filter(meta, delete_filter)))]
+            matrix = np.asarray(matrix)[keep].reshape(-1, self.dim)
+            ids = [ids[i] for i in keep]
+            metadata = [metadata[i] for i in keep]
+
+            positions = {vid: i for i, vid in enumerate(ids)}
+            new_rows = []
+            for record in upserts:
+                values = np.asarray(record["values"], dtype=np.float32)
+                if values.shape != (self.dim,):
+                    raise ValueError(f"Vector {record['id']} has dimension {values.shape}, expected {self.dim}")
+                values = values / (np.linalg.norm(values) or 1.0)
+                if record["id"] in positions:
+                    row = positions[record["id"]]
+                    matrix[row] = values
+                    metadata[row] = record.get("metadata", {})
+                else:
+                    positions[record["id"]] = len(ids)
+                    new_rows.append(values)
+                    ids.append(record["id"])
+                    metadata.append(record.get("metadata", {}))
+            if new_rows:
+                matrix = np.vstack([matrix, np.stack(new_rows)])
+            self._publish(matrix, ids, metadata)
+        return {"generation": self._generation, "total_vector_count": len(ids)}
+
+    def _candidates(self, filter):
+        """(row numbers, their vectors) for a filter, memoised per snapshot; rows is None when unfiltered."""
+        matrix, ids, metadata, by_filter = self._snapshot
+        if not filter:
+            return None, matrix
+        key = json.dumps(filter, sort_keys=True)
+        if key not in by_filter:
+            rows = np.array([i for i, meta in enumerate(metadata) if _matches_filter(meta, filter)], dtype=np.int64)
+            by_filter[key] = (rows, np.asarray(matrix)[rows])
+        return by_filter[key]
+
+    def query(self, vector, top_k=5, filter=None, include_metadata=True, **_):
+        self._reload()
+        matrix, ids, metadata, _ = self._snapshot
+        rows, candidates = self._candidates(filter)
+        if not len(candidates):
+            return {"matches": []}
+
+        q = np.asarray(vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        scores = candidates @ q
+        k = min(top_k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+
+        matches = []
+        for i in best:
+            row = int(i if rows is None else rows[i])
+            match = {"id": ids[row], "score": float(scores[i])}
+            if include_metadata:
+                match["metadata"] = metadata[row]
+            matches.append(match)
+        return {"matches": matches}
+
+    def upsert(self, vectors, **_):
+        """Insert or replace [{"id", "values", "metadata"}] records."""
+        self.apply(upserts=vectors)
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids=None, filter=None, delete_all=False, **_):
+        self.apply(delete_ids=ids or (), delete_filter=filter, delete_all=delete_all)
+        return {}
+
+    def list_ids(self, prefix="", filter=None):
+        """Ids starting with prefix (and matching filter, if given)."""
+        self._reload()
+        _, ids, metadata, _ = self._snapshot
+        return [vid for vid, meta in zip(ids, metadata)
+                if vid.startswith(prefix) and (not filter or _matches_filter(meta, filter))]
+
+    def records(self, filter=None):
+        """[{"id", "metadata"}] of every vector matching filter, without the values."""
+        self._reload()
+        _, ids, metadata, _ = self._snapshot
+        return [{"id": vid, "metadata": meta} for vid, meta in zip(ids, metadata)
+                if not filter or _matches_filter(meta, filter)]
+
+    def describe_index_stats(self):
+        self._reload()
+        return {"backend": "local", "dimension": self.dim, "total_vector_count": len(self._snapshot[1])}
+
+
+class PineconeVectorStore:
+    """The serverless Pinecone index behind the same query/upsert/delete calls.
+
+    Without an explicit namespace, each generation lives in its own
+    namespace ("gen-000042"; generation 0 is the default namespace used
+    before generations existed) and a pointer record in the index
+    (POINTER_NAMESPACE/POINTER_ID) names the published one. apply() fills a
+    new namespace, waits until Pinecone reports all of its vectors, flips
+    the pointer record and then deletes old namespaces. With an explicit
+    namespace, writes go to that namespace in place.
+
+    lock_path serialises writers on this node; legacy_pointer_path is the
+    node-local pointer file older versions kept, read only until the first
+    pointer record is written.
+    """
+
+    def __init__(self, index_name, dim=384, namespace=None, lock_path=None, legacy_pointer_path=None):
+        import pinecone
+        from pinecone import ServerlessSpec
+
+        # Pinecone init (v5 SDK)
+        pc = pinecone.Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+        if index_name not in [index.name for index in pc.list_indexes()]:
+            pc.create_index(
+                name=index_name,
+                dimension=dim,
+                metric="cosine",
+                spec=ServerlessSpec(cloud=PINECONE_CLOUD, region=PINECONE_REGION)
+            )
+        self.index = pc.Index(index_name)
+        self.namespace = namespace
+        self.generations = namespace is None
+        self.lock_path = lock_path
+        self.legacy_pointer_path = legacy_pointer_path
+        self.dim = dim
+        self._write_lock = threading.Lock()
+        self._pointer_checked = None
+        self._generation = 0
+
+    def _read_pointer(self):
+        fetched = self.index.fetch(ids=[POINTER_ID], namespace=POINTER_NAMESPACE)
+        record = fetched.vectors.get(POINTER_ID)
+        if record is not None:
+            return int((record.metadata or {}).get("generation", 0))
+        if self.legacy_pointer_path and os.path.exists(self.legacy_pointer_path):
+            with open(self.legacy_pointer_path, encoding="utf-8") as f:
+                return int(f.read().strip())
+        return 0
+
+    def _write_pointer(self, generation):
+        # Cosine indexes reject all-zero vectors; the values are never queried
+        values = [1.0] + [0.0] * (self.dim - 1)
+        self.index.upsert([{"id": POINTER_ID, "values": values, "metadata": {"generation": generation}}],
+                          namespace=POINTER_NAMESPACE)
+
+    def _reload_pointer(self, force=False):
+        now = time.monotonic()
+        if force or self._pointer_checked is None or now - self._pointer_checked >= PINECONE_POINTER_TTL:
+            self._generation = self._read_pointer()
+            self._pointer_checked = now
+
+    @property
+    def generation(self):
+        if self.generations:
+            self._reload_pointer()
+        return self._generation
+
+    @staticmethod
+    def _generation_namespace(generation):
+        return f"gen-{generation:06d}" if generation else ""
+
+    def _current_namespace(self):
+        if not self.generations:
+            return self.namespace
+        return self._generation_namespace(self.generation)
+
+    def _ns(self, kwargs):
+        namespace = self._current_namespace()
+        if namespace and "namespace" not in kwargs:
+            kwargs["namespace"] = namespace
+        return kwargs
+
+    def namespace_count(self, namespace):
+        summary = self.index.describe_index_stats().namespaces.get(namespace or "")
+        return getattr(summary, "vector_count", 0) if summary is not None else 0
+
+    def apply(self, upserts=(), delete_ids=(), delete_filter=None, delete_all=False, batch_size=100):
+        """Upsert and delete in one step; published atomically when generations are enabled."""
+        upserts = list(upserts)
+        if not self.generations:
+            for start in range(0, len(upserts), batch_size):
+                self.upsert(upserts[start:start + batch_size])
+            delete_ids = list(delete_ids)
+            for start in range(0, len(delete_ids), batch_size):
+                self.delete(ids=delete_ids[start:start + batch_size])
+            if delete_filter or delete_all:
+                self.delete(filter=delete_filter, delete_all=delete_all)
+            return {"generation": None}
+
+        with self._write_lock, (_file_lock(self.lock_path) if self.lock_path else nullcontext()):
+            return self._publish_generation(upserts, set(delete_ids), delete_filter, delete_all, batch_size)
+
+    def _publish_generation(self, upserts, delete_ids, delete_filter, delete_all, batch_size):
+        self._reload_pointer(force=True)
+        old_namespace = self._current_namespace()
+        generation = self._generation + 1
+        namespace = self._generation_namespace(generation)
+
+        # The new generation starts as a copy of the surviving vectors
+        replaced = {record["id"] for record in upserts}
+        carried = [] if delete_all else [vid for vid in self.list_ids(namespace=old_namespace)
+                                         if vid not in delete_ids and vid not in replaced]
+        records = []
+        for start in range(0, len(carried), batch_size):
+            fetched = self.index.fetch(ids=carried[start:start + batch_size], namespace=old_namespace)
+            for vid, vector in fetched.vectors.items():
+                metadata = dict(vector.metadata or {})
+                if delete_filter and _matches_filter(metadata, delete_filter):
+                    continue
+                records.append({"id": vid, "values": list(vector.values), "metadata": metadata})
+        records.extend(upserts)
+
+        try:
+            for start in range(0, len(records), batch_size):
+                self.index.upsert(records[start:start + batch_size], namespace=namespace)
+            # Upserts are eventually consistent; don't publish until all are visible
+            deadline = time.monotonic() + PINECONE_PUBLISH_TIMEOUT
+            while records and self.namespace_count(namespace) < len(records):
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Pinecone namespace {namespace} not complete after {PINECONE_PUBLISH_TIMEOUT}s")
+                time.sleep(1)
+        except Exception:
+            try:
+                self.index.delete(delete_all=True, namespace=namespace)
+            except Exception:
+                pass
+            raise
+
+        # Writers on other nodes are not covered by the file lock; if one
+        # published meanwhile, keep its generation rather than overwrite it
+        if self._read_pointer() != generation - 1:
+            self.index.delete(delete_all=True, namespace=namespace)
+            raise RuntimeError("Another node published a vector generation during this update; retry it")
+        self._write_pointer(generation)
+        self._reload_pointer(force=True)
+
+        for name in list(self.index.describe_index_stats().namespaces):
+            number = 0 if name == "" else int(name[4:]) if name.startswith("gen-") and name[4:].isdigit() else None
+            if number is not None and number <= generation - KEEP_GENERATIONS:
+                try:
+                    self.index.delete(delete_all=True, namespace=name)
+                except Exception as e:
+                    print(f"⚠️ Could not delete old vector generation {name or '(default)'}: {e}")
+        return {"generation": generation, "total_vector_count": len(records)}
+
+    def query(self, vector, top_k=5, filter=None, include_metadata=True, **kwargs):
+        results = self.index.query(vector=list(map(float, vector)), top_k=top_k, filter=filter,
+                                   include_metadata=include_metadata, **self._ns(kwargs))
+        matches = []
+        for m in results.matches:
+            match = {"id": m.id, "score": m.score}
+            if include_metadata:
+                match["metadata"] = dict(m.metadata or {})
+            matches.append(match)
+        return {"matches": matches}
+
+    def upsert(self, vectors, **kwargs):
+        return self.index.upsert(vectors, **self._ns(kwargs))
+
+    def delete(self, ids=None, filter=None, delete_all=False, **kwargs):
+        if delete_all:
+            return self.index.delete(delete_all=True, **self._ns(kwargs))
+        if ids:
+            return self.index.delete(ids=ids, **self._ns(kwargs))
+        return self.index.delete(filter=filter, **self._ns(kwargs))
+
+    def list_ids(self, prefix="", filter=None, **kwargs):
+        """Ids starting with prefix; serverless indexes list by prefix only, so filter is ignored."""
+        ids = []
+        for page in self.index.list(prefix=prefix, **self._ns(kwargs)):
+            ids.extend(page)
+        return ids
+
+    def records(self, filter=None, batch_size=100):
+        """[{"id", "metadata"}] of every vector matching filter (listed, fetched, then filtered here)."""
+        ids = self.list_ids()
+        records = []
+        for start in range(0, len(ids), batch_size):
+            fetched = self.index.fetch(ids=ids[start:start + batch_size], **self._ns({}))
+            for vid, vector in fetched.vectors.items():
+                metadata = dict(vector.metadata or {})
+                if not filter or _matches_filter(metadata, filter):
+                    records.append({"id": vid, "metadata": metadata})
+        return sorted(records, key=lambda record: record["id"])
+
+    def describe_index_stats(self):
+        stats = self.index.describe_index_stats()
+        return {"backend": "pinecone", "dimension": self.dim, "total_vector_count": stats.total_vector_count}
+
+
+def open_vector_store(name, dim, backend=None, namespace=None):
+    """Open the named vector store on the configured backend (VECTOR_BACKEND)."""
+    backend = (backend or VECTOR_BACKEND).lower()
+    if backend == "local":
+        if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+            print(f"⚠️ Local vector store with WEB_CONCURRENCY={os.getenv('WEB_CONCURRENCY')}: workers share "
+                  f"{LOCAL_VECTOR_DIR} on this node only; other nodes keep stale company vectors "
+                  f"(set VECTOR_BACKEND=pinecone for a multi-node deploy)")
+        return LocalVectorStore(os.path.join(LOCAL_VECTOR_DIR, name), dim)
+    if backend == "pinecone":
+        os.makedirs(LOCAL_VECTOR_DIR, exist_ok=True)
+        return PineconeVectorStore(
+            name, dim, namespace=namespace,
+            lock_path=os.path.join(LOCAL_VECTOR_DIR, f"{name}.pinecone.lock"),
+            legacy_pointer_path=os.path.join(LOCAL_VECTOR_DIR, f"{name}.pinecone-generation"),
+        )
+    raise ValueError(f"Unknown VECTOR_BACKEND: {backend} (expected 'local' or 'pinecone')")